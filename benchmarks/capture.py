@@ -0,0 +1,57 @@
+"""Cost of frame capture per frame, while only keeping frames and while streaming.
+
+    python benchmarks/capture.py [--size 800x600] [--frames 300] [--fps 60]
+
+Runs headless (SDL dummy driver). Reports FrameCapture.capture_time, the
+smoothed time spent copying a frame into the ring on the render thread.
+Frames are only kept as fast as possible; the streaming run is paced at
+--fps, like a game, so dropped frames mean the encoder thread can not
+keep up with that size and rate.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from deengi.engine import Engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", default="800x600")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--fps", type=int, default=60)
+    args = parser.parse_args()
+    size = tuple(int(v) for v in args.size.split("x"))
+
+    engine = Engine(debug=False, screen_size=size)
+    capture = engine.start_capture(seconds=2, fps=args.fps)
+    print(f"ring: {capture.slots} frames, {capture.nbytes / 1e6:.0f} MB")
+
+    for _ in range(args.frames):
+        engine.frame(1 / args.fps)
+    print(f"keeping frames: {capture.capture_time * 1000:.3f} ms per frame")
+
+    with tempfile.TemporaryDirectory() as directory:
+        capture.start_stream(Path(directory) / "stream.rgb")
+        count, dropped = capture.count, capture.dropped
+        engine.run(fps=args.fps, max_frames=args.frames)
+        print(f"streaming raw:  {capture.capture_time * 1000:.3f} ms per frame")
+        start = time.perf_counter()
+        capture.stop_stream().result()
+        dropped = capture.dropped - dropped
+        due = capture.count - count + dropped
+        print(
+            f"flushed in {time.perf_counter() - start:.2f} s, "
+            f"dropped {dropped} of {due} frames ({dropped / max(due, 1):.0%})"
+        )
+    engine.stop_capture()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Broadphase cost of many moving bodies per tick.
+
+    python benchmarks/collision.py [--bodies 10000] [--ticks 300]
+
+Moves every body a little each tick and asks for the touching pairs,
+like a game would in an update callback. Reports milliseconds per tick
+and how often the grid had to be rebuilt.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from deengi.collision import CollisionWorld
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bodies", type=int, default=10000)
+    parser.add_argument("--ticks", type=int, default=300)
+    parser.add_argument("--world", type=float, default=300.0, help="side length")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    world = CollisionWorld(cell_size=2.0, margin=0.5)
+    positions = rng.uniform(0, args.world, (args.bodies, 2))
+    ids = world.add_many(positions, rng.uniform(0.2, 1.0, (args.bodies, 2)))
+    velocity = rng.uniform(-1, 1, (args.bodies, 2))
+
+    world.pairs()
+    start = time.perf_counter()
+    for _ in range(args.ticks):
+        world.pos[ids] += velocity / 60
+        pairs = world.pairs()
+    elapsed = (time.perf_counter() - start) / args.ticks * 1000
+    print(f"{args.bodies} bodies: {elapsed:.2f} ms per tick, {len(pairs)} pairs")
+    print(f"grid rebuilt {world.rebuilds - 1} times in {args.ticks} ticks")
+
+
+if __name__ == "__main__":
+    main()
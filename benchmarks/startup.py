@@ -0,0 +1,68 @@
+"""Import and startup times of deengi, each measured in a fresh interpreter.
+
+    python benchmarks/startup.py [--runs 10]
+
+Runs headless (SDL dummy drivers). Reports the median and best of every
+scenario in milliseconds; compare them before and after a change.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+SCENARIOS = {
+    "python": "pass",
+    "import deengi": "import deengi",
+    "deengi.Camera2D": "import deengi; deengi.Camera2D",
+    "import pygame": "import pygame",
+    "Engine()": "import deengi; deengi.Engine(debug=False)",
+    "Engine() + text": (
+        "import deengi; e = deengi.Engine(debug=False); e.renderer.draw_text('hello')"
+    ),
+}
+
+TIMER = """
+import time
+_start = time.perf_counter()
+{code}
+print(time.perf_counter() - _start)
+"""
+
+
+def measure(code, runs):
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy")
+    env["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [str(ROOT), env.get("PYTHONPATH")])
+    )
+    times = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", TIMER.format(code=code)],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        times.append(float(result.stdout.split()[-1]) * 1000)
+    return statistics.median(times), min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'scenario':<20}{'median ms':>12}{'best ms':>12}")
+    for name, code in SCENARIOS.items():
+        median, best = measure(code, args.runs)
+        print(f"{name:<20}{median:>12.1f}{best:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,32 @@
-from .camera import Camera2D
-from .renderer import Renderer
+import importlib
 
-from .input_handler import InputHandler
-from .engine import Engine
+# Submodules are imported on first attribute access, so `import deengi` stays
+# cheap for tools that only need part of it (e.g. Camera2D math).
+_exports = {
+    "Camera2D": "camera",
+    "Renderer": "renderer",
+    "InputHandler": "input_handler",
+    "Engine": "engine",
+}
 
+__all__ = list(_exports)
+
+
+def __getattr__(name):
+    if name in _exports:
+        value = getattr(importlib.import_module(f".{_exports[name]}", __name__), name)
+    else:
+        try:
+            value = importlib.import_module(f".{name}", __name__)
+        except ModuleNotFoundError as e:
+            if e.name != f"{__name__}.{name}":
+                raise
+            raise AttributeError(
+                f"module {__name__!r} has no attribute {name!r}"
+            ) from None
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
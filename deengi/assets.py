@@ -0,0 +1,136 @@
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pygame
+
+_image_cache = {}
+_image_sources = {}  # surface -> cache key, to find the file behind a surface
+
+
+def _cache_key(path, colorkey=None, alpha=True):
+    if colorkey is not None and (not isinstance(colorkey, tuple) or len(colorkey) != 3):
+        raise ValueError("colorkey must be a tuple of 3 RGB values")
+    return (str(Path(path)), colorkey, alpha)
+
+
+def _convert(surface, colorkey=None, alpha=True):
+    if colorkey is not None:
+        surface = surface.convert()
+        surface.set_colorkey(colorkey)
+    elif alpha:
+        surface = surface.convert_alpha()
+    else:
+        surface = surface.convert()
+    return surface
+
+
+def _store(key, surface):
+    _image_cache[key] = surface
+    _image_sources[surface] = key
+    return surface
+
+
+def load_image(path, colorkey=None, alpha=True):
+    """Load an image once and share the converted surface between all users.
+
+    colorkey: optional RGB tuple, converts the surface without per-pixel alpha
+    alpha: convert with per-pixel alpha, if no colorkey is given
+    """
+    key = _cache_key(path, colorkey, alpha)
+    if key in _image_cache:
+        return _image_cache[key]
+    if colorkey is not None:
+        logging.debug(f"Applying colorkey {colorkey} to {path}")
+    return _store(key, _convert(pygame.image.load(path), colorkey, alpha))
+
+
+def is_loaded(path, colorkey=None, alpha=True):
+    return _cache_key(path, colorkey, alpha) in _image_cache
+
+
+def image_source(surface):
+    """(path, colorkey) a surface was loaded from by load_image, None if unknown"""
+    key = _image_sources.get(surface)
+    return key[:2] if key else None
+
+
+def clear_image_cache():
+    _image_cache.clear()
+    _image_sources.clear()
+
+
+class AssetLoader:
+    """Preloads images into the load_image cache without stalling frames.
+
+    Files are decoded on a worker thread pool, the decoded surfaces are
+    converted on the main thread in update(), which spends at most
+    frame_budget seconds per call. progress can drive a loading screen.
+    """
+
+    def __init__(self, workers=4, frame_budget=0.004):
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="deengi-assets")
+        self.frame_budget = frame_budget
+        self.pending = deque()  # (key, future) in request order
+        self.total = 0
+        self.loaded = 0
+        self.failed = []  # (path, exception)
+        self._failed_keys = set()  # not retried, load_image raises for them
+        self.finished_callbacks = []
+
+    @property
+    def progress(self):
+        """Share of requested assets that are done, 1.0 if nothing is loading"""
+        return self.loaded / self.total if self.total else 1.0
+
+    @property
+    def finished(self):
+        return not self.pending
+
+    def preload(self, *assets, alpha=True):
+        """assets: image paths or (path, colorkey) tuples"""
+        queued = {key for key, _ in self.pending}
+        for asset in assets:
+            path, colorkey = asset if isinstance(asset, tuple) else (asset, None)
+            key = _cache_key(path, colorkey, alpha)
+            if key in _image_cache or key in queued or key in self._failed_keys:
+                continue
+            queued.add(key)
+            self.pending.append((key, self.executor.submit(pygame.image.load, path)))
+            self.total += 1
+
+    def on_finished(self, callback):
+        """Call callback once, after everything requested so far is loaded"""
+        if self.finished:
+            callback()
+        else:
+            self.finished_callbacks.append(callback)
+
+    def update(self):
+        deadline = time.perf_counter() + self.frame_budget
+        while self.pending and time.perf_counter() < deadline:
+            key, future = self.pending[0]
+            if not future.done():
+                break
+            self.pending.popleft()
+            self.loaded += 1
+            try:
+                surface = future.result()
+            except Exception as e:
+                logging.warning(f"Could not load {key[0]}: {e}")
+                self.failed.append((key[0], e))
+                self._failed_keys.add(key)
+                continue
+            if key not in _image_cache:
+                _store(key, _convert(surface, *key[1:]))
+
+        if self.finished and self.total:
+            self.total = self.loaded = 0
+            callbacks, self.finished_callbacks = self.finished_callbacks, []
+            for callback in callbacks:
+                callback()
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -39,24 +39,50 @@ class Camera2D(Camera):
         self.flatness = flatness
         self.ex, self.ey = self.get_transformation_matrix(self.rotation, self.flatness)
         self.zoom_level = zoom
+        self.pixel_scale = (1, 1)  # surface pixels per window pixel, see set_surface
         self.follows = None
         self.relative_speed = pg.Vector2(0, 0)  # in game coordinates?
+        self._view_state = None
+        self._view_version = 0
 
         self.debug = debug
 
-    def drag_start(self):
-        mouse_pos = pg.mouse.get_pos()
+    def drag_start(self, mouse_pos=None):
+        mouse_pos = mouse_pos or pg.mouse.get_pos()
         self.drag_startpoint = pg.Vector2(mouse_pos)
         self.proj_startpoint = self.proj_center
 
-    def move_to(self):
-        direction = pg.mouse.get_pos() - self.drag_startpoint
+    def move_to(self, mouse_pos=None):
+        mouse_pos = mouse_pos or pg.mouse.get_pos()
+        direction = mouse_pos - self.drag_startpoint
         if self.debug:
             logging.debug(
-                f"Dragging camera from {self.drag_startpoint} to current {pg.mouse.get_pos()} by {direction}"
+                f"Dragging camera from {self.drag_startpoint} to current {mouse_pos} by {direction}"
             )
         self.proj_center = self.proj_startpoint + direction
 
+    def set_surface(self, surface):
+        """Project onto surface from now on, showing the same view.
+
+        Pan and zoom scale with the change in surface size, for rendering at
+        an internal resolution different from the window's.
+        """
+        old_width, old_height = self.screen.get_size()
+        width, height = surface.get_size()
+        sx, sy = width / old_width, height / old_height
+        self.screen = surface
+        self.screen_width, self.screen_height = width, height
+        self.proj_center = pg.Vector2(self.proj_center.x * sx, self.proj_center.y * sy)
+        self.proj_startpoint = pg.Vector2(
+            self.proj_startpoint.x * sx, self.proj_startpoint.y * sy
+        )
+        if hasattr(self, "drag_startpoint"):
+            self.drag_startpoint = pg.Vector2(
+                self.drag_startpoint.x * sx, self.drag_startpoint.y * sy
+            )
+        self.zoom_level = (self.zoom_level[0] * sx, self.zoom_level[1] * sy)
+        self.pixel_scale = (self.pixel_scale[0] * sx, self.pixel_scale[1] * sy)
+
     def set_game_position(self, pos):
         self.position = pg.Vector2(*pos)
 
@@ -87,18 +113,71 @@ class Camera2D(Camera):
         )
         return ex, ey
 
+    @property
+    def depth_axis(self):
+        """Game space direction along which screen y grows, independent of pan and zoom.
+
+        Sorting by game position dotted with it gives back to front draw order.
+        """
+        return self.ex[1], self.ey[1]
+
     def follow(self, Node, maxdist=1):
         self.maxdist = maxdist  # is in screencoords, should be game coords?
         self.follows = Node
 
     def update(self):
         if self.follows is not None:
-            screendist = self.screen_coords(self.follows.position) - self.screen_coords(
-                self.position
-            )
-            gap = screendist.length() - self.maxdist
+            target = self.follows.position
+            dx, dy = target[0] - self.position.x, target[1] - self.position.y
+            zoom_x, zoom_y = self.zoom_level
+            screen_x = (dx * self.ex[0] + dy * self.ey[0]) * zoom_x
+            screen_y = (dx * self.ex[1] + dy * self.ey[1]) * zoom_y
+            gap = math.hypot(screen_x, screen_y) - self.maxdist
             if gap > 0:
-                self.position.move_towards_ip(self.follows.position, gap)
+                self.position.move_towards_ip(target, gap)
+
+    @property
+    def view_version(self):
+        """Changes only when pan, zoom, rotation or the surface size changed
+        since it was last read, for caches of anything projected"""
+        state = (
+            self.position.x,
+            self.position.y,
+            self.proj_center.x,
+            self.proj_center.y,
+            *self.zoom_level,
+            self.rotation,
+            self.flatness,
+            self.screen_width,
+            self.screen_height,
+        )
+        if state != self._view_state:
+            self._view_state = state
+            self._view_version += 1
+        return self._view_version
+
+    def game_delta(self, dx, dy):
+        """Game space offset of a screen space offset, as floats"""
+        x, y = dx / self.zoom_level[0], dy / self.zoom_level[1]
+        (ex_x, ex_y), (ey_x, ey_y) = self.ex, self.ey
+        determinant = ex_x * ey_y - ex_y * ey_x
+        return (x * ey_y - y * ey_x) / determinant, (y * ex_x - x * ex_y) / determinant
+
+    def game_point(self, x, y):
+        """game_coords of a screen point, as floats"""
+        dx, dy = self.game_delta(x - self.proj_center.x, y - self.proj_center.y)
+        return self.position.x + dx, self.position.y + dy
+
+    def view_rect(self, screen_size=None):
+        """camera view rectangle in game coordinates, as floats (x, y, w, h)
+
+        Bounds the whole visible area, also when the view is rotated.
+        """
+        width, height = screen_size or self.screen.get_size()
+        corners = self.game_coords([(0, 0), (width, 0), (width, height), (0, height)])
+        xs = [corner.x for corner in corners]
+        ys = [corner.y for corner in corners]
+        return min(xs), min(ys), max(xs) - min(xs), max(ys) - min(ys)
 
     # @property
     # def view_rect(self):
@@ -174,6 +253,21 @@ class Camera2D(Camera):
             y_camera = (x * self.ex[1] + y * self.ey[1]) * self.zoom_level[1]
             return pg.Vector2(x_camera, y_camera) + self.proj_center
 
+    def screen_coords_array(self, game_coords):
+        """
+        Vectorized screen_coords for a NumPy array of game-space points.
+
+        game_coords : array of shape (..., 2)
+        Returns a float array of the same shape with screen-space points.
+        """
+        x = game_coords[..., 0] - self.position.x
+        y = game_coords[..., 1] - self.position.y
+        zoom_x, zoom_y = self.zoom_level
+        screen = game_coords.astype(float)  # copy, keeps this module free of numpy
+        screen[..., 0] = (x * self.ex[0] + y * self.ey[0]) * zoom_x + self.proj_center.x
+        screen[..., 1] = (x * self.ex[1] + y * self.ey[1]) * zoom_y + self.proj_center.y
+        return screen
+
     # def game_coords(self, screen_coords) -> pg.Vector2:
     #     if isinstance(screen_coords, list):
     #         return [self.screen_coords(v) for v in screen_coords]
@@ -261,7 +355,7 @@ class Camera2D(Camera):
         self.position += pg.Vector2(*xy_tuple)
 
     def reset(self):
-        self.zoom_level = (1, 1)
+        self.zoom_level = self.pixel_scale
         self.position = pg.Vector2(0, 0)
         if self.follows is not None:
             logging.debug("resetting camera to follow")
@@ -269,3 +363,129 @@ class Camera2D(Camera):
 
     def __repr__(self) -> str:
         return f"Camera(screen={self.screen.get_size()}, game_pos={self.position}, {self.zoom_level=})"
+
+
+class CameraMotion:
+    """Moves a camera smoothly: following a target, kinetic panning and
+    zooming towards the cursor.
+
+    All of it works on the camera's game position with plain floats, the
+    projection center stays put. update(dt) only writes to the camera
+    while something is moving, so camera.view_version stays the same on
+    frames where the camera is at rest.
+    """
+
+    def __init__(self, camera, smooth_time=0.25, friction=6.0, min_speed=1e-3):
+        """smooth_time: seconds a follow roughly takes to catch up
+        friction: how fast a released pan slows down, per second
+        min_speed: game units per second below which motion stops"""
+        self.camera = camera
+        self.smooth_time = smooth_time
+        self.friction = friction
+        self.min_speed = min_speed
+        self.target = None
+        self.velocity_x = self.velocity_y = 0.0
+        self.dragging = False
+        self._anchor = None  # game point held under the cursor while dragging
+        self._last = None  # camera position at the last update while dragging
+
+    @property
+    def moving(self):
+        return bool(
+            self.dragging
+            or self.target is not None
+            or self.velocity_x
+            or self.velocity_y
+        )
+
+    def follow(self, target, smooth_time=None):
+        """Keep target (anything with a position) in the center, None to stop"""
+        self.target = target
+        if smooth_time is not None:
+            self.smooth_time = smooth_time
+
+    def stop(self):
+        self.target = None
+        self.velocity_x = self.velocity_y = 0.0
+
+    def drag_start(self, mouse_pos):
+        """Grab the game point under the mouse, stops following"""
+        self.target = None
+        self.dragging = True
+        self._anchor = self.camera.game_point(*mouse_pos)
+        self._last = (self.camera.position.x, self.camera.position.y)
+        self.velocity_x = self.velocity_y = 0.0
+
+    def drag(self, mouse_pos):
+        """Keep the grabbed game point under the mouse"""
+        if not self.dragging:
+            return
+        camera = self.camera
+        dx, dy = camera.game_delta(
+            mouse_pos[0] - camera.proj_center.x, mouse_pos[1] - camera.proj_center.y
+        )
+        x, y = self._anchor[0] - dx, self._anchor[1] - dy
+        if (x, y) != (camera.position.x, camera.position.y):
+            camera.position.x, camera.position.y = x, y
+
+    def drag_end(self):
+        """Let go, the camera glides on with the drag's velocity"""
+        self.dragging = False
+        if math.hypot(self.velocity_x, self.velocity_y) < self.min_speed:
+            self.velocity_x = self.velocity_y = 0.0
+
+    def zoom_at(self, factor, screen_pos):
+        """Zoom by factor, keeping the game point under screen_pos in place"""
+        camera = self.camera
+        x, y = screen_pos
+        game_x, game_y = camera.game_point(x, y)
+        camera.zoom(factor)
+        dx, dy = camera.game_delta(x - camera.proj_center.x, y - camera.proj_center.y)
+        camera.position.x, camera.position.y = game_x - dx, game_y - dy
+
+    def update(self, dt):
+        if dt <= 0:
+            return
+        position = self.camera.position
+        if self.dragging:
+            # velocity of the drag, smoothed over a few frames for the release
+            last_x, last_y = self._last
+            weight = min(1.0, dt / 0.05)
+            self.velocity_x += ((position.x - last_x) / dt - self.velocity_x) * weight
+            self.velocity_y += ((position.y - last_y) / dt - self.velocity_y) * weight
+            self._last = (position.x, position.y)
+        elif self.target is not None:
+            self._follow(dt)
+        elif self.velocity_x or self.velocity_y:
+            position.x += self.velocity_x * dt
+            position.y += self.velocity_y * dt
+            decay = math.exp(-self.friction * dt)
+            self.velocity_x *= decay
+            self.velocity_y *= decay
+            if math.hypot(self.velocity_x, self.velocity_y) < self.min_speed:
+                self.velocity_x = self.velocity_y = 0.0
+
+    def _follow(self, dt):
+        """Critically damped spring towards the target, exact for any dt"""
+        position = self.camera.position
+        target = self.target.position
+        target_x, target_y = float(target[0]), float(target[1])
+        offset_x, offset_y = position.x - target_x, position.y - target_y
+        if (
+            abs(offset_x) < self.min_speed * dt
+            and abs(offset_y) < self.min_speed * dt
+            and math.hypot(self.velocity_x, self.velocity_y) < self.min_speed
+        ):
+            if offset_x or offset_y:  # settle exactly once, then leave the camera alone
+                position.x, position.y = target_x, target_y
+            self.velocity_x = self.velocity_y = 0.0
+            return
+        omega = 2 / self.smooth_time
+        x = omega * dt
+        decay = 1 / (1 + x + 0.48 * x * x + 0.235 * x * x * x)
+        change_x = (self.velocity_x + omega * offset_x) * dt
+        change_y = (self.velocity_y + omega * offset_y) * dt
+        self.velocity_x = (self.velocity_x - omega * change_x) * decay
+        self.velocity_y = (self.velocity_y - omega * change_y) * decay
+        position.x = target_x + (offset_x + change_x) * decay
+        position.y = target_y + (offset_y + change_y) * decay
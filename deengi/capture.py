@@ -0,0 +1,188 @@
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pygame
+
+
+def frame_to_rgb(raw, size, pitch, shifts):
+    """(height, width, 3) RGB array of a raw 32 bit frame"""
+    width, height = size
+    pixels = raw.view(np.uint32).reshape(height, pitch // 4)[:, :width]
+    rgb = np.empty((height, width, 3), np.uint8)
+    for channel, shift in enumerate(shifts[:3]):
+        rgb[..., channel] = pixels >> shift
+    return rgb
+
+
+class FrameCapture:
+    """Keeps the last seconds of rendered frames in a preallocated ring.
+
+    capture() copies a 32 bit surface's raw pixels into the next ring slot
+    straight through the buffer protocol, one memcpy and no conversion.
+    Converting and encoding happen on a background thread: dump() writes
+    the frames in the ring (the last N seconds on demand), start_stream()
+    writes every captured frame as it comes. Formats are "png", a
+    directory of numbered images, and "raw", an rgb24 stream with a .json
+    header next to it, e.g. for
+
+        ffmpeg -f rawvideo -pix_fmt rgb24 -s 800x600 -r 30 -i clip.rgb clip.mp4
+
+    Slots still waiting to be encoded are not overwritten; frames arriving
+    while the ring is full of them, or of another size than the ring's,
+    are dropped and counted in dropped.
+    """
+
+    def __init__(self, size, seconds=5, fps=30, pitch=None, shifts=(16, 8, 0, 24)):
+        """size: (width, height) of the surfaces to capture
+        fps: capture rate, frames in between are skipped
+        pitch, shifts: pixel layout, taken from the surface by for_surface()"""
+        self.size = tuple(size)
+        self.fps = fps
+        self.pitch = pitch or self.size[0] * 4
+        self.shifts = tuple(shifts)
+        self.slots = max(1, round(seconds * fps))
+        self.ring = np.empty((self.slots, self.pitch * self.size[1]), np.uint8)
+        self.ring.fill(0)  # fault the pages in now, not during the first captures
+        self.times = np.zeros(self.slots)  # game time of each slot's frame
+        self.pinned = np.zeros(self.slots, np.int32)  # pending encodes per slot
+        self.count = 0  # frames captured so far
+        self.dropped = 0
+        self.capture_time = 0.0  # smoothed seconds spent in capture()
+        self.time = 0.0
+        self._since = None  # seconds since the last captured frame
+        self._lock = threading.Lock()
+        self._encoder = ThreadPoolExecutor(1, thread_name_prefix="deengi-capture")
+        self._stream = None
+
+    @classmethod
+    def for_surface(cls, surface, seconds=5, fps=30):
+        if surface.get_bytesize() != 4:
+            raise ValueError("frame capture needs a 32 bit surface")
+        return cls(
+            surface.get_size(), seconds, fps, surface.get_pitch(), surface.get_shifts()
+        )
+
+    def __len__(self):
+        """Frames currently in the ring"""
+        return min(self.count, self.slots)
+
+    @property
+    def nbytes(self):
+        return self.ring.nbytes
+
+    def capture(self, surface, dt):
+        """Copy surface into the ring if a frame is due, returns whether it did"""
+        self.time += dt
+        interval = 1 / self.fps
+        if self._since is None:  # the first frame is captured right away
+            self._since = 0.0
+        else:
+            self._since += dt
+            if self._since < interval:
+                return False
+            self._since = min(self._since - interval, interval)
+        start = time.perf_counter()
+        slot = self.count % self.slots
+        with self._lock:
+            if self.pinned[slot] or surface.get_size() != self.size:
+                if not self.dropped and surface.get_size() != self.size:
+                    logging.warning(
+                        "Dropping captured frames of size %s, the ring holds %s",
+                        surface.get_size(),
+                        self.size,
+                    )
+                self.dropped += 1
+                return False
+            buffer = surface.get_buffer()
+            np.copyto(self.ring[slot], np.frombuffer(buffer, np.uint8))
+            del buffer  # unlocks the surface
+            self.times[slot] = self.time
+            self.count += 1
+            if self._stream is not None:
+                self.pinned[slot] += 1
+        if self._stream is not None:
+            self._encoder.submit(self._write_slot, self._stream, slot, self.count - 1)
+        self.capture_time += (time.perf_counter() - start - self.capture_time) * 0.1
+        return True
+
+    # encoding, on the encoder thread
+    def rgb(self, slot):
+        return frame_to_rgb(self.ring[slot], self.size, self.pitch, self.shifts)
+
+    def _open(self, path, format):
+        path = Path(path)
+        if format == "png":
+            path.mkdir(parents=True, exist_ok=True)
+            return {"format": format, "path": path, "frames": 0}
+        if format == "raw":
+            path.parent.mkdir(parents=True, exist_ok=True)
+            header = {"width": self.size[0], "height": self.size[1], "fps": self.fps}
+            header["pix_fmt"] = "rgb24"
+            path.with_name(path.name + ".json").write_text(json.dumps(header))
+            return {
+                "format": format,
+                "path": path,
+                "frames": 0,
+                "file": open(path, "wb"),
+            }
+        raise ValueError(f"format must be 'png' or 'raw', not {format!r}")
+
+    def _write_slot(self, output, slot, number):
+        try:
+            rgb = self.rgb(slot)
+        finally:
+            with self._lock:
+                self.pinned[slot] -= 1
+        if output["format"] == "png":
+            image = pygame.image.frombuffer(rgb.tobytes(), self.size, "RGB")
+            pygame.image.save(image, str(output["path"] / f"frame_{number:06d}.png"))
+        else:
+            output["file"].write(rgb.tobytes())
+        output["frames"] += 1
+
+    def _close(self, output):
+        if "file" in output:
+            output["file"].close()
+        return output["path"]
+
+    # exporting
+    def dump(self, path, seconds=None, format="png"):
+        """Write the last seconds (default all) in the ring, returns a Future
+        of the path. Capturing goes on meanwhile."""
+        frames = (
+            len(self) if seconds is None else min(len(self), round(seconds * self.fps))
+        )
+        with self._lock:
+            first = self.count - frames
+            slots = [number % self.slots for number in range(first, self.count)]
+            for slot in slots:
+                self.pinned[slot] += 1
+        output = self._open(path, format)
+
+        def write():
+            for number, slot in enumerate(slots):
+                self._write_slot(output, slot, number)
+            return self._close(output)
+
+        return self._encoder.submit(write)
+
+    def start_stream(self, path, format="raw"):
+        """Write every frame captured from now on"""
+        self.stop_stream()
+        self._stream = self._open(path, format)
+
+    def stop_stream(self):
+        """Stop streaming, returns a Future of the path once all frames are written"""
+        stream, self._stream = self._stream, None
+        if stream is None:
+            return None
+        return self._encoder.submit(self._close, stream)
+
+    def close(self, wait=True):
+        self.stop_stream()
+        self._encoder.shutdown(wait=wait)
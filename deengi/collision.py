@@ -0,0 +1,320 @@
+import numpy as np
+
+ALL_LAYERS = 0xFFFFFFFF
+
+
+def rects_overlap(pos_a, size_a, pos_b, size_b):
+    """Vectorized AABB test of (..., 2) corner and size arrays, touching doesn't count"""
+    return np.all((pos_a < pos_b + size_b) & (pos_b < pos_a + size_a), axis=-1)
+
+
+def rect_polygon(pos, size):
+    x, y = pos
+    w, h = size
+    return np.array([(x, y), (x + w, y), (x + w, y + h), (x, y + h)], float)
+
+
+def polygons_overlap(a, b):
+    """Separating axis test of two convex polygons, (N, 2) point arrays"""
+    a, b = np.asarray(a, float), np.asarray(b, float)
+    for polygon in (a, b):
+        edges = np.roll(polygon, -1, axis=0) - polygon
+        normals = np.stack([-edges[:, 1], edges[:, 0]], axis=1)
+        projected_a, projected_b = a @ normals.T, b @ normals.T
+        if np.any(
+            (projected_a.max(axis=0) <= projected_b.min(axis=0))
+            | (projected_b.max(axis=0) <= projected_a.min(axis=0))
+        ):
+            return False
+    return True
+
+
+def cell_entries(low, high, cell_size):
+    """(keys, owners) of every grid cell each box overlaps, sorted by key.
+
+    owners index the boxes, keys pack the cell coordinates into an int64.
+    """
+    first = np.floor(low / cell_size).astype(np.int64)
+    last = np.floor(high / cell_size).astype(np.int64)
+    span = last - first + 1
+    counts = span[:, 0] * span[:, 1]
+    owners = np.repeat(np.arange(len(low)), counts)
+    local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    width = np.repeat(span[:, 0], counts)
+    cell_x = np.repeat(first[:, 0], counts) + local % width
+    cell_y = np.repeat(first[:, 1], counts) + local // width
+    keys = (cell_x << 32) + (cell_y & 0xFFFFFFFF)
+    order = np.argsort(keys, kind="stable")
+    return keys[order], owners[order]
+
+
+def shared_cells(keys_a, owners_a, keys_b, owners_b):
+    """(a, b) owner arrays of every pair of entries in the same cell"""
+    start = np.searchsorted(keys_b, keys_a, "left")
+    counts = np.searchsorted(keys_b, keys_a, "right") - start
+    a = np.repeat(owners_a, counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    b = owners_b[np.repeat(start, counts) + offsets]
+    return a, b
+
+
+class CollisionWorld:
+    """Game space collision detection for many moving bodies.
+
+    Bodies are axis aligned boxes in typed NumPy arrays (pos is the lower
+    left corner, like tiles), optionally with a convex polygon inside the
+    box for the narrow phase. Move them through move(), or write world.pos
+    directly and vectorized, e.g. world.pos[ids] += velocity * dt.
+
+    The broadphase is a uniform grid over boxes enlarged by margin. Its
+    candidate pairs are kept while every body stays inside its enlarged
+    box, so small per tick moves cost one vectorized containment check;
+    the grid is rebuilt, vectorized, when a body leaves its box or bodies
+    are added or removed. category and mask are bit sets: two bodies
+    collide when each one's category is in the other's mask.
+    """
+
+    columns = ("pos", "size", "category", "mask", "active")
+
+    def __init__(self, cell_size=2.0, margin=0.25, capacity=1024):
+        self.cell_size = cell_size
+        self.margin = margin
+        self.count = 0  # ids below count have been used
+        self.pos = np.zeros((capacity, 2))
+        self.size = np.zeros((capacity, 2))
+        self.category = np.ones(capacity, np.uint32)
+        self.mask = np.full(capacity, ALL_LAYERS, np.uint32)
+        self.active = np.zeros(capacity, bool)
+        self.polygons = {}  # id -> (N, 2) points relative to pos
+        self.data = {}  # id -> anything the game wants to find a body's owner by
+        self._free = []
+
+        self.version = 0  # bumped when bodies are added or removed or filters change
+        self._fat_low = np.zeros((capacity, 2))
+        self._fat_high = np.zeros((capacity, 2))
+        self._candidates = None  # (M, 2) pairs with overlapping enlarged boxes
+        self._built_version = None
+        self._tile_grid = None  # (key, pos, size, keys, owners) of the last TileStore
+        self.rebuilds = 0
+
+    def __len__(self):
+        return self.count - len(self._free)
+
+    def __contains__(self, body):
+        return 0 <= body < self.count and bool(self.active[body])
+
+    @property
+    def capacity(self):
+        return len(self.active)
+
+    def reserve(self, capacity):
+        if capacity <= self.capacity:
+            return
+        capacity = max(capacity, 2 * self.capacity)
+        for column in self.columns + ("_fat_low", "_fat_high"):
+            old = getattr(self, column)
+            new = np.zeros((capacity,) + old.shape[1:], old.dtype)
+            new[: self.count] = old[: self.count]
+            setattr(self, column, new)
+
+    def ids(self):
+        """ids of all bodies"""
+        return np.flatnonzero(self.active[: self.count])
+
+    # bodies
+    def add(self, pos, size=None, polygon=None, category=1, mask=ALL_LAYERS, data=None):
+        """Add a body, returns its id. Ids of removed bodies are reused.
+
+        polygon: convex, points relative to pos; size defaults to its extent
+        """
+        if polygon is not None:
+            polygon = np.asarray(polygon, float)
+            if size is None:
+                size = polygon.max(axis=0)
+        if self._free:
+            body = self._free.pop()
+        else:
+            body = self.count
+            self.reserve(body + 1)
+            self.count += 1
+        self.pos[body] = pos
+        self.size[body] = size
+        self.category[body] = category
+        self.mask[body] = mask
+        self.active[body] = True
+        if polygon is not None:
+            self.polygons[body] = polygon
+        if data is not None:
+            self.data[body] = data
+        self.version += 1
+        return body
+
+    def add_many(self, positions, sizes=(1, 1), category=1, mask=ALL_LAYERS):
+        """Bulk add boxes from arrays (or broadcastable scalars), returns their ids"""
+        positions = np.asarray(positions, float).reshape(-1, 2)
+        start = self.count
+        self.reserve(start + len(positions))
+        new = slice(start, start + len(positions))
+        self.pos[new] = positions
+        self.size[new] = sizes
+        self.category[new] = category
+        self.mask[new] = mask
+        self.active[new] = True
+        self.count += len(positions)
+        self.version += 1
+        return np.arange(new.start, new.stop)
+
+    def remove(self, body):
+        if body not in self:
+            raise KeyError(f"no body {body}")
+        self.active[body] = False
+        self.polygons.pop(body, None)
+        self.data.pop(body, None)
+        self._free.append(body)
+        self.version += 1
+
+    def move(self, body, pos):
+        self.pos[body] = pos
+
+    def set_filter(self, body, category=None, mask=None):
+        if category is not None:
+            self.category[body] = category
+        if mask is not None:
+            self.mask[body] = mask
+        self.version += 1
+
+    def polygon(self, body):
+        """Points of a body's narrow phase shape in game coordinates"""
+        if body in self.polygons:
+            return self.polygons[body] + self.pos[body]
+        return rect_polygon(self.pos[body], self.size[body])
+
+    # broadphase
+    def _escaped(self, ids):
+        low, high = self.pos[ids], self.pos[ids] + self.size[ids]
+        return np.any((low < self._fat_low[ids]) | (high > self._fat_high[ids]))
+
+    def rebuild(self):
+        """Index the enlarged boxes of all bodies in the grid again"""
+        ids = self.ids()
+        self._fat_low[ids] = self.pos[ids] - self.margin
+        self._fat_high[ids] = self.pos[ids] + self.size[ids] + self.margin
+        keys, owners = cell_entries(
+            self._fat_low[ids], self._fat_high[ids], self.cell_size
+        )
+        a, b = shared_cells(keys, owners, keys, owners)
+        a, b = ids[a], ids[b]
+        keep = (a < b) & ((self.category[a] & self.mask[b]) != 0)
+        keep &= (self.category[b] & self.mask[a]) != 0
+        pairs = np.unique(a[keep].astype(np.int64) * self.capacity + b[keep])
+        self._candidates = np.stack(
+            [pairs // self.capacity, pairs % self.capacity], axis=1
+        )
+        self._built_version = self.version
+        self.rebuilds += 1
+
+    def candidate_pairs(self):
+        """(M, 2) id pairs whose enlarged boxes share a grid cell, a superset of pairs()"""
+        if (
+            self._candidates is None
+            or self._built_version != self.version
+            or self._escaped(self.ids())
+        ):
+            self.rebuild()
+        return self._candidates
+
+    def pairs(self):
+        """(K, 2) ids of the pairs of bodies touching each other, a < b"""
+        candidates = self.candidate_pairs()
+        a, b = candidates[:, 0], candidates[:, 1]
+        hits = candidates[
+            rects_overlap(self.pos[a], self.size[a], self.pos[b], self.size[b])
+        ]
+        if self.polygons and len(hits):
+            shaped = np.isin(hits, list(self.polygons)).any(axis=1)
+            keep = np.ones(len(hits), bool)
+            for row in np.flatnonzero(shaped).tolist():
+                a, b = hits[row].tolist()
+                keep[row] = polygons_overlap(self.polygon(a), self.polygon(b))
+            hits = hits[keep]
+        return hits
+
+    # queries
+    def query_rect(self, rect, mask=ALL_LAYERS):
+        """ids of the bodies touching a game space (x, y, w, h) rect"""
+        x, y, w, h = rect
+        ids = self.ids()
+        ids = ids[(self.category[ids] & mask) != 0]
+        ids = ids[
+            rects_overlap(
+                self.pos[ids], self.size[ids], np.array((x, y)), np.array((w, h))
+            )
+        ]
+        return self._touching(ids, rect_polygon((x, y), (w, h)))
+
+    def query_point(self, point, mask=ALL_LAYERS):
+        """ids of the bodies containing a game space point"""
+        x, y = point
+        ids = self.ids()
+        ids = ids[(self.category[ids] & mask) != 0]
+        low, high = self.pos[ids], self.pos[ids] + self.size[ids]
+        ids = ids[np.all((low <= (x, y)) & ((x, y) < high), axis=1)]
+        return self._touching(ids, rect_polygon((x, y), (1e-9, 1e-9)))
+
+    def _touching(self, ids, shape):
+        """ids whose polygons touch shape, ids without a polygon pass"""
+        if not self.polygons:
+            return ids
+        keep = [
+            body not in self.polygons or polygons_overlap(self.polygon(body), shape)
+            for body in ids.tolist()
+        ]
+        return ids[np.array(keep, bool)]
+
+    def _tile_entries(self, tilemap):
+        store = getattr(tilemap, "store", tilemap)
+        if store is not None and hasattr(store, "geometry_version"):  # TileStore
+            key = (id(store), store.geometry_version, self.cell_size)
+            if self._tile_grid is None or self._tile_grid[0] != key:
+                pos, size = store.pos[: store.count], store.size[: store.count]
+                self._tile_grid = (key, pos, size) + cell_entries(
+                    pos, pos + size, self.cell_size
+                )
+            return self._tile_grid[1:]
+        # Tile objects, read on every query
+        tiles = list(tilemap)
+        pos = np.array([tile.pos for tile in tiles], float).reshape(-1, 2)
+        size = np.array([tile.size for tile in tiles], float).reshape(-1, 2)
+        return (pos, size) + cell_entries(pos, pos + size, self.cell_size)
+
+    def tile_pairs(self, tilemap, ids=None):
+        """(K, 2) (body id, tile index) pairs of bodies touching tiles.
+
+        tilemap: a Tilemap or TileStore; tile indices work with tilemap[index].
+        The tile grid of a TileStore is cached until its tiles move.
+        ids: bodies to test, defaults to all
+        """
+        ids = self.ids() if ids is None else np.asarray(ids)
+        tile_pos, tile_size, tile_keys, tile_owners = self._tile_entries(tilemap)
+        if not len(ids) or not len(tile_keys):
+            return np.zeros((0, 2), int)
+        keys, owners = cell_entries(
+            self.pos[ids], self.pos[ids] + self.size[ids], self.cell_size
+        )
+        a, b = shared_cells(keys, owners, tile_keys, tile_owners)
+        bodies = ids[a]
+        touching = rects_overlap(
+            self.pos[bodies], self.size[bodies], tile_pos[b], tile_size[b]
+        )
+        pairs = np.unique(
+            bodies[touching].astype(np.int64) * len(tile_pos) + b[touching]
+        )
+        pairs = np.stack([pairs // len(tile_pos), pairs % len(tile_pos)], axis=1)
+        if self.polygons and len(pairs):
+            keep = np.ones(len(pairs), bool)
+            for row, (body, tile) in enumerate(pairs.tolist()):
+                if body in self.polygons:
+                    shape = rect_polygon(tile_pos[tile], tile_size[tile])
+                    keep[row] = polygons_overlap(self.polygon(body), shape)
+            pairs = pairs[keep]
+        return pairs
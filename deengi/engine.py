@@ -1,47 +1,78 @@
+import asyncio
+import inspect
+import logging
+import time
 from functools import partial
 import pygame
 
-from deengi import renderables
 from deengi.renderables.renderable import Renderable
 
 
-from deengi.camera import Camera2D
+from deengi.assets import AssetLoader
+from deengi.camera import Camera2D, CameraMotion
 from deengi.input_handler import InputHandler
-from deengi.renderer import Renderer
+from deengi.renderer import Layer, LayerVisibility, Renderer
+from deengi.replay import InputRecording, ReplayInput
+from deengi.scheduler import Scheduler
 
+from deengi.renderables.dialog import LoadingDialog
 from deengi.renderables.ui import Tooltip
 
 
+def _task_finished(task):
+    """Whether an asyncio or Scheduler task is over"""
+    if isinstance(task, asyncio.Future):
+        return task.done()
+    return task.done or task.cancelled
+
+
+def _log_task_error(task):
+    if not task.cancelled() and task.exception() is not None:
+        logging.error("Async update callback failed", exc_info=task.exception())
+
+
 class Engine:
-    def __init__(self, title="Engine", debug=True, screen_size=(800, 600)):
+    def __init__(self, title="Engine", debug=True, screen_size=(800, 600), audio=False):
+        """The display and fonts are initialized here, the other pygame modules
+        (mixer, joystick, ...) before the first frame; audio=True initializes
+        the mixer right away, call init_subsystems() to get all of them now.
+        """
         self.debugmode = debug
-        pygame.init()
+        pygame.display.init()
+        pygame.font.init()
+        if audio:
+            pygame.mixer.init()
+        self._subsystems_ready = False
         self.layers = {
-            "background": [],
-            "main": [],
-            "ui": [],
-            "overlay": [],
-            "debug": [],
-        }
-        self.layer_visibility = {
-            "background": True,
-            "main": True,
-            "ui": True,
-            "overlay": True,  # Tooltips or dialogs can default to hidden
-            "debug": debug,
+            "background": Layer("background"),
+            "main": Layer("main"),
+            "ui": Layer("ui"),
+            "overlay": Layer("overlay"),  # Tooltips or dialogs can default to hidden
+            "debug": Layer("debug", visible=debug),
         }
         self.clock = pygame.time.Clock()
         self.screen = pygame.display.set_mode(screen_size)
         pygame.display.set_caption(title)
 
         self.camera = Camera2D(self.screen, zoom=(1, 1), debug=self.debugmode)
+        self.camera_motion = CameraMotion(self.camera)
         pygame.screen_coords = self.camera.screen_coords
 
         self.renderer = Renderer(self.screen, camera=self.camera, debug=self.debugmode)
+        self.ui_renderer = self.renderer  # draws the layers not in world_layers
+        self.render_scale = 1.0  # internal resolution relative to the window
+        self.world_layers = ("background", "main")  # what viewports show by default
+        self.main_view = True  # draw the world layers through the main camera
+        self.viewports = []
 
         self.input_handler = InputHandler(
-            screen_coords=self.camera.screen_coords, debug=self.debugmode
+            screen_coords=self.camera.screen_coords,
+            debug=self.debugmode,
+            camera=self.camera,
         )
+        self.input_handler.on_event(pygame.QUIT, lambda event: self.quit())
+        self._recording_path = None
+        self.assets = AssetLoader()
         self.setup_camera()
         self.show_background()
 
@@ -51,6 +82,14 @@ class Engine:
         self.bind_key("p", self.toggle_pause, "Pause")
 
         self.update_callbacks = []
+        self.scheduler = Scheduler()
+        self.simulations = []
+        self._quality = None  # QualityController, created on first use
+        self._callback_tasks = {}  # async update callback -> its running task
+        self._async_loop = None  # event loop while in run_async
+        self.dt = 0.0  # seconds since the last frame
+        self.capture = None  # FrameCapture while capturing, see start_capture
+        self._entity_worlds = {}  # EntityWorld -> (layer, renderer, update callback)
 
     def setup_camera(
         self,
@@ -66,80 +105,404 @@ class Engine:
         self.camera.set_rotation(rotation)
         self.camera.set_isometry(isometry)
         self.camera.zoom(zoom)
-        if mousewheelzoom:
+        if mousewheelzoom and mousedrag_pan:
+            self.input_handler.bind_camera_motion(self.camera_motion, button=1)
+        elif mousewheelzoom:
             self.input_handler.bind_camera_zoom_to_mousewheel(self.renderer.camera)
-        if mousedrag_pan:
+        elif mousedrag_pan:
             self.input_handler.bind_camera_pan_to_mousedrag(
                 self.renderer.camera, button=1
             )
         if arrow_rotate:
             self.input_handler.bind_camera_rotate_to_arrow_keys(self.renderer.camera)
 
+    def init_subsystems(self):
+        """Initialize the pygame modules the engine did not need up front"""
+        if not self._subsystems_ready:
+            pygame.init()  # skips modules already initialized
+            self._subsystems_ready = True
+
+    @property
+    def quality(self):
+        """QualityController with the engine's knobs, see enable_adaptive_quality"""
+        if self._quality is None:
+            from deengi.quality import QualityController
+
+            self._quality = QualityController(enabled=False)
+            self.register_quality_knobs()
+        return self._quality
+
     def update(self):
+        tasks = self._callback_tasks
         for callback in self.update_callbacks:
-            callback()
-
-    def run(self):
-        while True:
-            # handle events
-            self.clock.tick(60)
-            if not self.paused:
-                self.update()
-
-            self.input_handler.update()
-
-            for layer_name in ["background", "main", "ui", "overlay", "debug"]:
-                if not self.layer_visibility[layer_name]:
-                    continue
-                for renderable in self.layers[layer_name]:
-                    if isinstance(renderable, Renderable) and renderable.visible:
-                        renderable.render(self.renderer)
-                    elif isinstance(renderable, tuple):
-                        callback, data_dict = renderable
-                        callback(**data_dict)
-
-            if self.debugmode:  # putnthis in overlay
-                self.renderer.draw_debug()
-            # render calls
-            self.screen.blit(self.renderer.display, (0, 0))
-            pygame.display.update()
+            task = tasks.get(callback)
+            if task is not None:
+                if not _task_finished(task):
+                    continue  # an async callback runs once at a time
+                del tasks[callback]
+            result = callback()
+            if inspect.isawaitable(result):
+                if self._async_loop is not None:
+                    task = asyncio.ensure_future(result)
+                    task.add_done_callback(_log_task_error)
+                else:
+                    task = self.scheduler.start(result)
+                tasks[callback] = task
+        self.scheduler.tick(self.dt)
+
+    def frame(self, dt):
+        """Update and draw a single frame, dt seconds after the last one"""
+        start = time.perf_counter()
+        if not self._subsystems_ready:
+            self.init_subsystems()
+        self.dt = dt = self.input_handler.begin_frame(dt)
+        # handle events
+        if not self.paused:
+            self.update()
+
+        self.input_handler.update()
+        self.camera_motion.update(dt)
+        self.assets.update()
+
+        # world layers at the internal resolution, the others on the window
+        layers = self.layers.items()
+        if self.main_view:
+            for name, layer in layers:
+                if layer.visible and name in self.world_layers:
+                    layer.render(self.renderer)
+        if self.renderer.display is not self.screen:
+            pygame.transform.scale(
+                self.renderer.display, self.screen.get_size(), self.screen
+            )
+        for name, layer in layers:
+            if layer.visible and name not in self.world_layers:
+                layer.render(self.ui_renderer)
+
+        if self.debugmode:  # putnthis in overlay
+            self.ui_renderer.draw_debug()
+        if self.capture is not None:
+            self.capture.capture(self.screen, dt)
+        pygame.display.update()
+        if self._quality is not None and self._quality.enabled:
+            self._quality.update(time.perf_counter() - start, dt)
+
+    def run(self, fps=60, max_frames=None):
+        """Main loop, runs until quit.
+
+        With max_frames, or while replaying input, it returns after that many
+        frames or the end of the replay, with the duration of every frame in
+        seconds, for benchmarks. fps=0 runs unthrottled.
+        """
+        if max_frames is None and not self.replaying:
+            while True:
+                self.frame(self.clock.tick(fps) / 1000)
+
+        frame_times = []
+        while max_frames is None or len(frame_times) < max_frames:
+            if self.replaying and self.input_handler.replay_finished:
+                break
+            dt = self.clock.tick(fps) / 1000
+            start = time.perf_counter()
+            self.frame(dt)
+            frame_times.append(time.perf_counter() - start)
+        return frame_times
+
+    async def run_async(self, fps=60):
+        """Main loop for asyncio programs, await it instead of calling run().
+
+        Between frames it sleeps on the event loop until the next frame
+        deadline, so other tasks run in the idle time. Deadlines advance by
+        a fixed period to avoid drift; after falling behind by more than a
+        frame the loop resyncs instead of rushing frames to catch up.
+        Async update callbacks run as tasks on the event loop, off the
+        frame's critical path; one still running is not called again.
+        """
+        loop = asyncio.get_running_loop()
+        period = 1 / fps
+        last = deadline = loop.time()
+        self._async_loop = loop
+        try:
+            while True:
+                now = loop.time()
+                self.frame(now - last)
+                last = now
+
+                deadline += period
+                now = loop.time()
+                if deadline < now - period:
+                    deadline = now
+                await asyncio.sleep(max(0.0, deadline - now))
+        finally:
+            self._async_loop = None
+            for callback, task in list(self._callback_tasks.items()):
+                if isinstance(task, asyncio.Task):
+                    task.cancel()
+                    del self._callback_tasks[callback]
+
+    @property
+    def layer_visibility(self):
+        """layer name -> visible, writing to it shows or hides the layer"""
+        return LayerVisibility(self.layers)
+
+    @layer_visibility.setter
+    def layer_visibility(self, visibility):
+        self.layer_visibility.update(visibility)
 
     def clear_layer(self, layer=None):
-        self.layers[layer] = []
+        self.layers[layer].clear()
 
     def clear(self, *layers):
         if not layers:
             layers = self.layers
         for l in layers:
             if l in self.layers:
-                self.layers[l] = []
+                self.layers[l].clear()
             else:
                 raise KeyError(f"layer {l=} not in {self.layers=}")
 
-    def add_to_layer(self, layer="main", *renderables):
+    def add_to_layer(self, layer="main", *renderables, z=0):
+        """Returns a handle per renderable, for remove_from_layer"""
         if layer not in self.layers:
             raise KeyError(
                 f"Layer {layer} not found in engine Layers: {list(self.layers.keys())}"
             )
-        for renderable in renderables:
-            self.layers[layer].append(renderable)
+        return [self.layers[layer].add(renderable, z) for renderable in renderables]
+
+    def remove_from_layer(self, layer, *items):
+        """Remove renderables, by handle or the renderable itself"""
+        for item in items:
+            self.layers[layer].remove(item)
 
     def add_tooltip(self, renderable, tooltip_message, color=None):
         tooltip = Tooltip(tooltip_message, color=color)
-        self.add_to_layer("overlay", tooltip)
-        self.input_handler.register_hover(renderable, tooltip.set_hover)
+        overlay = self.layers["overlay"]
+
+        def set_hover(state):
+            # only in the overlay while hovered, idle tooltips cost nothing
+            if state and tooltip not in overlay:
+                overlay.add(tooltip)
+            elif not state and tooltip in overlay:
+                overlay.remove(tooltip)
+            tooltip.set_hover(state, self.input_handler.window_mouse_pos)
+
+        self.input_handler.register_hover(renderable, set_hover)
+        return tooltip
 
     def add_callback(self, callback):
+        """Call callback every unpaused frame.
+
+        Async callbacks run as tasks, one at a time: on the event loop under
+        run_async, on the scheduler under run, where they can only await
+        deengi.scheduler.sleep() and next_frame() and anything else raises
+        a TypeError.
+        """
         self.update_callbacks.append(callback)
 
+    def remove_callback(self, callback):
+        """Stop calling callback, an async one still running is cancelled"""
+        self.update_callbacks.remove(callback)
+        task = self._callback_tasks.pop(callback, None)
+        if task is not None and not _task_finished(task):
+            task.cancel()
+
+    def after(self, delay, callback):
+        """Call callback once after delay seconds of unpaused game time"""
+        return self.scheduler.after(delay, callback)
+
+    def every(self, interval, callback):
+        """Call callback every interval seconds of unpaused game time"""
+        return self.scheduler.every(interval, callback)
+
+    def start_coroutine(self, coroutine):
+        """Run a generator or async coroutine alongside the game.
+
+        It can yield None / await next_frame() to continue next frame and
+        yield seconds / await deengi.scheduler.sleep(seconds) to wait.
+        """
+        return self.scheduler.start(coroutine)
+
+    def register_quality_knobs(self):
+        """The engine's own knobs, degraded in this order when frames run long"""
+        renderer = self.renderer
+        self.quality.register(
+            "grid labels",
+            [True, False],
+            lambda on: setattr(renderer, "grid_labels", on),
+        )
+        self.quality.register(
+            "particle cap",
+            [None, 500, 200, 50],
+            lambda cap: setattr(renderer, "max_particles", cap),
+            priority=1,
+        )
+        self.quality.register(
+            "glow", [True, False], lambda on: setattr(renderer, "glow", on), priority=2
+        )
+        self.quality.register(
+            "render scale", [1.0, 0.75, 0.5], self.set_render_scale, priority=3
+        )
+
+    def set_render_scale(self, scale):
+        """Render the world layers at scale times the window resolution and
+        upscale them once per frame.
+
+        The other layers (ui, overlay, debug) are drawn onto the window after
+        that, at full resolution, so UI positions stay in window pixels.
+        Camera and mouse input follow: world hit tests use render surface
+        pixels, buttons window pixels.
+        """
+        width, height = self.screen.get_size()
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        if size == self.renderer.display.get_size():
+            return
+        if size == (width, height):
+            display = self.screen
+        else:
+            display = pygame.Surface(size).convert()
+        self.renderer.set_display(display)
+        self.camera.set_surface(display)
+        self.render_scale = scale
+        if display is self.screen:
+            self.ui_renderer = self.renderer
+        else:  # on the window, with game coordinates mapped to window pixels
+            scale = (width / size[0], height / size[1])
+            self.ui_renderer = self.renderer.view(self.screen, self.camera, scale)
+            self.ui_renderer.interactive = True
+        self.input_handler.pixel_scale = (size[0] / width, size[1] / height)
+        self.input_handler.mouse_pos = self.input_handler.mouse_display_pos()
+        self.input_handler.invalidate_hover()
+
+    def add_viewport(self, rect, camera=None, layers=None, **kwargs):
+        """Draw layers (default world_layers) again through camera into rect.
+
+        The viewport is drawn in the ui layer, so rect is in window pixels
+        and it renders at window resolution. For a split screen, set
+        main_view = False and add one viewport per player; the main camera
+        keeps handling mouse input.
+        """
+        from deengi.viewport import Viewport
+
+        layers = [self.layers[name] for name in (layers or self.world_layers)]
+        viewport = Viewport(rect, layers, self.screen, camera, **kwargs)
+        if camera is None:  # start where the main camera looks
+            viewport.camera.set_game_position(self.camera.position)
+            sx = self.screen.get_width() / self.renderer.display.get_width()
+            sy = self.screen.get_height() / self.renderer.display.get_height()
+            zoom_x, zoom_y = self.camera.zoom_level
+            viewport.camera.zoom_level = (zoom_x * sx, zoom_y * sy)
+        self.viewports.append(viewport)
+        self.add_to_layer("ui", viewport, z=-1)
+        return viewport
+
+    def remove_viewport(self, viewport):
+        self.viewports.remove(viewport)
+        self.remove_from_layer("ui", viewport)
+
+    def follow(self, target, smooth_time=0.25):
+        """Let the camera follow target (anything with a position) smoothly"""
+        self.camera_motion.follow(target, smooth_time)
+
+    def add_entities(self, world, layer="main", z=0):
+        """Update world's systems every frame and draw its entities in layer"""
+        from deengi.entities import EntityRenderer
+
+        renderer = EntityRenderer(world)
+        callback = lambda: world.update(self.dt)
+        self.add_callback(callback)
+        self.add_to_layer(layer, renderer, z=z)
+        self._entity_worlds[world] = (layer, renderer, callback)
+        return renderer
+
+    def remove_entities(self, world):
+        """Stop updating and drawing a world added with add_entities"""
+        layer, renderer, callback = self._entity_worlds.pop(world)
+        self.remove_callback(callback)
+        self.remove_from_layer(layer, renderer)
+
+    def add_minimap(self, tilemap, rect, **kwargs):
+        """Overview of tilemap in rect, showing the main camera's view"""
+        from deengi.renderables.minimap import Minimap
+
+        minimap = Minimap(tilemap, rect, **kwargs)
+        self.add_to_layer("ui", minimap)
+        return minimap
+
+    def enable_adaptive_quality(self, target_fps=60):
+        """Lower quality knobs while frames take longer than 1 / target_fps.
+
+        Tune thresholds and delays on engine.quality, renderables add their
+        own knobs with engine.quality.register(name, levels, apply, priority).
+        """
+        self.quality.budget = 1 / target_fps
+        self.quality.enabled = True
+        return self.quality
+
+    def start_capture(self, seconds=5, fps=30):
+        """Keep the last seconds of rendered frames, for save_clip.
+
+        Frames are captured from the window, UI included; the ring takes
+        seconds * fps * width * height * 4 bytes.
+        """
+        from deengi.capture import FrameCapture
+
+        self.stop_capture()
+        self.capture = FrameCapture.for_surface(self.screen, seconds, fps)
+        return self.capture
+
+    def save_clip(self, path, seconds=None, format="png"):
+        """Write the last seconds of frames in the background, returns a Future"""
+        if self.capture is None:
+            raise RuntimeError("start_capture() first")
+        return self.capture.dump(path, seconds, format)
+
+    def stop_capture(self):
+        if self.capture is not None:
+            self.capture.close()
+            self.capture = None
+
+    def record_input(self, path):
+        """Record the input of this session, saved to path on quit or stop_recording"""
+        self._recording_path = path
+        return self.input_handler.record()
+
+    def stop_recording(self):
+        recording = self.input_handler.stop_recording()
+        if recording is not None and self._recording_path is not None:
+            recording.save(self._recording_path)
+        self._recording_path = None
+        return recording
+
+    def replay_input(self, path):
+        """Play back a recorded session instead of live input, see run()"""
+        self.input_handler.replay(InputRecording.load(path))
+
+    @property
+    def replaying(self):
+        return isinstance(self.input_handler.input, ReplayInput)
+
+    def add_simulation(self, simulation):
+        """Start a deengi.simulation.Simulation, it is stopped on quit.
+
+        Render from simulation.latest or simulation.interpolated(field).
+        """
+        simulation.start()
+        self.simulations.append(simulation)
+        return simulation
+
     def show_debug(self, statement):
         self.renderer.debug_statements.append(statement)
 
     def show_scene(self, scene):
+        """Show scene in the ui layer, after preloading the images in scene.assets"""
+        self.assets.preload(*getattr(scene, "assets", ()))
+        if not self.assets.finished:
+            self.clear_layer("ui")
+            self.add_to_layer("ui", LoadingDialog(self.assets))
+            self.assets.on_finished(partial(self.show_scene, scene))
+            return
         self.clear_layer("ui")
         self.input_handler.reset()  # is this appropiate?
         self.input_handler.bind_options_to_keys(scene.options)
-        self.layers["ui"] = []
         self.add_to_layer("ui", scene)
 
     def show_dialog(self, scene):
@@ -168,9 +531,9 @@ class Engine:
         else:
             raise ValueError(f"Argument start must be tuple of ints")
 
-        grid = renderables.Grid(
-            (startx, startx + xlines), (starty, starty + ylines), **kwargs
-        )
+        from deengi.renderables.tiles import Grid
+
+        grid = Grid((startx, startx + xlines), (starty, starty + ylines), **kwargs)
         self.add_to_layer(
             "background",
             grid,
@@ -203,5 +566,11 @@ class Engine:
         return self.input_handler.get_keybinds()
 
     def quit(self):
+        if self._recording_path is not None:
+            self.stop_recording()
+        self.assets.close()
+        for simulation in self.simulations:
+            simulation.stop()
+        self.stop_capture()
         pygame.quit()
         quit()
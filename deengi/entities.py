@@ -0,0 +1,361 @@
+import numpy as np
+import pygame
+
+from deengi.assets import load_image
+from deengi.renderables.renderable import Renderable
+from deengi.renderables.tilestore import image_render_size
+from deengi.renderables.variants import variant_cache
+
+# name -> (dtype, shape of one value)
+COMPONENTS = {
+    "position": (np.float64, (2,)),
+    "velocity": (np.float64, (2,)),
+    "sprite": (np.int32, ()),
+    "color": (np.uint8, (3,)),
+    "radius": (np.float32, ()),
+}
+
+
+def register_component(name, dtype, shape=()):
+    """Make a component type known to every EntityWorld"""
+    if hasattr(Archetype, name) or name in ("names", "count", "entities", "columns"):
+        raise ValueError(f"{name!r} is reserved, pick another component name")
+    COMPONENTS[name] = (np.dtype(dtype), tuple(shape))
+
+
+class Archetype:
+    """All entities with exactly the same set of components.
+
+    Each component is a NumPy column, rows are packed: removing an entity
+    moves the last row into its place. Systems work on whole columns.
+    """
+
+    def __init__(self, names, capacity=64):
+        self.names = frozenset(names)
+        self.count = 0
+        self.entities = np.zeros(capacity, np.int64)  # entity id of each row
+        self.columns = {}
+        for name in sorted(self.names):
+            dtype, shape = COMPONENTS[name]
+            self.columns[name] = np.zeros((capacity,) + shape, dtype)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, name):
+        """Column of the live rows, a view: write to it in place"""
+        return self.columns[name][: self.count]
+
+    def __getattr__(self, name):
+        columns = self.__dict__.get("columns", {})
+        if name in columns:
+            return columns[name][: self.count]
+        raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        columns = self.__dict__.get("columns")
+        if columns is not None and name in columns:  # archetype.position += ...
+            columns[name][: self.count] = value
+        else:
+            super().__setattr__(name, value)
+
+    @property
+    def capacity(self):
+        return len(self.entities)
+
+    def reserve(self, capacity):
+        if capacity <= self.capacity:
+            return
+        capacity = max(capacity, 2 * self.capacity)
+        for name, old in list(self.columns.items()) + [("entities", self.entities)]:
+            new = np.zeros((capacity,) + old.shape[1:], old.dtype)
+            new[: self.count] = old[: self.count]
+            if name == "entities":
+                self.entities = new
+            else:
+                self.columns[name] = new
+
+    def append(self, entities, values):
+        """Add rows for entities, values maps names to (broadcastable) values"""
+        start, n = self.count, len(entities)
+        self.reserve(start + n)
+        rows = slice(start, start + n)
+        self.entities[rows] = entities
+        for name, column in self.columns.items():
+            column[rows] = values.get(name, 0)
+        self.count += n
+        return np.arange(start, start + n)
+
+    def remove_row(self, row):
+        """Fill the row with the last one, returns the entity that moved or None"""
+        last = self.count - 1
+        self.count = last
+        if row == last:
+            return None
+        for column in self.columns.values():
+            column[row] = column[last]
+        self.entities[row] = self.entities[last]
+        return int(self.entities[row])
+
+
+class EntityWorld:
+    """Entities as rows of archetype tables, updated by vectorized systems.
+
+    create(position=..., velocity=...) puts an entity into the archetype of
+    its component set. A system is a function(archetype, dt) run once per
+    archetype that has its components, working on whole columns:
+
+        def move(entities, dt):
+            entities.position += entities.velocity * dt
+
+        world.add_system(move, "position", "velocity")
+
+    Engine.add_entities(world) runs the systems every frame and draws the
+    entities that have a position and a sprite or a color.
+    """
+
+    def __init__(self):
+        self.archetypes = {}  # frozenset of names -> Archetype
+        self.systems = []  # (function, names)
+        self.sprites = []  # asset table, sprite component values index it
+        self._sprite_index = {}
+        self._archetype_of = []  # entity id -> Archetype or None when removed
+        self._row_of = np.zeros(64, np.int64)  # entity id -> row in its archetype
+        self._free = []
+
+    def __len__(self):
+        return sum(len(archetype) for archetype in self.archetypes.values())
+
+    def __contains__(self, entity):
+        return (
+            0 <= entity < len(self._archetype_of)
+            and self._archetype_of[entity] is not None
+        )
+
+    def archetype(self, names):
+        names = frozenset(names)
+        unknown = names - COMPONENTS.keys()
+        if unknown:
+            raise KeyError(
+                f"unknown components {sorted(unknown)}, see register_component"
+            )
+        if names not in self.archetypes:
+            self.archetypes[names] = Archetype(names)
+        return self.archetypes[names]
+
+    def add_sprite(self, img, colorkey=None):
+        """Index of img (file path or Surface) in the sprite table, loading it once"""
+        key = img if isinstance(img, pygame.Surface) else (str(img), colorkey)
+        if key not in self._sprite_index:
+            surface = (
+                img if isinstance(img, pygame.Surface) else load_image(img, colorkey)
+            )
+            self._sprite_index[key] = len(self.sprites)
+            self.sprites.append(surface)
+        return self._sprite_index[key]
+
+    # entities
+    def _new_ids(self, n):
+        reused = [self._free.pop() for _ in range(min(n, len(self._free)))]
+        start = len(self._archetype_of)
+        self._archetype_of.extend([None] * (n - len(reused)))
+        ids = np.array(reused + list(range(start, len(self._archetype_of))), np.int64)
+        if len(self._archetype_of) > len(self._row_of):
+            grown = np.zeros(
+                max(len(self._archetype_of), 2 * len(self._row_of)), np.int64
+            )
+            grown[: len(self._row_of)] = self._row_of
+            self._row_of = grown
+        return ids
+
+    def _place(self, ids, archetype, values):
+        rows = archetype.append(ids, values)
+        self._row_of[ids] = rows
+        for entity in ids.tolist():
+            self._archetype_of[entity] = archetype
+
+    def create(self, **components):
+        """Add one entity with the given component values, returns its id"""
+        return int(self.create_many(1, **components)[0])
+
+    def create_many(self, count, **components):
+        """Add count entities sharing one archetype, values are arrays of
+        count rows or broadcast to all. Returns the entity ids."""
+        ids = self._new_ids(count)
+        self._place(ids, self.archetype(components), components)
+        return ids
+
+    def remove(self, entity):
+        archetype = self._archetype_of[entity]
+        if archetype is None:
+            raise KeyError(f"no entity {entity}")
+        moved = archetype.remove_row(self._row_of[entity])
+        if moved is not None:
+            self._row_of[moved] = self._row_of[entity]
+        self._archetype_of[entity] = None
+        self._free.append(entity)
+
+    def get(self, entity, name):
+        """Component value of one entity, a view for array components"""
+        archetype = self._archetype_of[entity]
+        return archetype.columns[name][self._row_of[entity]]
+
+    def set(self, entity, name, value):
+        archetype = self._archetype_of[entity]
+        archetype.columns[name][self._row_of[entity]] = value
+
+    def components(self, entity):
+        archetype = self._archetype_of[entity]
+        row = self._row_of[entity]
+        return {name: column[row].copy() for name, column in archetype.columns.items()}
+
+    def add_components(self, entity, **components):
+        """Give an entity more components, moving it to another archetype"""
+        values = self.components(entity)
+        values.update(components)
+        self._move(entity, values)
+
+    def remove_components(self, entity, *names):
+        values = self.components(entity)
+        for name in names:
+            values.pop(name, None)
+        self._move(entity, values)
+
+    def _move(self, entity, values):
+        archetype = self._archetype_of[entity]
+        moved = archetype.remove_row(self._row_of[entity])
+        if moved is not None:
+            self._row_of[moved] = self._row_of[entity]
+        self._place(np.array([entity]), self.archetype(values), values)
+
+    # systems
+    def query(self, *names):
+        """Non empty archetypes having all the named components"""
+        names = set(names)
+        return [
+            archetype
+            for archetype in self.archetypes.values()
+            if archetype.count and names <= archetype.names
+        ]
+
+    def add_system(self, function, *names):
+        """Run function(archetype, dt) on every archetype with these components"""
+        self.systems.append((function, names))
+        return function
+
+    def remove_system(self, function):
+        self.systems = [system for system in self.systems if system[0] is not function]
+
+    def update(self, dt):
+        for function, names in self.systems:
+            for archetype in self.query(*names):
+                function(archetype, dt)
+
+
+def move(entities, dt):
+    """System moving entities by their velocity"""
+    entities.position += entities.velocity * dt
+
+
+class EntityRenderer(Renderable):
+    """Draws an EntityWorld straight from its columns.
+
+    Entities with a sprite are blitted centered on their position, scaled
+    like tile images; entities with a color and no sprite are circles of
+    their radius (default 0.5). Only entities in the camera's view are
+    projected, all at once per archetype.
+    """
+
+    def __init__(self, world, default_radius=0.5):
+        self.world = world
+        self.default_radius = default_radius
+        self._circles = {}  # (color, pixel radius) -> surface
+        self._sprite_margin = None  # (sprite count, zoom, margin)
+
+    def margin(self, archetype, zoom):
+        """How far past their positions the archetype's entities draw, in world units"""
+        if "sprite" in archetype.names:
+            return self.sprite_margin(zoom)
+        if "radius" in archetype.names:
+            return max(float(archetype.radius.max()), 0.0)
+        return self.default_radius
+
+    def sprite_margin(self, zoom):
+        """Half the largest scaled sprite extent, in world units"""
+        sprites = self.world.sprites
+        cached = self._sprite_margin
+        if cached is None or cached[:2] != (len(sprites), zoom):
+            extent = max(
+                (max(image_render_size(sprite.get_size(), zoom)) for sprite in sprites),
+                default=0,
+            )
+            cached = self._sprite_margin = (len(sprites), zoom, extent / 2 / zoom)
+        return cached[2]
+
+    def render(self, renderer):
+        camera = renderer.camera
+        display = renderer.display
+        x, y, w, h = camera.view_rect(display.get_size())
+        zoom = camera.zoom_level[0]
+
+        for archetype in self.world.query("position"):
+            if "sprite" not in archetype.names and "color" not in archetype.names:
+                continue
+            margin = self.margin(archetype, zoom)
+            low = np.array((x - margin, y - margin))
+            high = np.array((x + w + margin, y + h + margin))
+            position = archetype.position
+            shown = np.flatnonzero(
+                np.all((position >= low) & (position <= high), axis=1)
+            )
+            if not len(shown):
+                continue
+            screen = camera.screen_coords_array(position[shown])
+            if "sprite" in archetype.names:
+                self.draw_sprites(display, archetype.sprite[shown], screen, zoom)
+            else:
+                if "radius" in archetype.names:
+                    radii = archetype.radius[shown] * zoom
+                else:
+                    radii = np.full(len(shown), self.default_radius * zoom)
+                self.draw_circles(display, archetype.color[shown], screen, radii)
+
+    def circle(self, color, radius):
+        """Circle stamp, drawn once per color and pixel radius"""
+        key = (color, radius)
+        stamp = self._circles.get(key)
+        if stamp is None:
+            if len(self._circles) > 1024:
+                self._circles.clear()
+            stamp = pygame.Surface((2 * radius, 2 * radius), pygame.SRCALPHA)
+            pygame.draw.circle(stamp, color, (radius, radius), radius)
+            stamp = self._circles[key] = stamp
+        return stamp
+
+    def draw_circles(self, display, colors, screen, radii):
+        """One blits call of cached circle stamps"""
+        radii = np.maximum(np.rint(radii), 1).astype(np.int64)
+        keys = (radii << 24) | (colors.astype(np.int64) @ (1 << 16, 1 << 8, 1))
+        unique, inverse = np.unique(keys, return_inverse=True)
+        stamps = [
+            self.circle(((key >> 16) & 255, (key >> 8) & 255, key & 255), key >> 24)
+            for key in unique.tolist()
+        ]
+        offsets = (screen - radii[:, None]).tolist()
+        display.blits(
+            zip(map(stamps.__getitem__, inverse.tolist()), offsets), doreturn=False
+        )
+
+    def draw_sprites(self, display, sprites, screen, zoom):
+        """One blits call for all entities, scaling each sprite once"""
+        unique, inverse = np.unique(sprites, return_inverse=True)
+        images, halves = [], []
+        for sprite in unique.tolist():
+            source = self.world.sprites[sprite]
+            size = image_render_size(source.get_size(), zoom)
+            images.append(variant_cache.scaled(source, size))
+            halves.append((size[0] // 2, size[1] // 2))
+        offsets = (screen - np.array(halves)[inverse]).tolist()
+        display.blits(
+            zip(map(images.__getitem__, inverse.tolist()), offsets), doreturn=False
+        )
@@ -1,14 +1,47 @@
+import hashlib
+import json
+import logging
+import os
 from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
 import pygame, sys
 
+from deengi.assets import load_image
+
 
 # Funcs/Classes ---------------------------------------------- #
-def clip(surf, x, y, x_size, y_size):
-    handle_surf = surf.copy()
-    clipR = pygame.Rect(x, y, x_size, y_size)
-    handle_surf.set_clip(clipR)
-    image = surf.subsurface(handle_surf.get_clip())
-    return image.copy()
+def cache_dir():
+    """Directory for derived data, DEENGI_CACHE_DIR or the user cache directory"""
+    if "DEENGI_CACHE_DIR" in os.environ:
+        return Path(os.environ["DEENGI_CACHE_DIR"])
+    return Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "deengi"
+
+
+def scan_glyph_spans(font_img):
+    """(x, width) of each glyph, separated by pixels with red 127 in the top row"""
+    top_row = font_img.subsurface((0, 0, font_img.get_width(), 1))
+    separators = np.flatnonzero(pygame.surfarray.array3d(top_row)[:, 0, 0] == 127)
+    starts = np.concatenate([[0], separators[:-1] + 1])
+    return list(zip(starts.tolist(), (separators - starts).tolist()))
+
+
+def glyph_spans(path, font_img):
+    """scan_glyph_spans, cached on disk by the hash of the font file"""
+    digest = hashlib.sha1(Path(path).read_bytes()).hexdigest()
+    cache_file = cache_dir() / "fonts" / f"{digest}.json"
+    try:
+        return [tuple(span) for span in json.loads(cache_file.read_text())]
+    except (OSError, ValueError):
+        pass
+    spans = scan_glyph_spans(font_img)
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        cache_file.write_text(json.dumps(spans))
+    except OSError as e:
+        logging.debug(f"Could not cache glyph metrics of {path}: {e}")
+    return spans
 
 
 class Font:
@@ -107,23 +140,16 @@ class Font:
             "%",
             "€",
         ]
-        font_img = pygame.image.load(path).convert()
+        font_img = load_image(path, alpha=False)
         self.height = font_img.get_height()
-        current_char_width = 0
-        self.characters = {}
         self.missing_char_replacement = "??"
-        character_count = 0
-        for x in range(font_img.get_width()):
-            c = font_img.get_at((x, 0))
-            if c[0] == 127:
-                char_img = clip(
-                    font_img, x - current_char_width, 0, current_char_width, self.height
-                )
-                self.characters[self.character_order[character_count]] = char_img.copy()
-                character_count += 1
-                current_char_width = 0
-            else:
-                current_char_width += 1
+        # glyphs are subsurfaces of the shared sheet, nothing is copied
+        self.characters = {
+            char: font_img.subsurface((x, 0, width, self.height))
+            for char, (x, width) in zip(
+                self.character_order, glyph_spans(path, font_img)
+            )
+        }
         self.space_width = self.characters["A"].get_width()
 
     def character(self, char):
@@ -132,6 +158,16 @@ class Font:
         else:
             return self.characters[char]
 
+    def text_size(self, text, size=None):
+        """(width, height) of the surface() of a text line, without rendering it"""
+        scale = int((size or self.height) / self.height)
+        width = sum(
+            (self.space_width if char == " " else self.character(char).get_width())
+            + self.spacing
+            for char in text
+        )
+        return width * scale, self.height * scale
+
     def surface(self, text, size=None, color=(10, 10, 10)):
         if not size:
             size = self.height
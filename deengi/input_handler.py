@@ -1,7 +1,11 @@
+import logging
+import math
+from collections import defaultdict
 from functools import partial
 import pygame as pg
 
 from .renderables.dialog import Option
+from .replay import LiveInput, RecordingInput, ReplayInput
 
 
 class Button:
@@ -12,6 +16,8 @@ class Button:
         self.callback = callback
         self.hovered = False
         self.pressed = False
+        self._surface = None  # retained (surface, margin), see render
+        self._surface_key = None
 
     def release(self):
         self.pressed = False
@@ -20,21 +26,93 @@ class Button:
     def press(self):
         self.pressed = True
 
-    def is_hovering(self, mouse_pos):
-        """Check if the mouse is over the button."""
+    def contains(self, mouse_pos):
         x, y = self.position
         w, h = self.size
-        self.hovered = x <= mouse_pos[0] <= x + w and y <= mouse_pos[1] <= y + h
-        self.pressed = min(self.pressed, self.hovered)
+        return x <= mouse_pos[0] <= x + w and y <= mouse_pos[1] <= y + h
+
+    def set_hovered(self, state):
+        self.hovered = state
+        self.pressed = self.pressed and state
+
+    def is_hovering(self, mouse_pos):
+        """Check if the mouse is over the button, and update its hover state."""
+        self.set_hovered(self.contains(mouse_pos))
         return self.hovered
 
+    def render(self, renderer):
+        """Blit the retained surface, rebuilt only when the button's state changed"""
+        key = (self.hovered, self.pressed, self.text, tuple(self.size))
+        if key != self._surface_key:
+            self._surface = renderer.button_surface(self)
+            self._surface_key = key
+        surface, margin = self._surface
+        x, y = self.position
+        renderer.display.blit(surface, (x - margin, y - margin))
+
+
+class HitGrid:
+    """Spatial hash of UI elements over screen space.
+
+    Elements need position, size and contains(pos). A hit test only looks at
+    the elements overlapping the cell under the point, in insertion order.
+    Elements that move have to be moved in the grid too.
+    """
+
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)  # (cell_x, cell_y) -> elements
+        self._cells_of = {}  # element -> its cell keys
+
+    def __len__(self):
+        return len(self._cells_of)
+
+    def _keys(self, element):
+        x, y = element.position
+        w, h = element.size
+        size = self.cell_size
+        return [
+            (cell_x, cell_y)
+            for cell_x in range(math.floor(x / size), math.floor((x + w) / size) + 1)
+            for cell_y in range(math.floor(y / size), math.floor((y + h) / size) + 1)
+        ]
+
+    def insert(self, element):
+        keys = self._cells_of[element] = self._keys(element)
+        for key in keys:
+            self.cells[key].append(element)
+
+    def remove(self, element):
+        for key in self._cells_of.pop(element, ()):
+            self.cells[key].remove(element)
+            if not self.cells[key]:
+                del self.cells[key]
+
+    def move(self, element):
+        """Re-index an element after its position or size changed"""
+        self.remove(element)
+        self.insert(element)
+
+    def at(self, pos):
+        size = self.cell_size
+        cell = self.cells.get(
+            (math.floor(pos[0] / size), math.floor(pos[1] / size)), ()
+        )
+        return [element for element in cell if element.contains(pos)]
+
+    def clear(self):
+        self.cells.clear()
+        self._cells_of.clear()
+
 
 class InputHandler:
-    def __init__(self, screen_coords=None, debug=True):
+    def __init__(self, screen_coords=None, debug=True, camera=None):
+        """camera: hover is re-checked when its view changes under a still mouse"""
         self.keypress_bindings = {}
         self.keyrelease_bindings = {}
         self.continuous_keypress_bindings = {}
         self.mousebutton_bindings = {}
+        self.mousebutton_release_bindings = {}
         self.continuous_mousebutton_bindings = {}
         
         self.all_binding_dicts = {
@@ -42,6 +120,7 @@ class InputHandler:
             "on keyrelease": self.keyrelease_bindings, 
             "key hold": self.continuous_keypress_bindings, 
             "mouse press": self.mousebutton_bindings, 
+            "mouse release": self.mousebutton_release_bindings,
             "mouse hold": self.continuous_mousebutton_bindings
         }
         self.bindings = []
@@ -50,11 +129,68 @@ class InputHandler:
         self.hoverable_rects = {}
 
         self.buttons = []
+        self.button_grid = HitGrid()
+        self.hovered_buttons = []
         self.screen_coords = screen_coords or (lambda x: x)
 
         self.debug = debug
-        
-        
+
+        self.input = LiveInput()  # source of events and key / mouse state
+        self.pixel_scale = (1, 1)  # render surface pixels per window pixel
+        # last known position on the render surface, for world hit tests
+        self.mouse_pos = pg.mouse.get_pos() if pg.display.get_init() else (0, 0)
+        # in window pixels, for buttons and other UI drawn on the window
+        self.window_mouse_pos = self.mouse_pos
+        self.hover_dirty = True  # hover is re-evaluated once in the next update
+        self.camera = camera
+        self._view_version = None  # camera view the hover state was checked for
+        self.event_handlers = {
+            pg.QUIT: self.handle_quit,
+            pg.KEYDOWN: self.handle_keydown,
+            pg.KEYUP: self.handle_keyup,
+            pg.MOUSEMOTION: self.handle_mouse_motion,
+            pg.MOUSEBUTTONDOWN: self.handle_mouse_down,
+            pg.MOUSEBUTTONUP: self.handle_mouse_up,
+        }
+
+    def to_display(self, pos):
+        """Window pixel position to the position on the render surface"""
+        sx, sy = self.pixel_scale
+        return (pos[0] * sx, pos[1] * sy) if (sx, sy) != (1, 1) else pos
+
+    def mouse_display_pos(self):
+        """Current mouse position from the input source, on the render surface"""
+        return self.to_display(self.input.mouse_pos())
+
+    def on_event(self, event_type, handler):
+        """Dispatch events of event_type to handler(event), replacing the default"""
+        self.event_handlers[event_type] = handler
+
+    def record(self):
+        """Start recording the input, returns the InputRecording being filled"""
+        self.input = RecordingInput()
+        return self.input.recording
+
+    def stop_recording(self):
+        recording = getattr(self.input, "recording", None)
+        self.input = LiveInput()
+        return recording
+
+    def replay(self, recording):
+        """Take input from an InputRecording instead of pygame"""
+        self.input = ReplayInput(recording)
+
+    @property
+    def replay_finished(self):
+        return self.input.finished
+
+    def begin_frame(self, dt):
+        """Advance the input source a frame, returns dt (the recorded one in a replay)"""
+        return self.input.begin_frame(dt)
+
+    def invalidate_hover(self):
+        """Re-check hover in the next update, for hoverables that moved under a still mouse"""
+        self.hover_dirty = True
 
     def get_keybinds(self):
         return sorted(set(self.bindings))
@@ -64,10 +200,18 @@ class InputHandler:
 
     def register_hover(self, hoverable, callback):
         self.hoverable_rects[hoverable] = callback
+        self.hover_dirty = True
 
     def register_button(self, button):
         """Register a button to be checked for clicks."""
         self.buttons.append(button)
+        self.button_grid.insert(button)
+        self.hover_dirty = True
+
+    def move_button(self, button, pos):
+        button.position = pos
+        self.button_grid.move(button)
+        self.hover_dirty = True
 
     def bind_keypress(self, key, action, binding_name=None):
         name = binding_name or repr(action)
@@ -90,6 +234,12 @@ class InputHandler:
         self.bindings.append((str(button),"Mousebutton click", name))
         self.mousebutton_bindings[button] = action
 
+    def bind_mousebutton_up(self, button, action, binding_name=None):
+        """buttons numbered like bind_mousebutton_down"""
+        name = binding_name or repr(action)
+        self.bindings.append((str(button), "Mousebutton release", name))
+        self.mousebutton_release_bindings[button] = action
+
     def bind_continuous_mousebutton(self, button, action, binding_name=None):
         """left mousebutton is button 0"""
         name = binding_name or repr(action)
@@ -118,9 +268,25 @@ class InputHandler:
         self.bind_continuous_keypress(pg.K_LEFT, partial(camera.rotate, speed), "Camera rotate counter-clockwise")
         self.bind_continuous_keypress(pg.K_RIGHT, partial(camera.rotate, -speed), "Camera rotate clockwise")
 
+    def bind_camera_motion(self, motion, button=1, zoom_change=0.1):
+        """Kinetic drag panning and zoom to the cursor through a CameraMotion"""
+        self.bind_mousebutton_down(button, lambda: motion.drag_start(self.mouse_display_pos()))
+        self.bind_continuous_mousebutton(
+            button - 1, lambda: motion.drag(self.mouse_display_pos()), "Camera drag"
+        )
+        self.bind_mousebutton_up(button, motion.drag_end, "Camera release")
+        self.bind_mousebutton_down(
+            4, lambda: motion.zoom_at(1 + zoom_change, self.mouse_display_pos()), "Camera Zoom in"
+        )
+        self.bind_mousebutton_down(
+            5, lambda: motion.zoom_at(1 - zoom_change, self.mouse_display_pos()), "Camera Zoom out"
+        )
+
     def bind_camera_pan_to_mousedrag(self, camera, button=1):
-        self.bind_mousebutton_down(button, camera.drag_start,)
-        self.bind_continuous_mousebutton(button - 1, camera.move_to, "Camera drag")  # continous
+        self.bind_mousebutton_down(button, lambda: camera.drag_start(self.mouse_display_pos()))
+        self.bind_continuous_mousebutton(
+            button - 1, lambda: camera.move_to(self.mouse_display_pos()), "Camera drag"
+        )  # continous
 
     def bind_options_to_keys(self, options: list[Option]):
         used_keys = []
@@ -139,74 +305,110 @@ class InputHandler:
             option.text = prefix + option.text
 
     def handle_mouse_movement(self):
-        mousepos = pg.mouse.get_pos()
-
-        for button in self.buttons:
-            button.is_hovering(mousepos)
+        """Hover state for the current mouse_pos, run once per update at most"""
+        self.hover_dirty = False
+        mousepos = self.mouse_pos
+
+        hovered = self.button_grid.at(self.window_mouse_pos)
+        for button in self.hovered_buttons:
+            if button not in hovered:
+                button.set_hovered(False)
+        for button in hovered:
+            button.set_hovered(True)
+        self.hovered_buttons = hovered
 
         for hoverable, callback in self.hoverable_rects.items():
             collision = hoverable.collidepoint(mousepos)
             callback(collision)
 
+    def handle_mouse_motion(self, event):
+        # only remembered here, several motion events per frame cost one hover pass
+        self.mouse_pos = self.to_display(event.pos)
+        self.window_mouse_pos = event.pos
+        self.hover_dirty = True
+
     def handle_mouse_down(self, event):
+        pos = self.mouse_pos = self.to_display(event.pos)
+        self.window_mouse_pos = event.pos
         if self.debug:
-            print(event.button, pg.mouse.get_pos())
+            logging.debug(f"mouse button {event.button} down at {pos}")
 
         if event.button in self.mousebutton_bindings:
             self.mousebutton_bindings[event.button]()
 
-        for button in self.buttons:
-            if button.is_hovering(pg.mouse.get_pos()):
-                button.press()
-                break
+        for button in self.button_grid.at(event.pos):
+            button.set_hovered(True)
+            button.press()
+            break
 
         for clickable, callback in self.clickable_rects.items():
-            if clickable.collidepoint(pg.mouse.get_pos()):
-                print("clicked", clickable)
+            if clickable.collidepoint(pos):
+                if self.debug:
+                    logging.debug(f"clicked {clickable}")
                 callback()  # Trigger the callback if click is within rect
                 break
 
     def handle_mouse_up(self, event):
+        self.mouse_pos = self.to_display(event.pos)
+        self.window_mouse_pos = event.pos
+        action = self.mousebutton_release_bindings.get(event.button)
+        if action is not None:
+            action()
         if event.button != 1:
             return
-        for button in self.buttons:
-            if button.is_hovering(pg.mouse.get_pos()):
-                button.release()
+        for button in self.button_grid.at(event.pos):
+            button.set_hovered(True)
+            button.release()
+
+    def handle_keydown(self, event):
+        action = self.keypress_bindings.get(event.key)
+        if action is not None:
+            action()
+
+    def handle_keyup(self, event):
+        action = self.keyrelease_bindings.get(event.key)
+        if action is not None:
+            action()
+
+    def handle_quit(self, event):
+        logging.info("quitting...")
+        pg.quit()
+        quit()
 
     def handle_event(self, event: pg.event):
-        if event.type == pg.QUIT:
-            print("quitting...")
-            pg.quit()
-            quit()
-        elif event.type == pg.KEYDOWN:
-            if event.key in self.keypress_bindings:
-                self.keypress_bindings[event.key]()
-        elif event.type == pg.KEYUP:
-            if event.key in self.keyrelease_bindings:
-                self.keyrelease_bindings[event.key]()
-        elif event.type == pg.MOUSEBUTTONDOWN:
-            self.handle_mouse_down(event)
-        elif event.type == pg.MOUSEBUTTONUP:
-            self.handle_mouse_up(event)
+        handler = self.event_handlers.get(event.type)
+        if handler is not None:
+            handler(event)
 
     def handle_continuous_keypresses(self):
-        keys = pg.key.get_pressed()
+        if not self.continuous_keypress_bindings:
+            return
+        keys = self.input.key_pressed()
         for key, action in self.continuous_keypress_bindings.items():
             if keys[key]:
                 action()
 
     def handle_continuous_mousebuttons(self):
+        if not self.continuous_mousebutton_bindings:
+            return
         buttons = (
-            pg.mouse.get_pressed()
+            self.input.mouse_pressed()
         )  # returns tuple of bools, in order of mouse button
         for button, action in self.continuous_mousebutton_bindings.items():
             if buttons[button]:
                 action()
 
     def update(self):
-        self.handle_mouse_movement()
-        for event in pg.event.get():
-            self.handle_event(event)
+        handlers = self.event_handlers
+        for event in self.input.events():
+            handler = handlers.get(event.type)
+            if handler is not None:
+                handler(event)
+        if self.camera is not None and self.camera.view_version != self._view_version:
+            self._view_version = self.camera.view_version
+            self.hover_dirty = True  # hoverables moved on screen
+        if self.hover_dirty:
+            self.handle_mouse_movement()
         self.handle_continuous_keypresses()
         self.handle_continuous_mousebuttons()
 
@@ -218,3 +420,6 @@ class InputHandler:
         # self.continuous_mousebutton_bindings = {}
 
         self.buttons = []
+        self.button_grid.clear()
+        self.hovered_buttons = []
+        self.hover_dirty = True
@@ -0,0 +1,428 @@
+import heapq
+import math
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+BLOCKED = np.inf
+SQRT2 = math.sqrt(2)
+_STEPS = [(1, 0, 1.0), (-1, 0, 1.0), (0, 1, 1.0), (0, -1, 1.0)]
+_DIAGONAL_STEPS = [(1, 1, SQRT2), (1, -1, SQRT2), (-1, 1, SQRT2), (-1, -1, SQRT2)]
+
+
+def _steps(costs, x, y, diagonal):
+    """Cells reachable from (x, y) as (x, y, length); no cutting past blocked corners"""
+    width, height = costs.shape
+    for dx, dy, length in _STEPS + (_DIAGONAL_STEPS if diagonal else []):
+        nx, ny = x + dx, y + dy
+        if not (0 <= nx < width and 0 <= ny < height) or costs[nx, ny] == BLOCKED:
+            continue
+        if dx and dy and (costs[x + dx, y] == BLOCKED or costs[x, y + dy] == BLOCKED):
+            continue
+        yield nx, ny, length
+
+
+class CostRows:
+    """A cost array prepared for the pure Python searches: its rows as nested
+    lists, much faster to index than NumPy scalars, and its cheapest cell.
+
+    Building one is O(width * height); NavGrid keeps one per cost version so
+    queries only pay for the cells they visit. Pickles as the array, for
+    process pool workers.
+    """
+
+    __slots__ = ("array", "rows", "shape", "cheapest")
+
+    def __init__(self, costs):
+        self.array = np.array(costs)
+        self.rows = self.array.tolist()
+        self.shape = self.array.shape
+        finite = self.array[np.isfinite(self.array)]
+        self.cheapest = float(finite.min()) if len(finite) else 0.0
+
+    def __getitem__(self, cell):
+        return self.rows[cell[0]][cell[1]]
+
+    def __reduce__(self):
+        return CostRows, (self.array,)
+
+
+def _cost_rows(costs):
+    return costs if isinstance(costs, CostRows) else CostRows(costs)
+
+
+def astar(costs, start, goal, diagonal=True):
+    """Cheapest cell path from start to goal, both included, None if unreachable.
+
+    costs: (width, height) array or CostRows, the cost of entering each cell
+    per unit step, BLOCKED for walls. The octile heuristic is scaled by the
+    cheapest cell, so paths stay optimal.
+    """
+    grid = _cost_rows(costs)
+    rows, cheapest = grid.rows, grid.cheapest
+    start, goal = tuple(start), tuple(goal)
+    if grid[start] == BLOCKED or grid[goal] == BLOCKED:
+        return None
+    gx, gy = goal
+
+    def heuristic(x, y):
+        dx, dy = abs(x - gx), abs(y - gy)
+        if diagonal:
+            return cheapest * (max(dx, dy) + (SQRT2 - 1) * min(dx, dy))
+        return cheapest * (dx + dy)
+
+    distance = {start: 0.0}
+    came_from = {start: None}
+    frontier = [(heuristic(*start), 0.0, start)]
+    while frontier:
+        _, dist, cell = heapq.heappop(frontier)
+        if cell == goal:
+            path = []
+            while cell is not None:
+                path.append(cell)
+                cell = came_from[cell]
+            return path[::-1]
+        if dist > distance[cell]:
+            continue
+        for nx, ny, length in _steps(grid, *cell, diagonal):
+            new = dist + rows[nx][ny] * length
+            if new < distance.get((nx, ny), math.inf):
+                distance[nx, ny] = new
+                came_from[nx, ny] = cell
+                heapq.heappush(frontier, (new + heuristic(nx, ny), new, (nx, ny)))
+    return None
+
+
+def _flow_rows(grid, goal, diagonal):
+    width, height = grid.shape
+    distance = [[math.inf] * height for _ in range(width)]
+    goal = tuple(goal)
+    if grid[goal] == BLOCKED:
+        return distance
+    distance[goal[0]][goal[1]] = 0.0
+    frontier = [(0.0, goal)]
+    while frontier:
+        dist, (x, y) = heapq.heappop(frontier)
+        if dist > distance[x][y]:
+            continue
+        entering = grid.rows[x][y]  # moving from a neighbour into this cell
+        for nx, ny, length in _steps(grid, x, y, diagonal):
+            new = dist + entering * length
+            if new < distance[nx][ny]:
+                distance[nx][ny] = new
+                heapq.heappush(frontier, (new, (nx, ny)))
+    return distance
+
+
+def flow_field(costs, goal, diagonal=True):
+    """Cost to reach goal from every cell, a Dijkstra search outward from goal.
+
+    Returns a float array like costs, inf where goal can't be reached.
+    Follow it downhill with descend().
+    """
+    return np.array(_flow_rows(_cost_rows(costs), goal, diagonal))
+
+
+def _descend(field_rows, grid, start, diagonal):
+    x, y = start
+    if field_rows[x][y] == math.inf:
+        return None
+    path = [(x, y)]
+    while field_rows[x][y] > 0:
+        x, y = min(
+            _steps(grid, x, y, diagonal),
+            key=lambda step: field_rows[step[0]][step[1]]
+            + grid.rows[step[0]][step[1]] * step[2],
+        )[:2]
+        path.append((x, y))
+    return path
+
+
+def descend(field, costs, start, diagonal=True):
+    """Cell path from start down a flow_field to its goal, None if unreachable"""
+    return _descend(field.tolist(), _cost_rows(costs), start, diagonal)
+
+
+def solve_group(costs, goal, starts, diagonal=True, flow_threshold=8):
+    """Paths from many starts to one goal, a flow field once there are enough.
+
+    Module level, so it can run on a ProcessPoolExecutor.
+    """
+    grid = _cost_rows(costs)
+    if len(starts) >= flow_threshold:
+        field_rows = _flow_rows(grid, goal, diagonal)
+        return [_descend(field_rows, grid, start, diagonal) for start in starts]
+    return [astar(grid, start, goal, diagonal) for start in starts]
+
+
+def solve_groups(costs, groups, diagonal=True, flow_threshold=8):
+    """solve_group for several (goal, starts) groups, sharing one CostRows"""
+    grid = _cost_rows(costs)
+    return [
+        solve_group(grid, goal, starts, diagonal, flow_threshold)
+        for goal, starts in groups
+    ]
+
+
+class NavGrid:
+    """Movement costs of a grid of unit cells in game space, with path queries.
+
+    costs[x, y] is the cost of entering the cell with lower left corner
+    origin + (x, y), BLOCKED for walls. Paths are lists of cell centers.
+    Found paths and flow fields are cached until a cost changes (version).
+
+    Built from a Tilemap with from_tilemap(), the grid follows its tiles:
+    sync() rewrites only the cells of tiles that moved or changed cost.
+    """
+
+    def __init__(self, costs, origin=(0, 0), diagonal=True, cache_size=1024):
+        self.costs = np.asarray(costs, np.float32)
+        self.origin = tuple(origin)
+        self.diagonal = diagonal
+        self.version = 0
+        self.cache_size = cache_size
+        self._paths = OrderedDict()  # (start cell, goal cell) -> cell path
+        self._fields = OrderedDict()  # goal cell -> flow field
+        self._rows = None  # CostRows of the current version, see cost_rows
+
+        self.tilemap = None
+        self.tile_cost = None
+        self._owner = None  # (width, height) tile index per cell, -1 for none
+        self._tile_cells = None  # (N, 2) cell of each tile at the last sync
+        self._tile_spans = None  # (N, 2) cells covered by each tile
+        self._tile_costs = None
+        self._synced_version = None
+
+    @property
+    def shape(self):
+        return self.costs.shape
+
+    @classmethod
+    def from_tilemap(cls, tilemap, cost=1.0, diagonal=True, bounds=None, **kwargs):
+        """Walkable cells where tilemap has tiles, the rest is BLOCKED.
+
+        cost: per tile, a number, an array, or a function(pos, size, colors)
+        of the tile arrays returning an array, e.g. to block tiles by color
+        bounds: (x, y, w, h) cells to cover, defaults to the tiles' extent
+        """
+        pos, size, colors = _tile_arrays(tilemap)
+        if bounds is None:
+            if len(pos):
+                low = np.floor(pos.min(axis=0)).astype(int)
+                high = np.ceil((pos + size).max(axis=0)).astype(int)
+            else:
+                low = high = np.zeros(2, int)
+            bounds = (*low.tolist(), *(high - low).tolist())
+        x, y, width, height = bounds
+        nav = cls(np.full((width, height), BLOCKED), (x, y), diagonal, **kwargs)
+        nav.tilemap = tilemap
+        nav.tile_cost = cost
+        nav._owner = np.full((width, height), -1, np.int64)
+        nav._tile_cells = nav._tile_spans = np.zeros((0, 2), np.int64)
+        nav._tile_costs = np.zeros(0, np.float32)
+        nav.sync()
+        return nav
+
+    # cells
+    def cell(self, pos):
+        """Cell containing a game position"""
+        return (
+            math.floor(pos[0] - self.origin[0]),
+            math.floor(pos[1] - self.origin[1]),
+        )
+
+    def center(self, cell):
+        """Game position of a cell's center"""
+        return (cell[0] + self.origin[0] + 0.5, cell[1] + self.origin[1] + 0.5)
+
+    def contains(self, cell):
+        width, height = self.shape
+        return 0 <= cell[0] < width and 0 <= cell[1] < height
+
+    def walkable(self, cell):
+        return self.contains(cell) and self.costs[cell] != BLOCKED
+
+    def changed(self):
+        """Mark costs as changed after writing to self.costs"""
+        self.version += 1
+        self._paths.clear()
+        self._fields.clear()
+        self._rows = None
+
+    def cost_rows(self):
+        """CostRows of the costs, built once per version and shared by queries"""
+        if self._rows is None:
+            self._rows = CostRows(self.costs)
+        return self._rows
+
+    def set_cost(self, cells, cost):
+        """cost of a cell (x, y) or a slice of cells, e.g. nav.set_cost(np.s_[2:5, 0], BLOCKED)"""
+        self.costs[cells] = cost
+        self.changed()
+
+    # following a tilemap
+    def sync(self):
+        """Rewrite the cells of tiles that moved, were added or changed cost"""
+        store = getattr(self.tilemap, "store", self.tilemap)
+        version = getattr(store, "version", None)
+        if self.tilemap is None or (
+            version is not None and version == self._synced_version
+        ):
+            return False
+        self._synced_version = version
+        pos, size, colors = _tile_arrays(self.tilemap)
+        cells = np.floor(pos).astype(np.int64) - self.origin
+        spans = np.maximum(np.ceil(size).astype(np.int64), 1)
+        costs = self.tile_cost
+        if callable(costs):
+            costs = costs(pos, size, colors)
+        costs = np.broadcast_to(np.asarray(costs, np.float32), len(pos))
+
+        known = min(len(self._tile_cells), len(pos))
+        changed = np.flatnonzero(
+            np.any(cells[:known] != self._tile_cells[:known], axis=1)
+            | (costs[:known] != self._tile_costs[:known])
+        )
+        changed = np.concatenate([changed, np.arange(known, len(pos))])
+        removed = np.arange(known, len(self._tile_cells))
+        if not len(changed) and not len(removed):
+            return False
+
+        # cells of removed tiles and the old cells of changed ones are freed first
+        for index in np.concatenate([changed[changed < known], removed]).tolist():
+            self._release(index)
+        self._tile_cells = cells
+        self._tile_costs = costs.copy()
+        self._tile_spans = spans
+        width, height = self.shape
+        single = changed[np.all(spans[changed] == 1, axis=1)]
+        inside = np.all(
+            (cells[single] >= 0) & (cells[single] < (width, height)), axis=1
+        )
+        single = single[inside]
+        self.costs[cells[single, 0], cells[single, 1]] = costs[single]
+        self._owner[cells[single, 0], cells[single, 1]] = single
+        for index in changed[np.any(spans[changed] > 1, axis=1)].tolist():
+            area = _area(cells[index], spans[index])
+            self.costs[area] = costs[index]
+            self._owner[area] = index
+        self.changed()
+        return True
+
+    def _release(self, index):
+        """Block the cells still owned by a tile, before it moves away"""
+        area = _area(self._tile_cells[index], self._tile_spans[index])
+        mine = self._owner[area] == index
+        self.costs[area][mine] = BLOCKED
+        self._owner[area][mine] = -1
+
+    # queries
+    def _cached(self, cache, key, compute):
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+        value = cache[key] = compute()
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return value
+
+    def find_cells(self, start_cell, goal_cell):
+        """Cell path, cached; None if unreachable or outside the grid"""
+        if not (self.contains(start_cell) and self.contains(goal_cell)):
+            return None
+        return self._cached(
+            self._paths,
+            (start_cell, goal_cell),
+            lambda: astar(self.cost_rows(), start_cell, goal_cell, self.diagonal),
+        )
+
+    def find_path(self, start, goal):
+        """Path of cell centers between two game positions, None if unreachable"""
+        self.sync()
+        cells = self.find_cells(self.cell(start), self.cell(goal))
+        return None if cells is None else [self.center(cell) for cell in cells]
+
+    def flow_field(self, goal):
+        """Cost to reach goal (a game position) from every cell, cached per goal"""
+        self.sync()
+        goal_cell = self.cell(goal)
+        return self._cached(
+            self._fields,
+            goal_cell,
+            lambda: flow_field(self.cost_rows(), goal_cell, self.diagonal),
+        )
+
+    def find_paths(self, requests, executor=None, flow_threshold=8):
+        """Paths for many (start, goal) game positions at once, in request order.
+
+        Requests are grouped by goal cell. Groups of flow_threshold units or
+        more share a flow field, smaller ones run A*; cached paths are
+        reused. With an executor (a ProcessPoolExecutor for real
+        parallelism, A* is pure Python) the groups are split into one batch
+        per worker, so the cost grid is sent once per batch.
+        """
+        self.sync()
+        cells = [(self.cell(start), self.cell(goal)) for start, goal in requests]
+        groups = {}  # goal cell -> start cells still to solve
+        for start, goal in cells:
+            if (
+                (start, goal) not in self._paths
+                and self.contains(start)
+                and self.contains(goal)
+            ):
+                groups.setdefault(goal, []).append(start)
+
+        groups = [
+            (goal, list(dict.fromkeys(starts))) for goal, starts in groups.items()
+        ]
+        grid = self.cost_rows()
+        if executor is None or len(groups) < 2:
+            batches = [groups]
+            results = [solve_groups(grid, groups, self.diagonal, flow_threshold)]
+        else:
+            workers = getattr(executor, "_max_workers", None) or os.cpu_count() or 1
+            batches = [groups[i::workers] for i in range(min(workers, len(groups)))]
+            futures = [
+                executor.submit(
+                    solve_groups, grid, batch, self.diagonal, flow_threshold
+                )
+                for batch in batches
+            ]
+            results = [future.result() for future in futures]
+        for batch, batch_paths in zip(batches, results):
+            for (goal, starts), paths in zip(batch, batch_paths):
+                for start, path in zip(starts, paths):
+                    self._cached(self._paths, (start, goal), lambda: path)
+
+        results = []
+        for start, goal in cells:
+            path = self.find_cells(start, goal)
+            results.append(
+                None if path is None else [self.center(cell) for cell in path]
+            )
+        return results
+
+
+def _area(cell, span):
+    """Slice of the cells a tile covers, clipped to the grid.
+
+    Stops are clamped too, a negative stop would count from the far edge.
+    """
+    (x, y), (w, h) = cell.tolist(), span.tolist()
+    return np.s_[max(x, 0) : max(x + w, 0), max(y, 0) : max(y + h, 0)]
+
+
+def _tile_arrays(tilemap):
+    """(pos, size, colors) arrays of a Tilemap or TileStore"""
+    store = getattr(tilemap, "store", tilemap)
+    if store is not None and hasattr(store, "pos"):  # TileStore
+        n = store.count
+        return store.pos[:n], store.size[:n], store.color[:n]
+    tiles = list(tilemap)
+    pos = np.array([tile.pos for tile in tiles], float).reshape(-1, 2)
+    size = np.array([tile.size for tile in tiles], float).reshape(-1, 2)
+    colors = np.array(
+        [tile.color or (255, 255, 255) for tile in tiles], np.uint8
+    ).reshape(-1, 3)
+    return pos, size, colors
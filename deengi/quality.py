@@ -0,0 +1,167 @@
+class QualityKnob:
+    """A setting that can be lowered to save frame time.
+
+    levels go from best to cheapest, apply(value) puts a level into effect.
+    """
+
+    __slots__ = ("name", "levels", "apply", "priority", "level", "failed_restores")
+
+    def __init__(self, name, levels, apply, priority=0):
+        self.name = name
+        self.levels = list(levels)
+        self.apply = apply
+        self.priority = priority
+        self.level = 0
+        self.failed_restores = 0  # restores in a row that went over budget again
+
+    @property
+    def value(self):
+        return self.levels[self.level]
+
+    @property
+    def lowest(self):
+        return self.level == len(self.levels) - 1
+
+    def set_level(self, level):
+        self.level = max(0, min(level, len(self.levels) - 1))
+        self.apply(self.value)
+
+    def __repr__(self):
+        return f"QualityKnob({self.name!r}, {self.value!r})"
+
+
+class QualityController:
+    """Trades visual quality for frame time, with hysteresis.
+
+    update() smooths the measured frame times. While the average stays above
+    the frame budget for degrade_after seconds, the first knob (by priority,
+    then registration order) that can go lower is lowered one level. When it
+    stays below headroom * budget for restore_after seconds, the most
+    recently lowered knob is raised one level again. The gap between the two
+    thresholds and the longer restore delay damp changes; a restore that
+    is followed by a degrade within restore_after counts as failed, and each
+    failure in a row doubles the wait before that knob is raised again, up
+    to max_restore_after, so a level the frame budget can't afford is not
+    retried every few seconds.
+    """
+
+    def __init__(
+        self,
+        target_fps=60,
+        headroom=0.75,
+        degrade_after=0.5,
+        restore_after=3.0,
+        smoothing=0.1,
+        enabled=True,
+        max_restore_after=60.0,
+    ):
+        self.budget = 1 / target_fps
+        self.headroom = headroom
+        self.degrade_after = degrade_after
+        self.restore_after = restore_after
+        self.max_restore_after = max_restore_after
+        self.smoothing = smoothing
+        self.enabled = enabled
+
+        self.knobs = {}
+        self.lowered = []  # knobs in the order they were lowered, one entry per level
+        self.average = None  # smoothed frame time in seconds
+        self._over = 0.0  # seconds spent over budget
+        self._under = 0.0  # seconds spent with headroom
+        self.time = 0.0  # seconds of updates so far
+        self._restored = None  # (knob, time) of the last restore, while on probation
+        self.change_callbacks = []
+
+    def __getitem__(self, name):
+        return self.knobs[name]
+
+    def register(self, name, levels, apply, priority=0):
+        """Add a knob, knobs with lower priority are degraded first"""
+        knob = self.knobs[name] = QualityKnob(name, levels, apply, priority)
+        return knob
+
+    def unregister(self, name):
+        knob = self.knobs.pop(name)
+        knob.set_level(0)
+        self.lowered = [lowered for lowered in self.lowered if lowered is not knob]
+
+    def on_change(self, callback):
+        """callback(knob) after the controller lowered or raised a knob"""
+        self.change_callbacks.append(callback)
+
+    def _changed(self, knob):
+        self._over = self._under = 0.0
+        for callback in self.change_callbacks:
+            callback(knob)
+
+    def restore_delay(self):
+        """Seconds with headroom needed before the next restore"""
+        if not self.lowered:
+            return self.restore_after
+        failures = self.lowered[-1].failed_restores
+        return min(self.restore_after * 2**failures, self.max_restore_after)
+
+    def degrade(self):
+        """Lower the next knob one level, False if everything is at its lowest"""
+        if self._restored is not None:  # the last restore did not hold
+            self._restored[0].failed_restores += 1
+            self._restored = None
+        for knob in sorted(self.knobs.values(), key=lambda knob: knob.priority):
+            if not knob.lowest:
+                knob.set_level(knob.level + 1)
+                self.lowered.append(knob)
+                self._changed(knob)
+                return True
+        return False
+
+    def restore(self):
+        """Raise the most recently lowered knob one level"""
+        if not self.lowered:
+            return False
+        knob = self.lowered.pop()
+        knob.set_level(knob.level - 1)
+        self._restored = (knob, self.time)
+        self._changed(knob)
+        return True
+
+    def reset(self):
+        """Back to full quality"""
+        for knob in self.knobs.values():
+            knob.set_level(0)
+            knob.failed_restores = 0
+        self.lowered.clear()
+        self._restored = None
+        self.average = None
+        self._over = self._under = 0.0
+
+    def update(self, frame_time, dt=None):
+        """frame_time: seconds of work in the last frame, without idle waiting
+        dt: seconds since the last update, defaults to frame_time"""
+        if not self.enabled:
+            return
+        dt = frame_time if dt is None else dt
+        self.time += dt
+        restored = self._restored
+        if restored is not None and self.time - restored[1] >= self.restore_after:
+            restored[0].failed_restores = 0  # it held
+            self._restored = None
+        if self.average is None:
+            self.average = frame_time
+        else:
+            self.average += (frame_time - self.average) * self.smoothing
+
+        if self.average > self.budget:
+            self._over += dt
+            self._under = 0.0
+        elif self.average < self.budget * self.headroom:
+            self._under += dt
+            self._over = 0.0
+        else:
+            self._over = self._under = 0.0
+
+        if self._over >= self.degrade_after:
+            self._over = 0.0
+            self.degrade()
+        elif self._under >= self.restore_delay():
+            self._under = 0.0
+            self.restore()
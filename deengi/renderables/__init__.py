@@ -1,4 +1,31 @@
-from .tiles import Tile, Tilemap, Grid
-from .dialog import Dialog, PopupMenu
-from .ui import Label
-from .renderable import RenderGroup
+import importlib
+
+# Like deengi itself, submodules are imported on first attribute access, so
+# importing one renderable does not pull in numpy and the tile machinery.
+_exports = {
+    "Tile": "tiles",
+    "Tilemap": "tiles",
+    "Grid": "tiles",
+    "TileStore": "tilestore",
+    "TileView": "tilestore",
+    "Dialog": "dialog",
+    "PopupMenu": "dialog",
+    "LoadingDialog": "dialog",
+    "Label": "ui",
+    "Minimap": "minimap",
+    "RenderGroup": "renderable",
+}
+
+__all__ = list(_exports)
+
+
+def __getattr__(name):
+    if name not in _exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_exports[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -15,10 +15,26 @@ class Option:
         return self.text
 
 
+def compose(pieces):
+    """One transparent surface holding (surface, pos) pieces, and its position"""
+    rects = [surface.get_rect(topleft=pos) for surface, pos in pieces]
+    bounds = rects[0].unionall(rects[1:])
+    composed = pygame.Surface(bounds.size, pygame.SRCALPHA)
+    for (surface, _), rect in zip(pieces, rects):
+        composed.blit(surface, (rect.x - bounds.x, rect.y - bounds.y))
+    return composed, bounds.topleft
+
+
 class Dialog(Renderable):
+    """Title, text and options, drawn from a surface that is only rebuilt
+    when one of them changes"""
+
     options: list[Option]
     title: str = "Title"
     text: str = "filler text"
+    assets: tuple = ()  # images to preload before Engine.show_scene shows it
+    _surface = None  # retained (surface, pos)
+    _surface_key = None
 
     def __init__(self, title="", text=""):
         self.title = title
@@ -31,17 +47,60 @@ class Dialog(Renderable):
     def add_option(self, text, callback):
         self.options.append(Option(text, callback))
 
+    def surface_key(self, renderer):
+        """Everything the retained surface depends on"""
+        return (
+            self.title,
+            self.text,
+            tuple(str(o) for o in self.options),
+            renderer.debug,
+        )
+
+    def build_surface(self, renderer):
+        pieces = [
+            (renderer.text_surface(self.title, size=30), (50, 50)),
+            (renderer.text_surface(self.text, size=20), (50, 100)),
+            (renderer.text_surface(self.get_options_text(), size=20), (50, 400)),
+        ]
+        return compose(
+            [(surface, (x + dx, y + dy)) for (surface, (dx, dy)), (x, y) in pieces]
+        )
+
     def render(self, renderer):
-        renderer.draw_text(self.title, pos=(50, 50), size=30)
-        renderer.draw_text(self.text, pos=(50, 100), size=20)
-        renderer.draw_text(self.get_options_text(), pos=(50, 400), size=20)
+        key = self.surface_key(renderer)
+        if key != self._surface_key:
+            self._surface = self.build_surface(renderer)
+            self._surface_key = key
+        surface, pos = self._surface
+        renderer.display.blit(surface, pos)
 
 
 class PopupMenu(Dialog):
-    def render(self, renderer):
+    def build_surface(self, renderer):
         dialog = pygame.Surface(((400, 150)))
         dialog.fill(renderer.get_color("Dialog Background"))
         renderer.draw_text(self.title, pos=(20, 20), size=20, onto=dialog)
         renderer.draw_text(self.text, pos=(20, 45), size=20, onto=dialog)
         renderer.draw_text(self.get_options_text(), pos=(20, 80), size=20, onto=dialog)
-        renderer.display.blit(dialog, (200, 200))
+        return dialog, (200, 200)
+
+
+class LoadingDialog(Dialog):
+    def __init__(self, loader, title="Loading", bar_size=(300, 20)):
+        """Shows the progress of an AssetLoader"""
+        super().__init__(title)
+        self.loader = loader
+        self.bar_size = bar_size
+
+    def render(self, renderer):
+        self.text = f"{self.loader.progress:.0%}"
+        super().render(renderer)
+        width, height = self.bar_size
+        pygame.draw.rect(
+            renderer.display, renderer.get_color("Button"), (50, 140, width, height), 2
+        )
+        pygame.draw.rect(
+            renderer.display,
+            renderer.get_color("Button hovered"),
+            (50, 140, width * self.loader.progress, height),
+        )
@@ -0,0 +1,117 @@
+import numpy as np
+import pygame
+
+from deengi.renderables.renderable import Renderable
+from deengi.renderables.tilestore import NO_IMAGE, VISIBLE, TileStore
+
+
+class Minimap(Renderable):
+    """Top down overview of a tilemap with the main camera's view on it.
+
+    The map is drawn straight from the tile arrays into a pixel grid the
+    size of rect, one color per tile: the tile color, or the average color
+    of its image. The grid is only rebuilt when the tiles change
+    (store.version); each frame costs a blit and the view outline.
+    Tilemaps with tile objects are copied into a TileStore, call refresh()
+    after changing their tiles.
+    """
+
+    def __init__(self, tilemap, rect, background=(0, 0, 0), view_color=(255, 255, 255)):
+        """tilemap: a Tilemap or TileStore
+        rect: (x, y, w, h) in render surface pixels"""
+        self.tilemap = tilemap
+        self.rect = pygame.Rect(rect)
+        self.background = background
+        self.view_color = view_color
+        self.bounds = None  # (x, y, w, h) of the map in game coordinates
+        self._store = None
+        self._surface = None
+        self._surface_key = None
+        self._image_colors = {}  # asset surface -> average color
+        self.refresh()
+
+    @property
+    def store(self):
+        store = getattr(self.tilemap, "store", self.tilemap)
+        return store if isinstance(store, TileStore) else self._store
+
+    def refresh(self):
+        """Copy the tiles of an object tilemap again"""
+        if isinstance(getattr(self.tilemap, "store", self.tilemap), TileStore):
+            return
+        self._store = TileStore()
+        for tile in self.tilemap:
+            self._store.add_tile(tile)
+        self._surface_key = None
+
+    def tile_colors(self, store):
+        """(N, 3) color per tile, average colors of images where loaded"""
+        n = store.count
+        colors = store.color[:n].copy()
+        image = store.image[:n]
+        for index in np.unique(image[image != NO_IMAGE]).tolist():
+            source = store.images[index]
+            if source is None:  # not loaded yet in a lazy store
+                continue
+            if source not in self._image_colors:
+                self._image_colors[source] = pygame.transform.average_color(source)[:3]
+            colors[image == index] = self._image_colors[source]
+        return colors
+
+    def build_surface(self, store):
+        width, height = self.rect.size
+        pixels = np.zeros((width, height, 3), np.uint8)
+        pixels[...] = self.background[:3]
+        visible = np.flatnonzero((store.flags[: store.count] & VISIBLE) != 0)
+        if not len(visible):
+            self.bounds = None
+            return pygame.surfarray.make_surface(pixels)
+
+        pos, size = store.pos[visible], store.size[visible]
+        low, high = pos.min(axis=0), (pos + size).max(axis=0)
+        self.bounds = (*low.tolist(), *(high - low).tolist())
+        scale = min(
+            width / max(high[0] - low[0], 1e-9), height / max(high[1] - low[1], 1e-9)
+        )
+        # game y points up, rows go down
+        left = (pos[:, 0] - low[0]) * scale
+        top = (high[1] - pos[:, 1] - size[:, 1]) * scale
+        x0 = np.clip(left.astype(int), 0, width - 1)
+        y0 = np.clip(top.astype(int), 0, height - 1)
+        x1 = np.clip(np.ceil(left + size[:, 0] * scale).astype(int), x0 + 1, width)
+        y1 = np.clip(np.ceil(top + size[:, 1] * scale).astype(int), y0 + 1, height)
+
+        colors = self.tile_colors(store)[visible]
+        small = ((x1 - x0) == 1) & ((y1 - y0) == 1)
+        pixels[x0[small], y0[small]] = colors[small]  # most tiles on a large map
+        for i in np.flatnonzero(~small).tolist():
+            pixels[x0[i] : x1[i], y0[i] : y1[i]] = colors[i]
+        return pygame.surfarray.make_surface(pixels)
+
+    def minimap_coords(self, points):
+        """Pixels on the screen of game points"""
+        x, y, w, h = self.bounds
+        scale = min(self.rect.width / max(w, 1e-9), self.rect.height / max(h, 1e-9))
+        return [
+            (self.rect.x + (px - x) * scale, self.rect.y + (y + h - py) * scale)
+            for px, py in points
+        ]
+
+    def render(self, renderer):
+        store = self.store
+        key = (store.version, store.count, tuple(self.rect.size))
+        if key != self._surface_key:
+            self._surface = self.build_surface(store)
+            self._surface_key = key
+        renderer.display.blit(self._surface, self.rect)
+        if self.bounds is None:
+            return
+
+        camera = renderer.camera
+        width, height = camera.screen.get_size()
+        corners = camera.game_coords([(0, 0), (width, 0), (width, height), (0, height)])
+        outline = self.minimap_coords([(corner.x, corner.y) for corner in corners])
+        clip = renderer.display.get_clip()
+        renderer.display.set_clip(self.rect)
+        pygame.draw.polygon(renderer.display, self.view_color, outline, width=1)
+        renderer.display.set_clip(clip)
@@ -0,0 +1,191 @@
+import math
+import os
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pygame
+
+from deengi.renderables.tilestore import (
+    HIGHLIGHTED,
+    NO_IMAGE,
+    VISIBLE,
+    image_render_size,
+)
+from deengi.renderables.variants import variant_cache
+
+
+class ChunkRasterizer:
+    """Prerenders the chunks of a TileStore onto surfaces on a thread pool.
+
+    Each chunk in view is drawn once onto its own surface, relative to the
+    chunk's corner, and composited with one blit per chunk. Panning reuses
+    the surfaces. A zoom or rotation re-rasterizes the chunks in view
+    concurrently, one job per chunk, after scaling the images they use
+    concurrently too; pygame releases the GIL while blitting and scaling.
+    A tile change only re-rasterizes the chunks it touched, see
+    TileStore.changed.
+    Chunks larger than max_chunk_pixels when zoomed in are drawn directly.
+    """
+
+    def __init__(self, store, workers=None, max_chunk_pixels=2048 * 2048):
+        self.store = store
+        self.max_chunk_pixels = max_chunk_pixels
+        self.executor = ThreadPoolExecutor(
+            workers or os.cpu_count(), thread_name_prefix="deengi-raster"
+        )
+        # chunk number -> (anchor, offset, surface or None, indices, store version)
+        self.rasters = {}
+        # per camera (orientation, rasters), so viewports don't evict each other
+        self._views = weakref.WeakKeyDictionary()
+
+    def orientation(self, camera):
+        """Everything but the pan that changes how chunks look"""
+        return (
+            tuple(camera.zoom_level),
+            tuple(camera.ex),
+            tuple(camera.ey),
+            self.store.chunk_epoch,
+        )
+
+    def chunk_tiles(self, chunk, camera):
+        store = self.store
+        indices = store.chunk_members(chunk)
+        indices = indices[(store.flags[indices] & VISIBLE) != 0]
+        if store.depth_sort:
+            rank = store.depth_rank(camera)
+            indices = indices[np.argsort(rank[indices])]
+        return indices
+
+    def projection(self, camera, anchor, offset=(0, 0)):
+        """Maps game points to pixels of a chunk surface whose corner is at offset"""
+        (ex_x, ex_y), (ey_x, ey_y) = camera.ex, camera.ey
+        zoom_x, zoom_y = camera.zoom_level
+        anchor_x, anchor_y = anchor
+        offset_x, offset_y = offset
+
+        def project(points):
+            x = points[..., 0] - anchor_x
+            y = points[..., 1] - anchor_y
+            screen = np.empty(points.shape, float)
+            screen[..., 0] = (x * ex_x + y * ey_x) * zoom_x - offset_x
+            screen[..., 1] = (x * ex_y + y * ey_y) * zoom_y - offset_y
+            return screen
+
+        return project
+
+    def rasterize(self, chunks, camera, rasters):
+        store = self.store
+        zoom = camera.zoom_level[0]
+        tiles = {chunk: self.chunk_tiles(chunk, camera) for chunk in chunks}
+
+        used = np.concatenate(list(tiles.values()))
+        lit = (store.flags[used] & HIGHLIGHTED) != 0
+        requests = []
+        for image, highlighted in set(zip(store.image[used].tolist(), lit.tolist())):
+            if image != NO_IMAGE:
+                source = store.images[image]
+                size = image_render_size(source.get_size(), zoom)
+                requests.append((source, size, None if highlighted else "gray"))
+        variant_cache.scale_all(requests, self.executor)
+
+        jobs = {}
+        for chunk, indices in tiles.items():
+            anchor = tuple((store.chunk_keys[chunk] * store.chunk_size).tolist())
+            scaled = store.scaled_images(indices, zoom)
+            jobs[chunk] = (
+                anchor,
+                indices,
+                self.executor.submit(
+                    self.rasterize_chunk, indices, scaled, camera, anchor
+                ),
+            )
+        for chunk, (anchor, indices, job) in jobs.items():
+            offset, surface = job.result()
+            rasters[chunk] = (anchor, offset, surface, indices, store.version)
+
+    def rasterize_chunk(self, indices, scaled, camera, anchor):
+        """Runs on a worker thread, returns (offset, surface) of one chunk"""
+        if not len(indices):
+            return (0, 0), None
+        store = self.store
+        project = self.projection(camera, anchor)
+        pos, size = store.pos[indices], store.size[indices]
+        corners = project(
+            np.concatenate([pos, pos + size * (1, 0), pos + size, pos + size * (0, 1)])
+        )
+        centers = project(pos + size / 2)
+        extents = np.array(
+            [(0, 0) if image is None else image.get_size() for image in scaled]
+        )
+        low = np.minimum(corners.min(axis=0), (centers - extents / 2).min(axis=0)) - 1
+        high = np.maximum(corners.max(axis=0), (centers + extents / 2).max(axis=0)) + 1
+        offset = tuple(np.floor(low).tolist())
+        width, height = (math.ceil(v) for v in (high - offset).tolist())
+        if width * height > self.max_chunk_pixels:
+            return offset, None
+
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        store.draw(surface, indices, self.projection(camera, anchor, offset), scaled)
+        return offset, surface
+
+    def render(self, renderer):
+        store = self.store
+        camera = renderer.camera
+        if renderer.interactive:
+            store.camera = camera
+        if not store.count:
+            return
+        view = camera.view_rect(renderer.display.get_size())
+        chunks = store.chunks_in(view).tolist()
+        key = self.orientation(camera)  # the chunk index update may rebuild it
+        view_key, rasters = self._views.get(camera, (None, {}))
+        if key != view_key:
+            rasters = {}
+        if renderer.interactive:
+            self.rasters = rasters
+        if store.depth_sort:
+            dx, dy = camera.depth_axis
+            keys = store.chunk_keys
+            chunks.sort(key=lambda chunk: keys[chunk, 0] * dx + keys[chunk, 1] * dy)
+        versions = store.chunk_versions
+        missing = [
+            chunk
+            for chunk in chunks
+            if chunk not in rasters or rasters[chunk][4] < versions[chunk]
+        ]
+        if missing:
+            self.rasterize(missing, camera, rasters)
+
+        display = renderer.display
+        blits = []
+        for chunk in chunks:
+            anchor, (offset_x, offset_y), surface, indices, _ = rasters[chunk]
+            if surface is None:
+                if blits:
+                    display.blits(blits, doreturn=False)
+                    blits = []
+                store.render_indices(renderer, indices)
+                continue
+            x, y = camera.screen_coords(anchor)
+            blits.append((surface, (x + offset_x, y + offset_y)))
+        if blits:
+            display.blits(blits, doreturn=False)
+
+        if len(rasters) > 2 * len(chunks) + 16:
+            rasters = {chunk: rasters[chunk] for chunk in chunks}
+            if renderer.interactive:
+                self.rasters = rasters
+        self._views[camera] = (key, rasters)
+
+        if renderer.debug:
+            for index in store.visible_indices(renderer).tolist():
+                pygame.draw.rect(
+                    display,
+                    rect=store.screen_rect(index, camera),
+                    color=renderer.get_color("DEBUG"),
+                    width=1,
+                )
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
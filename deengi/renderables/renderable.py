@@ -17,21 +17,61 @@ class Renderable:
     def add_to_layer(self, layer):
         layer.append(self)
 
+    def depth_anchor(self):
+        """game position that orders this renderable by depth, None if it has none"""
+        return getattr(self, "pos", None)
+
+
+def depth_sorted(renderables, camera, previous=None):
+    """renderables ordered back to front by the projected screen y of their anchor.
+
+    previous: the last result for the first len(previous) renderables,
+    re-sorting a nearly sorted list with a few appended is O(N)
+    """
+    dx, dy = camera.depth_axis
+
+    def depth(renderable):
+        anchor = renderable.depth_anchor()
+        return 0 if anchor is None else anchor[0] * dx + anchor[1] * dy
+
+    if previous is not None and len(previous) <= len(renderables):
+        renderables = previous + renderables[len(previous) :]
+    return sorted(renderables, key=depth)  # timsort, adaptive to presorted runs
+
 
 class RenderGroup(Renderable):
     name: str
 
-    def __init__(self, name):
+    def __init__(self, name, depth_sort=False):
+        """depth_sort: draw members back to front for rotated isometric views,
+        re-sorted when the camera orientation or the members change.
+        Call invalidate_depth() after moving members."""
         self.name = name
         self.members = []
+        self.depth_sort = depth_sort
+        self._draw_order = None
+        self._depth_key = None
 
     def __iter__(self):
         return iter(self.members)
 
     def add(self, *renderables):
         self.members.extend(renderables)
+        self.invalidate_depth()  # the draw order stays as a presorted start
+
+    def invalidate_depth(self):
+        self._depth_key = None
+
+    def draw_order(self, camera):
+        if not self.depth_sort:
+            return self.members
+        key = camera.depth_axis
+        if key != self._depth_key:
+            self._draw_order = depth_sorted(self.members, camera, self._draw_order)
+            self._depth_key = key
+        return self._draw_order
 
     def render(self, renderer):
-        for member in self.members:
+        for member in self.draw_order(renderer.camera):
             if member.visible:
                 member.render(renderer)
@@ -0,0 +1,144 @@
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+from deengi.renderables.tilestore import TileStore
+
+
+class ChunkStreamer:
+    """Streams square chunks of an unbounded tile world around the camera.
+
+    provider(chunk_x, chunk_y, chunk_size) returns the tiles of one chunk, as
+    a TileStore or an iterable of Tile argument tuples (a generator works),
+    with game positions inside [chunk_x * chunk_size, (chunk_x + 1) * chunk_size).
+    It runs on a thread pool; finished chunks are picked up by update() on the
+    main thread, a few per frame, so the render loop never waits for them.
+    Chunks far from the view are evicted once memory_budget bytes are exceeded.
+    A chunk whose provider raises is logged and kept in failed, it is not
+    requested again until removed from there.
+    """
+
+    def __init__(
+        self,
+        provider,
+        chunk_size=32,
+        prefetch=1,
+        memory_budget=256 * 2**20,
+        workers=2,
+        max_loads_per_frame=4,
+        depth_sort=False,
+    ):
+        self.provider = provider
+        self.chunk_size = chunk_size
+        self.prefetch = prefetch  # chunks loaded beyond the view on each side
+        self.memory_budget = memory_budget
+        self.max_loads_per_frame = max_loads_per_frame
+        self.max_pending = 2 * workers
+        self.depth_sort = depth_sort
+
+        self.chunks = {}  # (chunk_x, chunk_y) -> TileStore
+        self.pending = {}  # (chunk_x, chunk_y) -> Future
+        self.failed = {}  # (chunk_x, chunk_y) -> exception raised by the provider
+        self.nbytes = 0  # tile data of the loaded chunks
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="deengi-chunks")
+
+    def __iter__(self):
+        for store in self.chunks.values():
+            yield from store
+
+    def __len__(self):
+        return sum(len(store) for store in self.chunks.values())
+
+    def generate(self, key):
+        """Runs on a worker thread"""
+        tiles = self.provider(*key, self.chunk_size)
+        if isinstance(tiles, TileStore):
+            return tiles
+        store = TileStore(capacity=64, lazy_images=True)
+        for args in tiles:
+            store.add(*args)
+        return store
+
+    def chunk_range(self, rect, margin=0):
+        x, y, w, h = rect
+        size = self.chunk_size
+        xs = range(
+            math.floor(x / size) - margin, math.floor((x + w) / size) + margin + 1
+        )
+        ys = range(
+            math.floor(y / size) - margin, math.floor((y + h) / size) + margin + 1
+        )
+        return [(cx, cy) for cy in ys for cx in xs]
+
+    def update(self, renderer):
+        camera = renderer.camera
+        view = camera.view_rect(renderer.display.get_size())
+        center_x, center_y = view[0] + view[2] / 2, view[1] + view[3] / 2
+
+        def distance(key):
+            cx, cy = key
+            return math.hypot(
+                (cx + 0.5) * self.chunk_size - center_x,
+                (cy + 0.5) * self.chunk_size - center_y,
+            )
+
+        needed = sorted(self.chunk_range(view, self.prefetch), key=distance)
+        needed_set = set(needed)
+
+        loaded = 0
+        for key, future in list(self.pending.items()):
+            if loaded >= self.max_loads_per_frame:
+                break
+            if future.done():
+                del self.pending[key]
+                try:
+                    store = future.result()
+                    store.load_images()
+                except Exception as e:
+                    logging.exception(f"Could not load chunk {key}: {e}")
+                    self.failed[key] = e
+                    continue
+                store.depth_sort = self.depth_sort
+                self.chunks[key] = store
+                self.nbytes += store.nbytes
+                loaded += 1
+
+        if renderer.interactive:  # viewports don't cancel what the main view asked for
+            for key, future in list(self.pending.items()):
+                if key not in needed_set and future.cancel():
+                    del self.pending[key]
+
+        for key in needed:
+            if len(self.pending) >= self.max_pending:
+                break
+            if (
+                key not in self.chunks
+                and key not in self.pending
+                and key not in self.failed
+            ):
+                self.pending[key] = self.executor.submit(self.generate, key)
+
+        self.evict(needed_set, distance)
+
+    def evict(self, keep, distance):
+        if self.nbytes <= self.memory_budget:
+            return
+        for key in sorted(self.chunks, key=distance, reverse=True):
+            if self.nbytes <= self.memory_budget or key in keep:
+                break
+            self.nbytes -= self.chunks.pop(key).nbytes
+
+    def render(self, renderer):
+        self.update(renderer)
+        view = renderer.camera.view_rect(renderer.display.get_size())
+        keys = self.chunk_range(view, margin=1)
+        if self.depth_sort:
+            dx, dy = renderer.camera.depth_axis
+            keys.sort(key=lambda key: key[0] * dx + key[1] * dy)
+        for key in keys:
+            store = self.chunks.get(key)
+            if store is not None:
+                store.render(renderer)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -1,19 +1,17 @@
-import math
 import pygame
 
+from deengi.assets import load_image
 from deengi.renderables.renderable import RenderGroup, Renderable
-
-
-MAX_WIDTH, MAX_HEIGHT = 1000, 1000
-
-
-def scale_preserve_transparency(source, size):
-    scaled = pygame.transform.scale(source, size)
-    colorkey = source.get_colorkey()
-    if colorkey is not None:
-        scaled.set_colorkey(colorkey)
-        return scaled.convert()
-    return scaled.convert_alpha()
+from deengi.renderables.raster import ChunkRasterizer
+from deengi.renderables.streaming import ChunkStreamer
+from deengi.renderables.tilestore import (
+    MAX_WIDTH,
+    MAX_HEIGHT,
+    TileStore,
+    image_render_size,
+    scale_preserve_transparency,
+)
+from deengi.renderables.variants import variant_cache
 
 
 class Tile(Renderable):
@@ -39,21 +37,7 @@ class Tile(Renderable):
         self.size = size  # (width, height)
         self.screen_size = None
         if img:
-            if colorkey is not None and (
-                not isinstance(colorkey, tuple) or len(colorkey) != 3
-            ):
-                raise ValueError("colorkey must be a tuple of 3 RGB values")
-            surface = pygame.image.load(img)
-            if colorkey is not None:
-                print(f"Applying colorkey: {colorkey}")
-                pixel = surface.get_at((0, 0))
-                print(f"Top-left pixel color: {pixel}")
-                surface = surface.convert()
-                surface.set_colorkey(colorkey)
-            else:
-                surface = surface.convert_alpha()
-            self.img = surface
-            # print(f"{img} loaded")
+            self.img = load_image(img, colorkey)
         else:
             self.img = None
 
@@ -62,8 +46,6 @@ class Tile(Renderable):
         self.hovered = False
         self.highlighted = True
 
-        self._dimmed_img = None
-        
         self.click_callback = click_callback
         self.hover_callback = hover_callback
 
@@ -82,6 +64,10 @@ class Tile(Renderable):
 
         return self.mask.get_at(point)
 
+    def depth_anchor(self):
+        x, y = self.pos
+        return x + self.size[0] / 2, y + self.size[1] / 2
+
     def create_mask(self, renderer):
         surf = pygame.Surface(renderer.display.get_size(), pygame.SRCALPHA)
         pygame.draw.polygon(
@@ -106,21 +92,11 @@ class Tile(Renderable):
         )
 
     def get_dimmed_image(self):
-        if hasattr(self, "_dimmed_img") and self._dimmed_img:
-            return self._dimmed_img
+        return variant_cache.get(self.img, "gray")
 
-        gray_img = self.img.copy()
-        arr = pygame.surfarray.pixels3d(gray_img)
-        alpha = pygame.surfarray.pixels_alpha(gray_img)
-        gray = (0.3 * arr[:, :, 0] + 0.59 * arr[:, :, 1] + 0.11 * arr[:, :, 2]).astype('uint8')
-
-        arr[:, :, 0] = gray
-        arr[:, :, 1] = gray
-        arr[:, :, 2] = gray
-        pygame.surfarray.pixels_alpha(gray_img)[:, :] = alpha
-
-        self._dimmed_img = gray_img
-        return gray_img
+    def get_variant_image(self, variant, *args):
+        """Shared variant of the tile image, see deengi.renderables.variants"""
+        return variant_cache.get(self.img, variant, *args)
 
     def render_img(self, renderer):
         # easier, works, but tile images that are larger than the tile will get squished
@@ -144,31 +120,15 @@ class Tile(Renderable):
         # renderer.display.blit(scaled_img, bounding_rect.topleft)
 
         # complicated but works for images taller than thebuilding rectangle
-        zoom_x, zoom_y = renderer.camera.zoom_level
-        target_diagonal = 1.414
-        img_width, img_height = self.img.get_size()
-        img_diagonal = math.sqrt(img_width**2 + img_height**2)
-
-        # Get the zoom level from the renderer
-        zoom_x, zoom_y = renderer.camera.zoom_level
-
-        # Calculate scale factor based on target diagonal and zoom
-        scale_factor = (target_diagonal / img_diagonal) * zoom_x
-
-        # Scale the image
-        scaled_width = int(img_width * scale_factor)
-        scaled_height = int(img_height * scale_factor)
-
-        if scaled_width > MAX_WIDTH or scaled_height > MAX_HEIGHT:
-            print(
-                f"Original size: {self.img.get_size()}, Target size: ({scaled_width}, {scaled_height})"
-            )
-
-        scaled_width = min(scaled_width, MAX_WIDTH)
-        scaled_height = min(scaled_height, MAX_HEIGHT)
+        scaled_width, scaled_height = image_render_size(
+            self.img.get_size(), renderer.camera.zoom_level[0]
+        )
 
-        img_to_render = self.img if self.highlighted else self.get_dimmed_image()
-        scaled_img = scale_preserve_transparency(img_to_render, (scaled_width, scaled_height))
+        scaled_img = variant_cache.scaled(
+            self.img,
+            (scaled_width, scaled_height),
+            None if self.highlighted else "gray",
+        )
         # Calculate the center position and adjust for the new size
         center_pos = (self.pos[0] + 0.5, self.pos[1] + 0.5)
         screen_center = renderer.screen_coords(center_pos)
@@ -183,10 +143,12 @@ class Tile(Renderable):
         renderer.display.blit(scaled_img, top_left)
 
     def render(self, renderer):
-        if self.use_mask:
-            self.create_mask(renderer)
-        self.screen_pos = renderer.screen_coords(self.pos)
-        self._rect = renderer.screen_coords(pygame.Rect(*self.pos, *self.size))
+        rect = renderer.screen_coords(pygame.Rect(*self.pos, *self.size))
+        if renderer.interactive:  # screen space state for hit tests in the main view
+            if self.use_mask:
+                self.create_mask(renderer)
+            self.screen_pos = renderer.screen_coords(self.pos)
+            self._rect = rect
 
         if self.img:
             self.render_img(renderer)
@@ -197,7 +159,7 @@ class Tile(Renderable):
         if renderer.debug:
             pygame.draw.rect(
                 renderer.display,
-                rect=self.rect,
+                rect=rect,
                 color=renderer.get_color("DEBUG"),
                 width=1,
             )
@@ -209,17 +171,185 @@ class Tile(Renderable):
 
 
 class Tilemap(RenderGroup):
-    def __init__(self, tile_tuples=None, name="tilemap"):
-        """Iterable Tilemap of Tiles"""
-        super().__init__(name)
+    def __init__(
+        self,
+        tile_tuples=None,
+        name="tilemap",
+        storage="objects",
+        chunk_size=None,
+        depth_sort=False,
+        prerender=False,
+    ):
+        """Iterable Tilemap of Tiles
+
+        storage: "objects" keeps a Tile object per tile,
+        "arrays" keeps tile data in a TileStore of typed NumPy arrays and hands
+        out lightweight TileView proxies, for maps with millions of tiles
+        chunk_size: "arrays" only, index tiles by chunks to render only those in view
+        depth_sort: draw tiles back to front, so tall tile images occlude
+        correctly when the camera is rotated
+        prerender: "arrays" only, draw chunks onto surfaces on a thread pool
+        and reuse them while the camera pans, see ChunkRasterizer
+        """
+        super().__init__(name, depth_sort)
+        if storage not in ("objects", "arrays"):
+            raise ValueError(f"storage must be 'objects' or 'arrays', not {storage!r}")
+        if prerender and storage != "arrays":
+            raise ValueError("prerender needs storage='arrays'")
+        self.store = None
+        if storage == "arrays":
+            self.store = TileStore(chunk_size=chunk_size, depth_sort=depth_sort)
+        self.streamer = None
+        self.rasterizer = ChunkRasterizer(self.store) if prerender else None
         tile_tuples = tile_tuples or []
         for args in tile_tuples:
-            self.add(Tile(*args))
+            if self.store is not None:
+                self.store.add(*args)
+            else:
+                self.add(Tile(*args))
 
         self.grid = True
 
+    def __iter__(self):
+        if self.streamer is not None:
+            return iter(self.streamer)
+        if self.store is not None:
+            return iter(self.store)
+        return super().__iter__()
+
+    def __len__(self):
+        if self.streamer is not None:
+            return len(self.streamer)
+        return len(self.store) if self.store is not None else len(self.members)
+
+    def _not_streaming(self, operation):
+        if self.streamer is not None:
+            raise RuntimeError(
+                f"{operation} is not supported on a streamed tilemap, its tiles"
+                " come and go with the view; work on the provider's chunks instead"
+            )
+
+    def __getitem__(self, index):
+        self._not_streaming("Indexing")
+        if self.store is not None:
+            return self.store[index]
+        return self.members[index]
+
+    def add(self, *renderables):
+        if self.store is None:
+            return super().add(*renderables)
+        for tile in renderables:
+            self.store.add_tile(tile)
+
+    def register_callbacks(self, input_handler):
+        """Register the click and hover callbacks of the tiles with input_handler.
+
+        Hit tests use the tiles' screen rects as of the last render. Tiles
+        added afterwards need another call.
+        """
+        self._not_streaming("register_callbacks")
+        if self.store is not None:
+            store = self.store
+            for index, callback in store.click_callbacks.items():
+                input_handler.register_clickable(store[index], callback)
+            for index, callback in store.hover_callbacks.items():
+                input_handler.register_hover(store[index], callback)
+            return
+        for tile in self.members:
+            if tile.click_callback is not None:
+                input_handler.register_clickable(tile, tile.click_callback)
+            if tile.hover_callback is not None:
+                input_handler.register_hover(tile, tile.hover_callback)
+
     def as_dict(self):
-        return {t.position: t for t in self.tiles}
+        return {t.pos: t for t in self}
+
+    def save(self, path, chunk_size=16):
+        """Save to a directory in the compact TileStore format, see TileStore.save"""
+        self._not_streaming("save")
+        store = self.store
+        if store is None:
+            store = TileStore(capacity=len(self.members))
+            for tile in self.members:
+                store.add_tile(tile)
+        store.save(path, chunk_size)
+
+    @classmethod
+    def load(cls, path, name="tilemap", mmap=True, depth_sort=False, prerender=False):
+        """Load a saved tilemap with "arrays" storage, memory mapped by default"""
+        tilemap = cls(name=name, storage="arrays", depth_sort=depth_sort)
+        tilemap.store = TileStore.load(path, mmap=mmap)
+        tilemap.store.depth_sort = tilemap.depth_sort
+        if prerender:
+            tilemap.rasterizer = ChunkRasterizer(tilemap.store)
+        return tilemap
+
+    def stream(self, provider, chunk_size=32, **kwargs):
+        """Stream tiles of an unbounded world in chunks around the camera.
+
+        provider(chunk_x, chunk_y, chunk_size) returns the tiles of a chunk, it is
+        called on a background thread pool, see ChunkStreamer for the options.
+        Indexing and the bulk operations (select, highlight, recolor) raise
+        RuntimeError on a streamed tilemap.
+        """
+        kwargs.setdefault("depth_sort", self.depth_sort)
+        self.streamer = ChunkStreamer(provider, chunk_size, **kwargs)
+        return self.streamer
+
+    def close(self):
+        if self.streamer is not None:
+            self.streamer.close()
+        if self.rasterizer is not None:
+            self.rasterizer.close()
+
+    def render(self, renderer):
+        if self.streamer is not None:
+            self.streamer.render(renderer)
+        elif self.rasterizer is not None:
+            self.rasterizer.render(renderer)
+        elif self.store is not None:
+            self.store.render(renderer)
+        else:
+            super().render(renderer)
+
+    # bulk operations, array ops in "arrays" storage
+    def select(self, rect):
+        """Indices of all tiles overlapping the game space rect (x, y, w, h)"""
+        self._not_streaming("select")
+        if self.store is not None:
+            return self.store.select(rect)
+        x, y, w, h = rect
+        return [
+            i
+            for i, t in enumerate(self.members)
+            if t.pos[0] < x + w
+            and t.pos[0] + t.size[0] > x
+            and t.pos[1] < y + h
+            and t.pos[1] + t.size[1] > y
+        ]
+
+    def _selected_tiles(self, selection):
+        if selection is None:
+            return self.members
+        return [self.members[i] for i in selection]
+
+    def highlight(self, selection=None, state=True):
+        """selection: tile indices, None for all tiles"""
+        self._not_streaming("highlight")
+        if self.store is not None:
+            return self.store.highlight(selection, state)
+        for tile in self._selected_tiles(selection):
+            tile.highlighted = state
+
+    def dim(self, selection=None):
+        self.highlight(selection, False)
+
+    def recolor(self, selection, color):
+        self._not_streaming("recolor")
+        if self.store is not None:
+            return self.store.recolor(selection, color)
+        for tile in self._selected_tiles(selection):
+            tile.color = color
 
 
 class Grid(Renderable):
@@ -250,6 +380,7 @@ class Grid(Renderable):
         self.width = width
 
     def render(self, renderer):
+        label_spacing = self.label_spacing if renderer.grid_labels else 0
 
         for x in range(self.minx, self.maxx + 1, self.dx):
             pygame.draw.line(
@@ -259,7 +390,7 @@ class Grid(Renderable):
                 width=self.width,
             )
             if (
-                self.label_spacing and (x % self.label_spacing == 0) and x < self.maxx
+                label_spacing and (x % label_spacing == 0) and x < self.maxx
             ):  # x axis
                 renderer.draw_text(
                     str(x),
@@ -274,7 +405,7 @@ class Grid(Renderable):
                 *renderer.screen_coords([(self.minx, y), (self.maxx, y)]),
                 width=self.width,
             )
-            if self.label_spacing and (y % self.label_spacing == 0) and y < self.maxy:
+            if label_spacing and (y % label_spacing == 0) and y < self.maxy:
                 renderer.draw_text(
                     str(y),
                     color=self.colory,
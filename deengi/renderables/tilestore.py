@@ -0,0 +1,833 @@
+import json
+import logging
+import math
+import weakref
+from pathlib import Path
+
+import numpy as np
+import pygame
+
+from deengi.assets import image_source, load_image
+from deengi.renderables.variants import scale_preserve_transparency, variant_cache
+
+MAX_WIDTH, MAX_HEIGHT = 1000, 1000
+
+# tile flags, stored per tile in TileStore.flags
+VISIBLE = 1
+HIGHLIGHTED = 2
+HOVERED = 4
+CLICKED = 8
+USE_MASK = 16
+
+DEFAULT_FLAGS = VISIBLE | HIGHLIGHTED
+NO_IMAGE = -1
+
+FILE_FORMAT = 1
+
+
+def image_render_size(img_size, zoom):
+    """Screen size of a tile image: its diagonal spans one tile diagonal at the given zoom"""
+    target_diagonal = 1.414
+    img_width, img_height = img_size
+    img_diagonal = math.sqrt(img_width**2 + img_height**2)
+    scale_factor = (target_diagonal / img_diagonal) * zoom
+    scaled_width = int(img_width * scale_factor)
+    scaled_height = int(img_height * scale_factor)
+    return min(scaled_width, MAX_WIDTH), min(scaled_height, MAX_HEIGHT)
+
+
+def _flag_property(flag):
+    def getter(self):
+        return bool(self.store.flags[self.index] & flag)
+
+    def setter(self, state):
+        self.store.set_flag(flag, state, self.index)
+
+    return property(getter, setter)
+
+
+class TileView:
+    """Lightweight proxy exposing the Tile API for a single row of a TileStore"""
+
+    __slots__ = ("store", "index")
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    visible = _flag_property(VISIBLE)
+    highlighted = _flag_property(HIGHLIGHTED)
+    hovered = _flag_property(HOVERED)
+    clicked = _flag_property(CLICKED)
+    use_mask = _flag_property(USE_MASK)
+
+    @property
+    def id(self):
+        return self.index
+
+    @property
+    def name(self):
+        return self.store.names.get(self.index, f"Tile {self.index}")
+
+    @name.setter
+    def name(self, name):
+        self.store.names[self.index] = name
+
+    @property
+    def pos(self):
+        x, y = self.store.pos[self.index].tolist()
+        return x, y
+
+    @pos.setter
+    def pos(self, pos):
+        self.store.pos[self.index] = pos
+        self.store.moved(self.index)
+
+    @property
+    def size(self):
+        w, h = self.store.size[self.index].tolist()
+        return w, h
+
+    @size.setter
+    def size(self, size):
+        self.store.size[self.index] = size
+        self.store.moved(self.index)
+
+    @property
+    def color(self):
+        return tuple(self.store.color[self.index].tolist())
+
+    @color.setter
+    def color(self, color):
+        self.store.recolor(self.index, color)
+
+    @property
+    def img(self):
+        image = self.store.image[self.index]
+        return None if image == NO_IMAGE else self.store.images[image]
+
+    @property
+    def click_callback(self):
+        return self.store.click_callbacks.get(self.index)
+
+    @property
+    def hover_callback(self):
+        return self.store.hover_callbacks.get(self.index)
+
+    @property
+    def rect(self):
+        return self.store.screen_rect(self.index)
+
+    def collidepoint(self, point):
+        """all in screen coords"""
+        return self.rect.collidepoint(point)
+
+    def toggle_visibility(self):
+        self.visible = not self.visible
+
+    def render(self, renderer):
+        self.store.render_indices(renderer, np.array([self.index]))
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, TileView)
+            and other.store is self.store
+            and other.index == self.index
+        )
+
+    def __hash__(self):
+        return hash((id(self.store), self.index))
+
+    def __repr__(self):
+        return f"TileView({self.name}, pos={self.pos}, size={self.size})"
+
+
+class TileStore:
+    """Struct-of-arrays storage for large tilemaps.
+
+    Every tile is a row in a handful of typed NumPy columns (position, size,
+    image index, color, flags). Images live once in a deduplicated asset table,
+    names and callbacks are kept sparse. Indexing or iterating hands out
+    TileView proxies, bulk operations work directly on the columns.
+
+    With a chunk_size, tiles are indexed by square chunks of game space and
+    rendering only touches the chunks in view. Stores saved with save() are
+    sorted by chunk, so a memory mapped load() only reads the viewed chunks.
+    Tiles added or moved through moved(indices) are re-indexed one by one,
+    chunk numbers stay stable until a full rebuild.
+    """
+
+    columns = ("pos", "size", "image", "color", "flags")
+
+    def __init__(
+        self, capacity=256, chunk_size=None, lazy_images=False, depth_sort=False
+    ):
+        """lazy_images: only record image paths until load_images() is called,
+        for stores built on worker threads
+        depth_sort: draw back to front by projected screen y of the tile centers"""
+        self.count = 0
+        self.pos = np.zeros((capacity, 2), np.float32)
+        self.size = np.zeros((capacity, 2), np.float32)
+        self.image = np.full(capacity, NO_IMAGE, np.int32)
+        self.color = np.zeros((capacity, 3), np.uint8)
+        self.flags = np.zeros(capacity, np.uint8)
+
+        self.images = []  # deduplicated asset table
+        self.lazy_images = lazy_images
+        self.image_keys = []
+        self._image_index = {}
+
+        self.names = {}
+        self.click_callbacks = {}
+        self.hover_callbacks = {}
+
+        self.version = 0  # bumped on every mutation
+        self.geometry_version = 0  # bumped when tiles are added or moved
+        self.visibility_version = 0  # bumped when VISIBLE flags change
+        self.camera = None  # camera of the last render, for screen space queries
+        # camera -> {"visible": (key, indices), "depth": (key, order, rank),
+        # "sorted": (indices, rank, result)}, so viewports don't evict each other
+        self._views = weakref.WeakKeyDictionary()
+
+        self.depth_sort = depth_sort
+        self._depth_visible = None  # depth_sorted state of calls without a camera
+        self._depth_mask = np.zeros(0, bool)  # scratch space for depth_sorted
+
+        self.chunk_size = chunk_size
+        self.chunk_keys = None  # (C, 2) chunk coordinates
+        self.chunk_offsets = None  # (C + 1) start of each chunk in chunk_order
+        self.chunk_order = None  # tile indices sorted by chunk, None if already sorted
+        self.chunk_epoch = 0  # bumped by every full rebuild, chunk numbers change
+        self.chunk_versions = None  # per chunk, version of its last change
+        self._chunk_margin = 0
+        self._chunk_version = None
+        self._reset_chunk_updates(0)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if not -self.count <= index < self.count:
+            raise IndexError(f"tile index {index} out of range ({self.count} tiles)")
+        return TileView(self, index % self.count)
+
+    def __iter__(self):
+        return (TileView(self, i) for i in range(self.count))
+
+    @property
+    def capacity(self):
+        return len(self.flags)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, column).nbytes for column in self.columns)
+
+    def reserve(self, capacity):
+        if capacity <= self.capacity:
+            return
+        capacity = max(capacity, 2 * self.capacity)
+        for column in self.columns:
+            old = getattr(self, column)
+            new = np.zeros((capacity,) + old.shape[1:], old.dtype)
+            if column == "image":
+                new[:] = NO_IMAGE
+            new[: self.count] = old[: self.count]
+            setattr(self, column, new)
+
+    # asset table
+    def add_image(self, img, colorkey=None):
+        """Index of img (file path or Surface) in the asset table, loading it once"""
+        key = (str(img), colorkey) if not isinstance(img, pygame.Surface) else img
+        if key not in self._image_index:
+            if isinstance(img, pygame.Surface):
+                surface = img
+            elif self.lazy_images:
+                surface = None
+            else:
+                surface = load_image(img, colorkey)
+            self._image_index[key] = len(self.images)
+            self.images.append(surface)
+            self.image_keys.append(key)
+        return self._image_index[key]
+
+    def load_images(self):
+        """Load images of a lazy_images store, must run on the main thread"""
+        for i, key in enumerate(self.image_keys):
+            if self.images[i] is None:
+                self.images[i] = load_image(*key)
+        self.lazy_images = False
+
+    # adding tiles
+    def add(
+        self,
+        game_position,
+        size,
+        img=None,
+        color=None,
+        click_callback=None,
+        hover_callback=None,
+        use_mask=False,
+        name=None,
+        colorkey=None,
+    ):
+        """Add a single tile, same arguments as Tile. Returns the tile index."""
+        index = self.count
+        self.reserve(index + 1)
+        self.pos[index] = game_position
+        self.size[index] = size
+        self.image[index] = NO_IMAGE if img is None else self.add_image(img, colorkey)
+        self.color[index] = color or (255, 255, 255)
+        self.flags[index] = DEFAULT_FLAGS | (USE_MASK if use_mask else 0)
+        if name is not None:
+            self.names[index] = name
+        if click_callback is not None:
+            self.click_callbacks[index] = click_callback
+        if hover_callback is not None:
+            self.hover_callbacks[index] = hover_callback
+        self.count += 1
+        self.moved(index)
+        return index
+
+    def add_many(
+        self,
+        positions,
+        sizes=(1, 1),
+        images=NO_IMAGE,
+        colors=(255, 255, 255),
+        flags=DEFAULT_FLAGS,
+    ):
+        """Bulk add tiles from arrays (or broadcastable scalars).
+
+        images are indices into the asset table, see add_image.
+        Returns the slice of the new tiles.
+        """
+        positions = np.asarray(positions, np.float32).reshape(-1, 2)
+        n = len(positions)
+        start = self.count
+        self.reserve(start + n)
+        new = slice(start, start + n)
+        self.pos[new] = positions
+        self.size[new] = sizes
+        self.image[new] = images
+        self.color[new] = colors
+        self.flags[new] = flags
+        self.count += n
+        self.moved(new)
+        return new
+
+    def add_tile(self, tile):
+        """Copy a Tile object into the store"""
+        index = self.add(
+            tile.pos,
+            tile.size,
+            color=tile.color,
+            click_callback=tile.click_callback,
+            hover_callback=tile.hover_callback,
+            use_mask=tile.use_mask,
+            name=tile.name,
+        )
+        if tile.img is not None:
+            self.image[index] = self.add_image(tile.img)
+        if not tile.highlighted:
+            self.flags[index] &= ~np.uint8(HIGHLIGHTED)
+        if not tile.visible:
+            self.flags[index] &= ~np.uint8(VISIBLE)
+        return index
+
+    def moved(self, indices=None):
+        """Mark positions or sizes as changed, of the tiles at indices (an
+        index, slice or array) or of all tiles"""
+        self.version += 1
+        self.geometry_version += 1
+        if self.chunk_keys is None or self._moved is None:
+            return
+        if indices is None:
+            self._moved = None  # rebuilt in full
+            return
+        if isinstance(indices, slice):
+            indices = np.arange(*indices.indices(self.count))
+        indices = np.atleast_1d(np.asarray(indices, np.int64))
+        self._moved.append(indices)
+        self._moved_count += len(indices)
+        if self._moved_count > self.count // 8 + 64:
+            self._moved = None  # cheaper to rebuild than to patch
+
+    # bulk operations
+    def _selection(self, selection):
+        return slice(0, self.count) if selection is None else selection
+
+    def changed(self, selection=None):
+        """Mark the tiles at selection (default all) as changed, for caches of
+        the store or of single chunks"""
+        self.version += 1
+        if selection is None:  # may include visibility
+            self.visibility_version += 1
+        if self.chunk_keys is None:
+            return
+        if selection is None:
+            self.chunk_versions[:] = self.version
+        else:
+            self.chunk_versions[self.chunk_of(selection)] = self.version
+
+    def set_flag(self, flag, state=True, selection=None):
+        indices = self._selection(selection)
+        if state:
+            self.flags[indices] |= np.uint8(flag)
+        else:
+            self.flags[indices] &= ~np.uint8(flag)
+        if flag & VISIBLE:
+            self.visibility_version += 1
+        self.changed(selection)
+
+    def highlight(self, selection=None, state=True):
+        self.set_flag(HIGHLIGHTED, state, selection)
+
+    def dim(self, selection=None):
+        self.set_flag(HIGHLIGHTED, False, selection)
+
+    def recolor(self, selection, color):
+        self.color[self._selection(selection)] = color
+        self.changed(selection)
+
+    def select(self, rect):
+        """Indices of all tiles overlapping the game space rect (x, y, w, h)"""
+        x, y, w, h = rect
+        pos, size = self.pos[: self.count], self.size[: self.count]
+        overlap = (
+            (pos[:, 0] < x + w)
+            & (pos[:, 0] + size[:, 0] > x)
+            & (pos[:, 1] < y + h)
+            & (pos[:, 1] + size[:, 1] > y)
+        )
+        return np.flatnonzero(overlap)
+
+    # screen space
+    def screen_rect(self, index, camera=None):
+        """Screen rect of a tile as of the last render, like Tile.rect,
+        or through camera if given"""
+        camera = camera or self.camera
+        if camera is None:
+            return pygame.Rect(0, 0, *self.size[index].tolist())
+        x, y = self.pos[index].tolist()
+        w, h = self.size[index].tolist()
+        zoom_x, zoom_y = camera.zoom_level
+        left, top = camera.screen_coords((x, y + h))
+        return pygame.Rect(left, top, w * zoom_x, h * zoom_y)
+
+    # chunk index
+    def build_chunk_index(self, chunk_size=None):
+        """Group tile indices by square chunks of chunk_size game units"""
+        self.chunk_size = chunk_size or self.chunk_size or 16
+        n = self.count
+        keys = np.floor(self.pos[:n] / self.chunk_size).astype(np.int32)
+        order = np.lexsort((keys[:, 0], keys[:, 1]))
+        keys = keys[order]
+        starts = np.flatnonzero(np.any(keys[1:] != keys[:-1], axis=1)) + 1
+        starts = np.concatenate([[0], starts]) if n else starts
+        self.chunk_keys = keys[starts]
+        self.chunk_offsets = np.append(starts, n)
+        sorted_already = np.array_equal(order, np.arange(n))
+        self.chunk_order = None if sorted_already else order.astype(np.int32)
+        self._chunk_margin = float(self.size[:n].max()) if n else 0
+        self._chunk_version = self.geometry_version
+        self.chunk_epoch += 1
+        self.chunk_versions = np.full(len(self.chunk_keys), self.version, np.int64)
+        self._reset_chunk_updates(n)
+
+    def _reset_chunk_updates(self, indexed):
+        self._indexed = indexed  # tiles covered by chunk_offsets / chunk_order
+        self._assigned = indexed  # tiles with a chunk
+        self._moved = []  # index arrays of tiles moved since the last update
+        self._moved_count = 0
+        self._chunk_lookup = None  # (chunk_x, chunk_y) -> chunk number
+        self._base_chunk = None  # chunk in chunk_offsets per tile, -1 if added later
+        self._tile_chunk = None  # current chunk of each tile
+        self._extra = {}  # chunk -> tiles in it that are not in its chunk_offsets range
+        self._extra_count = 0
+
+    def update_chunk_index(self):
+        """Bring the chunk index up to date with the tile geometry"""
+        if self._chunk_version == self.geometry_version:
+            return
+        if self.chunk_keys is None or self._moved is None:
+            self.build_chunk_index()
+            return
+        n = self.count
+        moved = np.unique(np.concatenate(self._moved + [np.arange(self._assigned, n)]))
+        moved = moved[moved < n]
+        self._moved, self._moved_count, self._assigned = [], 0, n
+        self._chunk_version = self.geometry_version
+        if not len(moved):
+            return
+
+        base, current = self._chunk_assignment(n)
+        if self._chunk_lookup is None:
+            self._chunk_lookup = {
+                key: chunk
+                for chunk, key in enumerate(map(tuple, self.chunk_keys.tolist()))
+            }
+        lookup, extra = self._chunk_lookup, self._extra
+        keys = np.floor(self.pos[moved] / self.chunk_size).astype(np.int32).tolist()
+        new_keys, touched = [], []
+        for index, key in zip(moved.tolist(), map(tuple, keys)):
+            chunk = lookup.get(key)
+            if chunk is None:
+                chunk = lookup[key] = len(self.chunk_keys) + len(new_keys)
+                new_keys.append(key)
+            old = current[index]
+            touched.append(chunk)
+            if chunk == old:
+                continue
+            if old >= 0:
+                touched.append(old)
+            if old != base[index]:
+                extra[old].discard(index)
+                self._extra_count -= 1
+            if chunk != base[index]:
+                extra.setdefault(chunk, set()).add(index)
+                self._extra_count += 1
+            current[index] = chunk
+        if new_keys:
+            new_keys = np.array(new_keys, np.int32).reshape(-1, 2)
+            self.chunk_keys = np.concatenate([self.chunk_keys, new_keys])
+            grown = np.full(len(new_keys), self.version, np.int64)
+            self.chunk_versions = np.concatenate([self.chunk_versions, grown])
+        self.chunk_versions[touched] = self.version
+        self._chunk_margin = max(self._chunk_margin, float(self.size[moved].max()))
+        if self._extra_count > n // 4 + 64:  # most tiles out of place, start over
+            self.build_chunk_index()
+
+    def _chunk_assignment(self, n):
+        """(chunk in chunk_offsets, current chunk) of every tile, -1 if none"""
+        if self._base_chunk is None:
+            counts = np.diff(self.chunk_offsets)
+            in_order = np.repeat(np.arange(len(counts), dtype=np.int32), counts)
+            base = np.full(n, -1, np.int32)
+            if self.chunk_order is None:
+                base[: self._indexed] = in_order
+            else:
+                base[self.chunk_order] = in_order
+            self._base_chunk, self._tile_chunk = base, base.copy()
+        elif len(self._base_chunk) < n:
+            grow = np.full(n - len(self._base_chunk), -1, np.int32)
+            self._base_chunk = np.concatenate([self._base_chunk, grow])
+            self._tile_chunk = np.concatenate([self._tile_chunk, grow])
+        return self._base_chunk, self._tile_chunk
+
+    def chunks_in(self, rect):
+        """Numbers of the chunks overlapping the game space rect (x, y, w, h)"""
+        self.update_chunk_index()
+        x, y, w, h = rect
+        margin = self._chunk_margin
+        lo_x, lo_y = math.floor((x - margin) / self.chunk_size), math.floor(
+            (y - margin) / self.chunk_size
+        )
+        hi_x, hi_y = math.floor((x + w) / self.chunk_size), math.floor(
+            (y + h) / self.chunk_size
+        )
+        keys = self.chunk_keys
+        return np.flatnonzero(
+            (keys[:, 0] >= lo_x)
+            & (keys[:, 0] <= hi_x)
+            & (keys[:, 1] >= lo_y)
+            & (keys[:, 1] <= hi_y)
+        )
+
+    def chunk_of(self, indices):
+        """Chunk numbers of tiles"""
+        self.update_chunk_index()
+        if self._tile_chunk is None:
+            self._chunk_assignment(self.count)
+        return self._tile_chunk[indices]
+
+    def _extra_members(self, chunks):
+        extra = [self._extra.get(chunk) for chunk in chunks]
+        extra = [np.fromiter(tiles, np.int64) for tiles in extra if tiles]
+        return np.concatenate(extra) if extra else None
+
+    def chunk_members(self, chunk):
+        """Tile indices of one chunk, in insertion order"""
+        self.update_chunk_index()
+        return self._members(np.array([chunk]))
+
+    def chunk_indices(self, rect):
+        """Indices of all tiles in chunks overlapping the game space rect (x, y, w, h)"""
+        return self._members(self.chunks_in(rect))
+
+    def _members(self, chunks):
+        """Tile indices of chunks in insertion order, the index has to be current"""
+        indexed = chunks[chunks < len(self.chunk_offsets) - 1]
+        starts = self.chunk_offsets[indexed]
+        lengths = self.chunk_offsets[indexed + 1] - starts
+        # concatenated ranges starts[i]:starts[i] + lengths[i]
+        ends = np.cumsum(lengths)
+        indices = np.arange(ends[-1] if len(ends) else 0) + np.repeat(
+            starts - ends + lengths, lengths
+        )
+        if self.chunk_order is not None:
+            indices = self.chunk_order[indices]
+        if not self._extra_count:
+            return np.sort(indices) if self.chunk_order is not None else indices
+        # tiles moved out of their range are listed with the chunk they are in now
+        indices = indices[self._tile_chunk[indices] == self._base_chunk[indices]]
+        extra = self._extra_members(chunks.tolist())
+        if extra is not None:
+            indices = np.concatenate([indices, extra])
+        return np.sort(indices)
+
+    def visible_indices(self, renderer, indices=None):
+        """Indices of visible tiles whose projection lands on the renderer's display.
+
+        Without indices, the result is reused until the camera, the display
+        size, the tile geometry or visibility change; highlights keep it.
+        """
+        if indices is None:
+            camera = renderer.camera
+            view = self._view(camera)
+            key = (
+                camera.view_version,
+                self.geometry_version,
+                self.visibility_version,
+                renderer.display.get_size(),
+            )
+            cached = view.get("visible")
+            if cached is None or cached[0] != key:
+                cached = view["visible"] = (key, self._visible_indices(renderer))
+            return cached[1]
+        return self._visible_indices(renderer, indices)
+
+    def _view(self, camera):
+        """Cached culling and depth state of camera"""
+        view = self._views.get(camera)
+        if view is None:
+            view = self._views[camera] = {}
+        return view
+
+    def _visible_indices(self, renderer, indices=None):
+        if indices is None and self.chunk_size:
+            view = renderer.camera.view_rect(renderer.display.get_size())
+            indices = self.chunk_indices(view)
+        elif indices is None:
+            indices = np.arange(self.count)
+        if not len(indices):
+            return indices
+        indices = indices[(self.flags[indices] & VISIBLE) != 0]
+        camera = renderer.camera
+        size = self.size[indices]
+        centers = camera.screen_coords_array(self.pos[indices] + size / 2)
+        zoom = max(abs(camera.zoom_level[0]), abs(camera.zoom_level[1]))
+        margin = size.max(axis=1) * zoom + 1
+        width, height = renderer.display.get_size()
+        on_screen = (
+            (centers[:, 0] + margin > 0)
+            & (centers[:, 0] - margin < width)
+            & (centers[:, 1] + margin > 0)
+            & (centers[:, 1] - margin < height)
+        )
+        return indices[on_screen]
+
+    # rendering
+    def scaled_image(self, image, highlighted, zoom):
+        """Image scaled for the current zoom, shared by all tiles using it"""
+        source = self.images[image]
+        size = image_render_size(source.get_size(), zoom)
+        return variant_cache.scaled(source, size, None if highlighted else "gray")
+
+    def depth_rank(self, camera):
+        """Back to front rank of every tile, re-sorted only when the camera
+        orientation or the tile geometry changed"""
+        view = self._view(camera)
+        key = (camera.depth_axis, self.geometry_version)
+        cached = view.get("depth")
+        if cached is None or cached[0] != key:
+            n = self.count
+            dx, dy = camera.depth_axis
+            centers = self.pos[:n] + self.size[:n] / 2
+            depth = centers[:, 0] * dx + centers[:, 1] * dy
+            order = None if cached is None else cached[1]
+            if order is not None and len(order) <= n:
+                # timsort finds the runs of the previous order, nearly sorted is O(N)
+                order = order[np.argsort(depth[order], kind="stable")]
+                if len(order) < n:  # merge the added tiles in
+                    added = np.arange(len(order), n)
+                    added = added[np.argsort(depth[added], kind="stable")]
+                    at = np.searchsorted(depth[order], depth[added], side="right")
+                    order = np.insert(order, at, added)
+            else:
+                order = np.argsort(depth, kind="stable")
+            rank = np.empty(n, np.int64)
+            rank[order] = np.arange(n)
+            cached = view["depth"] = (key, order, rank)
+        return cached[2]
+
+    def render(self, renderer):
+        if renderer.interactive:
+            self.camera = renderer.camera
+        if self.count:
+            indices = self.visible_indices(renderer)
+            if self.depth_sort:
+                camera = renderer.camera
+                indices = self.depth_sorted(indices, self.depth_rank(camera), camera)
+            self.render_indices(renderer, indices)
+
+    def depth_sorted(self, indices, rank, camera=None):
+        """indices back to front, updated from the last call's result for
+        the same camera.
+
+        Tiles that stay in view keep their order, which timsort re-checks in
+        linear time; only tiles entering the view are sorted and merged in.
+        """
+        view = None if camera is None else self._view(camera)
+        last = self._depth_visible if view is None else view.get("sorted")
+        if last is not None and last[0] is indices and last[1] is rank:
+            return last[2]
+        if last is None:
+            result = indices[np.argsort(rank[indices], kind="stable")]
+        else:
+            if len(self._depth_mask) < self.count:
+                self._depth_mask = np.zeros(self.capacity, bool)
+            mask = self._depth_mask
+            mask[indices] = True
+            kept = last[2][mask[last[2]]]
+            mask[kept] = False
+            entering = indices[mask[indices]]
+            mask[entering] = False
+            kept = kept[np.argsort(rank[kept], kind="stable")]
+            entering = entering[np.argsort(rank[entering])]
+            at = np.searchsorted(rank[kept], rank[entering])
+            result = np.insert(kept, at, entering)
+        if view is None:
+            self._depth_visible = (indices, rank, result)
+        else:
+            view["sorted"] = (indices, rank, result)
+        return result
+
+    def render_indices(self, renderer, indices):
+        """Draw the given tiles in order, batching consecutive image blits"""
+        if not len(indices):
+            return
+        camera = renderer.camera
+        if renderer.interactive:
+            self.camera = camera
+        self.draw(
+            renderer.display,
+            indices,
+            camera.screen_coords_array,
+            self.scaled_images(indices, camera.zoom_level[0]),
+        )
+        if renderer.debug:
+            for index in indices.tolist():
+                pygame.draw.rect(
+                    renderer.display,
+                    rect=self.screen_rect(index, camera),
+                    color=renderer.get_color("DEBUG"),
+                    width=1,
+                )
+
+    def scaled_images(self, indices, zoom):
+        """Scaled image of every tile, None for area tiles"""
+        images = self.image[indices].tolist()
+        highlighted = ((self.flags[indices] & HIGHLIGHTED) != 0).tolist()
+        return [
+            None if image == NO_IMAGE else self.scaled_image(image, lit, zoom)
+            for image, lit in zip(images, highlighted)
+        ]
+
+    def draw(self, target, indices, project, scaled):
+        """Draw tiles onto target, only reads the store so it is safe on worker threads.
+
+        project: maps an array of game points to target pixels
+        scaled: image surface per tile, None for area tiles
+        """
+        pos, size = self.pos[indices], self.size[indices]
+        centers = project(pos + size / 2).tolist()
+        corners = np.stack(
+            [pos, pos + size * (1, 0), pos + size, pos + size * (0, 1)], axis=1
+        )
+        corners = project(corners).tolist()
+        colors = self.color[indices].tolist()
+
+        blits = []
+        for k, image in enumerate(scaled):
+            if image is None:
+                if blits:
+                    target.blits(blits, doreturn=False)
+                    blits = []
+                pygame.draw.polygon(target, colors[k], corners[k])
+            else:
+                x, y = centers[k]
+                w, h = image.get_size()
+                blits.append((image, (x - w // 2, y - h // 2)))
+        if blits:
+            target.blits(blits, doreturn=False)
+
+    # on disk format
+    def _asset_source(self, key):
+        if isinstance(key, pygame.Surface):
+            key = image_source(key)
+            if key is None:
+                raise ValueError("Images not loaded from a file can not be saved")
+        path, colorkey = key
+        return [path, colorkey]
+
+    def save(self, path, chunk_size=None):
+        """Save as a directory of .npy columns sorted by chunk plus an asset table.
+
+        Click and hover callbacks are code, not data, and are not saved.
+        """
+        path = Path(path)
+        if self.click_callbacks or self.hover_callbacks:
+            logging.warning(
+                f"Tile callbacks are not saved to {path}, set them again after loading"
+            )
+        path.mkdir(parents=True, exist_ok=True)
+        self.build_chunk_index(chunk_size)
+        n = self.count
+        order = self.chunk_order if self.chunk_order is not None else np.arange(n)
+        for column in self.columns:
+            np.save(path / f"{column}.npy", getattr(self, column)[:n][order])
+        np.save(path / "chunk_keys.npy", self.chunk_keys)
+        np.save(path / "chunk_offsets.npy", self.chunk_offsets)
+
+        new_index = np.empty(n, np.int64)
+        new_index[order] = np.arange(n)
+        meta = {
+            "format": FILE_FORMAT,
+            "count": n,
+            "chunk_size": self.chunk_size,
+            "chunk_margin": self._chunk_margin,
+            "assets": [self._asset_source(key) for key in self.image_keys],
+            "names": {int(new_index[i]): name for i, name in self.names.items()},
+        }
+        with open(path / "tilemap.json", "w") as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load a store written by save().
+
+        mmap: memory map the columns copy-on-write, tile data is only read
+        from disk for the chunks that are actually accessed
+        """
+        path = Path(path)
+        with open(path / "tilemap.json") as f:
+            meta = json.load(f)
+        if meta["format"] != FILE_FORMAT:
+            raise ValueError(f"Unsupported tilemap format {meta['format']} in {path}")
+
+        store = cls(capacity=0, chunk_size=meta["chunk_size"])
+        mmap_mode = "c" if mmap and meta["count"] else None
+        for column in cls.columns:
+            setattr(store, column, np.load(path / f"{column}.npy", mmap_mode=mmap_mode))
+        store.count = meta["count"]
+        for asset, colorkey in meta["assets"]:
+            store.add_image(asset, tuple(colorkey) if colorkey else None)
+        store.names = {int(i): name for i, name in meta["names"].items()}
+
+        store.chunk_keys = np.load(path / "chunk_keys.npy")
+        store.chunk_offsets = np.load(path / "chunk_offsets.npy")
+        store._chunk_margin = meta["chunk_margin"]
+        store._chunk_version = store.geometry_version
+        store.chunk_versions = np.zeros(len(store.chunk_keys), np.int64)
+        store._reset_chunk_updates(store.count)
+        return store
@@ -32,18 +32,27 @@ class Label(Renderable):
 
 
 class Tooltip(Renderable):
+    """Text box following the mouse while hovering, built once per text and color"""
+
     def __init__(self, text, color=None):
         self.text = text
         self.is_hovering = False
+        self.pos = None  # follows pygame's mouse position if not set
         self.color = color or (0, 0, 0)
+        self._surface = None
+        self._surface_key = None
 
-    def set_hover(self, state):
+    def set_hover(self, state, pos=None):
         self.is_hovering = state
+        self.pos = pos
 
     def render(self, renderer):
         if not self.is_hovering:
             return
-        tooltip = pygame.Surface(((200, 50)))
-        tooltip.fill(self.color)
-        renderer.draw_text(self.text, pos=(10, 10), size=20, onto=tooltip)
-        renderer.display.blit(tooltip, pygame.mouse.get_pos())
+        key = (self.text, self.color)
+        if key != self._surface_key:
+            self._surface = pygame.Surface(((200, 50)))
+            self._surface.fill(self.color)
+            renderer.draw_text(self.text, pos=(10, 10), size=20, onto=self._surface)
+            self._surface_key = key
+        renderer.display.blit(self._surface, self.pos or pygame.mouse.get_pos())
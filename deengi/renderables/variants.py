@@ -0,0 +1,172 @@
+from collections import OrderedDict
+
+import numpy as np
+import pygame
+
+
+def scale_preserve_transparency(source, size):
+    return convert_like(pygame.transform.scale(source, size), source)
+
+
+def convert_like(scaled, source):
+    """scaled in the display format, transparent like source.
+    Needs the display, so only on the main thread."""
+    colorkey = source.get_colorkey()
+    if colorkey is not None:
+        scaled.set_colorkey(colorkey)
+        return scaled.convert()
+    return scaled.convert_alpha()
+
+
+def map_rgb(img, function):
+    """Copy of img with function applied to its RGB pixels as a float array.
+
+    Alpha is kept as is, pixels matching the colorkey stay untouched.
+    """
+    result = img.copy()
+    rgb = pygame.surfarray.pixels3d(result)
+    mapped = function(rgb.astype(np.float32))
+    colorkey = img.get_colorkey()
+    if colorkey is not None:
+        keyed = np.all(rgb == colorkey[:3], axis=2)
+        mapped[keyed] = colorkey[:3]
+    rgb[...] = np.clip(mapped, 0, 255).astype(np.uint8)
+    del rgb  # unlock the surface
+    return result
+
+
+def grayscale(img):
+    weights = np.array((0.3, 0.59, 0.11), np.float32)
+    return map_rgb(img, lambda rgb: np.repeat((rgb @ weights)[..., None], 3, axis=2))
+
+
+def tint(img, color, strength=0.5):
+    color = np.array(color[:3], np.float32)
+    return map_rgb(img, lambda rgb: rgb + (color - rgb) * strength)
+
+
+def highlight(img, amount=0.3):
+    return map_rgb(img, lambda rgb: rgb + (255 - rgb) * amount)
+
+
+def brightness(img, factor):
+    return map_rgb(img, lambda rgb: rgb * factor)
+
+
+VARIANTS = {
+    "gray": grayscale,
+    "tint": tint,
+    "highlight": highlight,
+    "brightness": brightness,
+}
+
+
+def register_variant(name, function):
+    """function(surface, *args) -> new surface"""
+    VARIANTS[name] = function
+
+
+def surface_bytes(surface):
+    return surface.get_pitch() * surface.get_height()
+
+
+class VariantCache:
+    """Image variants shared by everything drawing the same source surface.
+
+    Variants are computed once per source image, scaled ones once per size,
+    so views at different zoom levels each keep theirs. Entries are evicted
+    least recently used first once they take more than max_bytes; with
+    max_sources, the least recently used source is evicted with all its
+    variants when there are more sources.
+    """
+
+    def __init__(self, max_bytes=256 * 2**20, max_sources=None):
+        self.max_bytes = max_bytes
+        self.max_sources = max_sources
+        self.nbytes = 0
+        self._entries = OrderedDict()  # (source, key) -> surface, oldest first
+        self._sources = OrderedDict()  # source -> its keys in _entries
+
+    def __len__(self):
+        return len(self._sources)
+
+    def _lookup(self, source, key):
+        surface = self._entries.get((source, key))
+        if surface is not None:
+            self._entries.move_to_end((source, key))
+            self._sources.move_to_end(source)
+        return surface
+
+    def _store(self, source, key, surface):
+        self._entries[source, key] = surface
+        self.nbytes += surface_bytes(surface)
+        keys = self._sources.get(source)
+        if keys is None:
+            keys = self._sources[source] = set()
+        else:
+            self._sources.move_to_end(source)
+        keys.add(key)
+        if self.max_sources is not None:
+            while len(self._sources) > self.max_sources:
+                self.evict(next(iter(self._sources)))
+        while self.nbytes > self.max_bytes and len(self._entries) > 1:
+            (oldest, oldest_key), _ = next(iter(self._entries.items()))
+            self._drop(oldest, oldest_key)
+        return surface
+
+    def _drop(self, source, key):
+        self.nbytes -= surface_bytes(self._entries.pop((source, key)))
+        keys = self._sources[source]
+        keys.discard(key)
+        if not keys:
+            del self._sources[source]
+
+    def get(self, source, variant=None, *args):
+        """source with a variant from VARIANTS applied, None for the source itself"""
+        if variant is None:
+            return source
+        key = (variant, args)
+        surface = self._lookup(source, key)
+        if surface is None:
+            surface = self._store(source, key, VARIANTS[variant](source, *args))
+        return surface
+
+    def scaled(self, source, size, variant=None, *args):
+        """Variant scaled to size, kept per size"""
+        key = ("scaled", variant, args, tuple(size))
+        surface = self._lookup(source, key)
+        if surface is None:
+            image = self.get(source, variant, *args)
+            surface = self._store(source, key, scale_preserve_transparency(image, size))
+        return surface
+
+    def scale_all(self, requests, executor):
+        """Make scaled() hits of many (source, size, variant) requests at once.
+
+        Missing images are scaled concurrently on the executor's threads,
+        pygame releases the GIL while scaling; converting them to the display
+        format happens here, on the calling thread.
+        """
+        jobs = {}
+        for source, size, variant in requests:
+            key = ("scaled", variant, (), tuple(size))
+            if (source, key) not in jobs and self._lookup(source, key) is None:
+                image = self.get(source, variant)
+                jobs[source, key] = (
+                    image,
+                    executor.submit(pygame.transform.scale, image, size),
+                )
+        for (source, key), (image, future) in jobs.items():
+            self._store(source, key, convert_like(future.result(), image))
+
+    def evict(self, source):
+        for key in list(self._sources.get(source, ())):
+            self._drop(source, key)
+
+    def clear(self):
+        self._entries.clear()
+        self._sources.clear()
+        self.nbytes = 0
+
+
+variant_cache = VariantCache()
@@ -1,3 +1,6 @@
+import bisect
+import itertools
+from collections.abc import MutableMapping
 import sys
 import pygame as pg
 from pathlib import Path
@@ -75,10 +78,48 @@ class Renderer:
 
         # defaults
         self.lineheight = 25
-        self.font = Font(FONT_PATH / "small_font.png")
-        self.titlefont = Font(FONT_PATH / "large_font.png")
+        self._font = None  # default fonts are parsed on first use
+        self._titlefont = None
 
         self.debug_statements = []
+        # False for secondary views, renderables then leave the screen space
+        # state used by mouse hit tests alone
+        self.interactive = True
+
+        # quality settings, lowered by Engine.quality when frames run long
+        self.grid_labels = True
+        self.glow = True
+        self.max_particles = None  # None draws all particles
+
+    @property
+    def font(self):
+        if self._font is None:
+            self._font = Font(FONT_PATH / "small_font.png")
+        return self._font
+
+    @font.setter
+    def font(self, font):
+        self._font = font
+
+    @property
+    def titlefont(self):
+        if self._titlefont is None:
+            self._titlefont = Font(FONT_PATH / "large_font.png")
+        return self._titlefont
+
+    @titlefont.setter
+    def titlefont(self, font):
+        self._titlefont = font
+
+    def view(self, display, camera, pixel_scale=(1, 1)):
+        """Non-interactive renderer drawing onto display through camera,
+        sharing fonts, colors and settings with this one, see RendererView"""
+        return RendererView(self, display, camera, pixel_scale)
+
+    def set_display(self, display):
+        """Draw onto another surface, e.g. an offscreen one at a lower resolution"""
+        self.display = display
+        self.cx, self.cy = display.get_width() // 2, display.get_height() // 2
 
     def screen_coords(self, coords):
         return self.camera.screen_coords(coords)
@@ -159,22 +200,48 @@ class Renderer:
             self.draw_textline(line, color, (px, py + dy), **kwargs)
             dy += lineheight if lineheight else self.lineheight
 
+    def text_surface(
+        self, text: str, size=20, lineheight=None, border_width=2, font=None, **kwargs
+    ):
+        """draw_text onto a transparent surface just large enough for it.
+
+        Returns (surface, offset), blit it at pos + offset to get the same
+        result as draw_text at pos. For text that is drawn every frame.
+        """
+        font = font or self.font
+        lines = text.splitlines() or [""]
+        lineheight = lineheight if lineheight else self.lineheight
+        sizes = [font.text_size(line, size) for line in lines]
+        width = max(w for w, h in sizes) + 2 * border_width
+        height = (len(lines) - 1) * lineheight + sizes[-1][1] + 2 * border_width
+        surface = pg.Surface((max(width, 1), max(height, 1)), pg.SRCALPHA)
+        self.draw_text(
+            text,
+            pos=(border_width, border_width),
+            lineheight=lineheight,
+            size=size,
+            border_width=border_width,
+            font=font,
+            onto=surface,
+            **kwargs,
+        )
+        return surface, (-border_width, -border_width)
+
     def draw_bg(self, color=None):
         color = color or self.get_color("background")
         self.display.fill(color)
 
     # button
-    def render_button(self, button):
+    def button_surface(self, button):
+        """(surface, margin) of a button in its current state, the outline
+        extends margin pixels beyond the button on each side"""
+        margin = 1 + button.hovered - button.pressed
         button_surf = pg.Surface(button.size)
         button_surf.fill(
             self.get_color("Button hovered")
             if button.hovered
             else self.get_color("Button")
         )
-        # outline
-        self.outline(
-            button_surf, button.position, pixel=1 + button.hovered - button.pressed
-        )
         # text
         offset = 5 + 2 * button.pressed
         self.draw_text(
@@ -184,15 +251,26 @@ class Renderer:
             size=20,
             border_width=1 + button.hovered,
         )
-        # button
-        self.display.blit(button_surf, button.position)
+        width, height = button.size
+        surface = pg.Surface((width + 2 * margin, height + 2 * margin), pg.SRCALPHA)
+        # outline
+        self.outline(button_surf, (margin, margin), pixel=margin, onto=surface)
+        surface.blit(button_surf, (margin, margin))
+        return surface, margin
+
+    def render_button(self, button):
+        button.render(self)
 
     # particle renderer
     def draw_particles(self, particleList, color):
+        if self.max_particles is not None:
+            particleList = particleList[: self.max_particles]
         for p in particleList:
             pos = self.camera.screen_coords(p.pos)
             x, y = pos
             pg.draw.circle(self.display, color, pos, p.lifetime / 8)
+            if not self.glow:
+                continue
             glow_color = color_interpolation((0, 0, 0), color, 0.2)
             radius = p.lifetime / 3
             self.display.blit(
@@ -202,10 +280,110 @@ class Renderer:
             )
 
 
+class RendererView(Renderer):
+    """A Renderer with its own display and camera that reads and writes every
+    other attribute on parent, so debug mode, quality settings and the
+    lazily parsed fonts stay those of the parent renderer."""
+
+    _own = frozenset(
+        ("parent", "display", "cx", "cy", "camera", "interactive", "pixel_scale")
+    )
+
+    def __init__(self, parent, display, camera, pixel_scale=(1, 1)):
+        """pixel_scale: display pixels per pixel of the camera's surface, for
+        a view drawing onto a surface of another resolution than the camera"""
+        self.parent = parent
+        self.set_display(display)
+        self.camera = camera
+        self.interactive = False
+        self.pixel_scale = tuple(pixel_scale)
+
+    def __getattr__(self, name):
+        if name == "parent":  # not set yet, e.g. while copying
+            raise AttributeError(name)
+        return getattr(self.parent, name)
+
+    def __setattr__(self, name, value):
+        if name in self._own:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.parent, name, value)
+
+    def screen_coords(self, coords):
+        screen = self.camera.screen_coords(coords)
+        if self.pixel_scale == (1, 1):
+            return screen
+        return _scale_coords(screen, self.pixel_scale)
+
+
+def _scale_coords(screen, scale):
+    """A point, Rect or list of them as returned by screen_coords, scaled"""
+    sx, sy = scale
+    if isinstance(screen, list):
+        return [_scale_coords(item, scale) for item in screen]
+    if isinstance(screen, pg.Rect):
+        return pg.Rect(
+            round(screen.x * sx),
+            round(screen.y * sy),
+            round(screen.w * sx),
+            round(screen.h * sy),
+        )
+    return pg.Vector2(screen[0] * sx, screen[1] * sy)
+
+
+class CallbackRenderable:
+    """Wraps a (callback, kwargs) layer entry, called without the renderer.
+
+    Methods of a Renderer are called on the renderer the layer is rendered
+    with instead, so they draw into viewports too.
+    """
+
+    visible = True
+
+    def __init__(self, callback, kwargs):
+        self.callback = callback
+        self.kwargs = kwargs
+        owner = getattr(callback, "__self__", None)
+        self.function = callback.__func__ if isinstance(owner, Renderer) else None
+
+    def render(self, renderer):
+        if self.function is not None:
+            self.function(renderer, **self.kwargs)
+        else:
+            self.callback(**self.kwargs)
+
+
 class Layer:
-    def __init__(self):
-        self.content = []
-        self.visible = True
+    """Renderables drawn together, removable by handle without a search.
+
+    Entries are Renderables or (callback, kwargs) tuples. Their render
+    callables are resolved once on add. Within a layer, entries draw by
+    ascending z, and by insertion order for equal z. The draw list is kept
+    sorted: add, remove and set_z find their place with a bisect, then
+    insert into or delete from a Python list, which moves the entries
+    after it. That is O(N) but a memmove, a few microseconds up to about
+    10k entries and some 20 us at 100k. Adding or removing entries while
+    the layer renders takes effect from the next render.
+    """
+
+    def __init__(self, name="", visible=True):
+        self.name = name
+        self.visible = visible
+        self._entries = {}  # handle -> (z, handle, item, renderable, render callable)
+        self._handles = {}  # id(item) -> handle
+        self._next_handle = itertools.count()
+        self._draw_list = []  # entries sorted by (z, handle)
+        self._rendering = None  # the draw list being iterated, copied before changes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        """items in draw order"""
+        return (entry[2] for entry in self.entries())
+
+    def __contains__(self, item):
+        return id(item) in self._handles
 
     def show(self):
         self.visible = True
@@ -216,9 +394,91 @@ class Layer:
     def toggle_visibility(self):
         self.visible = not self.visible
 
+    def _writable_draw_list(self):
+        if self._draw_list is self._rendering:
+            self._draw_list = list(self._draw_list)
+        return self._draw_list
+
+    def _handle(self, item):
+        return item if isinstance(item, int) else self._handles[id(item)]
+
+    def add(self, item, z=0):
+        """Add a Renderable or (callback, kwargs) tuple, returns its handle"""
+        if id(item) in self._handles:
+            raise ValueError(f"{item!r} is already in layer {self.name!r}")
+        if isinstance(item, tuple):
+            renderable = CallbackRenderable(*item)
+        else:
+            renderable = item
+        handle = next(self._next_handle)
+        entry = (z, handle, item, renderable, renderable.render)
+        self._entries[handle] = entry
+        self._handles[id(item)] = handle
+        bisect.insort(self._writable_draw_list(), entry)
+        return handle
+
+    def append(self, item):
+        self.add(item)
+
+    def remove(self, item):
+        """Remove by handle or by the added item itself"""
+        handle = self._handle(item)
+        z, handle, item, renderable, render = self._entries.pop(handle)
+        del self._handles[id(item)]
+        draw_list = self._writable_draw_list()
+        del draw_list[bisect.bisect_left(draw_list, (z, handle))]
+
+    def set_z(self, item, z):
+        handle = self._handle(item)
+        old = self._entries[handle]
+        draw_list = self._writable_draw_list()
+        del draw_list[bisect.bisect_left(draw_list, old[:2])]
+        entry = self._entries[handle] = (z,) + old[1:]
+        bisect.insort(draw_list, entry)
+
+    def clear(self):
+        self._entries.clear()
+        self._handles.clear()
+        self._draw_list = []
+
+    def entries(self):
+        """(z, handle, item, renderable, render callable) in draw order, a copy"""
+        return list(self._draw_list)
+
     def render(self, renderer):
-        for renderable in self.content:
-            renderable.render(renderer)
+        draw_list, outer = self._draw_list, self._rendering
+        self._rendering = draw_list
+        try:
+            for z, handle, item, renderable, render in draw_list:
+                if renderable.visible:
+                    render(renderer)
+        finally:
+            self._rendering = outer
+
+
+class LayerVisibility(MutableMapping):
+    """Live layer name -> visible mapping, writing to it shows or hides layers"""
+
+    def __init__(self, layers):
+        self.layers = layers
+
+    def __getitem__(self, name):
+        return self.layers[name].visible
+
+    def __setitem__(self, name, visible):
+        self.layers[name].visible = visible
+
+    def __delitem__(self, name):
+        raise TypeError("layers can not be removed through their visibility")
+
+    def __iter__(self):
+        return iter(self.layers)
+
+    def __len__(self):
+        return len(self.layers)
+
+    def __repr__(self):
+        return repr(dict(self))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,188 @@
+import gzip
+import json
+
+import pygame as pg
+
+FILE_FORMAT = 2  # 1 was a pickle, which runs code on load and is not read anymore
+_PLAIN = (int, float, str, bool, tuple, type(None))
+
+
+class InputRecording:
+    """Input of a session, frame by frame.
+
+    Each frame is (dt, events, keys, mouse): the frame's dt in seconds, its
+    events as (type, attributes), the pressed scancodes and the mouse
+    ((x, y), buttons) state. keys and mouse are None when unchanged since
+    the previous frame, which keeps long sessions small.
+    """
+
+    def __init__(self, frames=None, key_count=0):
+        self.frames = frames if frames is not None else []
+        self.key_count = key_count
+
+    def __len__(self):
+        return len(self.frames)
+
+    def save(self, path):
+        """Write gzip compressed JSON lines, a header and then one line per frame.
+        Recordings are plain data, loading a shared one runs no code."""
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            header = {"format": FILE_FORMAT, "key_count": self.key_count}
+            f.write(json.dumps(header) + "\n")
+            for frame in self.frames:
+                f.write(json.dumps(frame) + "\n")
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            try:
+                header = json.loads(f.readline())
+            except (UnicodeDecodeError, json.JSONDecodeError):
+                header = {}
+            if not isinstance(header, dict) or header.get("format") != FILE_FORMAT:
+                raise ValueError(
+                    f"{path} is not an input recording of format {FILE_FORMAT}"
+                )
+            frames = [_tuples(json.loads(line)) for line in f if line.strip()]
+        return cls(frames, header["key_count"])
+
+
+def _tuples(value):
+    """JSON lists back to the tuples they were recorded as"""
+    if isinstance(value, list):
+        return tuple(_tuples(item) for item in value)
+    if isinstance(value, dict):
+        return {name: _tuples(item) for name, item in value.items()}
+    return value
+
+
+class LiveInput:
+    """Reads input from pygame, the default source of InputHandler"""
+
+    finished = False
+
+    def begin_frame(self, dt):
+        return dt
+
+    def events(self):
+        return pg.event.get()
+
+    def key_pressed(self):
+        return pg.key.get_pressed()
+
+    def mouse_pressed(self):
+        return pg.mouse.get_pressed()
+
+    def mouse_pos(self):
+        return pg.mouse.get_pos()
+
+
+class RecordingInput(LiveInput):
+    """Live input that also records every frame into an InputRecording.
+
+    Key and mouse state are read once per frame, right after the event
+    queue is pumped, and the session acts on that same snapshot, so what
+    was recorded is what live play saw.
+    """
+
+    def __init__(self):
+        self.recording = InputRecording()
+        self._frame = None
+        self._keys = self._mouse = None  # last recorded state
+        self._key_state = None  # this frame's snapshot
+        self._mouse_state = None
+
+    def begin_frame(self, dt):
+        self._frame = [dt, [], None, None]  # state is filled in by events()
+        self.recording.frames.append(self._frame)
+        return dt
+
+    def events(self):
+        events = pg.event.get()
+        for event in events:
+            if event.type == pg.QUIT:
+                continue  # the session ends here, a replay should not quit
+            attributes = {
+                name: value
+                for name, value in event.dict.items()
+                if isinstance(value, _PLAIN)
+            }
+            self._frame[1].append((event.type, attributes))
+        self._snapshot()
+        return events
+
+    def _snapshot(self):
+        keys = self._key_state = pg.key.get_pressed()
+        self.recording.key_count = len(keys)
+        pressed = tuple(i for i, down in enumerate(keys) if down)
+        mouse = self._mouse_state = (pg.mouse.get_pos(), pg.mouse.get_pressed())
+        if pressed != self._keys:
+            self._frame[2] = pressed
+        if mouse != self._mouse:
+            self._frame[3] = mouse
+        self._keys, self._mouse = pressed, mouse
+
+    def key_pressed(self):
+        if self._key_state is None:
+            return super().key_pressed()
+        return self._key_state
+
+    def mouse_pressed(self):
+        if self._mouse_state is None:
+            return super().mouse_pressed()
+        return self._mouse_state[1]
+
+    def mouse_pos(self):
+        if self._mouse_state is None:
+            return super().mouse_pos()
+        return self._mouse_state[0]
+
+
+class ReplayInput(LiveInput):
+    """Feeds an InputRecording back frame by frame, in place of pygame's input.
+
+    Works headless (SDL_VIDEODRIVER=dummy); the real event queue is drained
+    and ignored. begin_frame returns the recorded dt, so game time advances
+    exactly as it did while recording.
+    """
+
+    def __init__(self, recording):
+        self.recording = recording
+        self.frame = -1
+        self._events = []
+        self._keys = pg.key.ScancodeWrapper((False,) * recording.key_count)
+        self._mouse = ((0, 0), (False, False, False))
+
+    @property
+    def finished(self):
+        return self.frame + 1 >= len(self.recording)
+
+    def begin_frame(self, dt):
+        if self.finished:
+            self._events = []
+            return dt
+        self.frame += 1
+        dt, events, keys, mouse = self.recording.frames[self.frame]
+        self._events = [pg.event.Event(type, attributes) for type, attributes in events]
+        if keys is not None:
+            state = [False] * self.recording.key_count
+            for scancode in keys:
+                state[scancode] = True
+            self._keys = pg.key.ScancodeWrapper(state)
+        if mouse is not None:
+            self._mouse = mouse
+        return dt
+
+    def events(self):
+        pg.event.pump()
+        pg.event.clear()
+        return self._events
+
+    def key_pressed(self):
+        return self._keys
+
+    def mouse_pressed(self):
+        return self._mouse[1]
+
+    def mouse_pos(self):
+        return self._mouse[0]
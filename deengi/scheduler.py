@@ -0,0 +1,179 @@
+import heapq
+import itertools
+from functools import partial
+
+
+class Wait:
+    """Suspends a scheduled coroutine for some seconds of game time.
+
+    Generators yield it (or plain seconds), async coroutines await it.
+    Yielding None, or awaiting next_frame(), resumes on the next frame.
+    """
+
+    __slots__ = ("seconds",)
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def __await__(self):
+        yield self
+
+
+class _NextFrame:
+    __slots__ = ()
+
+    def __await__(self):
+        yield None
+
+
+def sleep(seconds):
+    return Wait(seconds)
+
+
+def next_frame():
+    return _NextFrame()
+
+
+class Timer:
+    """Handle of a scheduled callback"""
+
+    __slots__ = ("due", "interval", "callback", "cancelled")
+
+    def __init__(self, due, callback, interval=None):
+        self.due = due
+        self.callback = callback
+        self.interval = interval
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Task:
+    """Handle of a scheduled generator or coroutine"""
+
+    __slots__ = ("coroutine", "done", "cancelled", "result", "running")
+
+    def __init__(self, coroutine):
+        self.coroutine = coroutine
+        self.done = False
+        self.cancelled = False
+        self.result = None
+        self.running = False
+
+    def cancel(self):
+        self.cancelled = True
+        if not self.running:  # a task cancelling itself is closed once it yields
+            self.coroutine.close()
+
+
+def _foreign_await(request):
+    return TypeError(
+        f"a scheduled coroutine waited on {request!r}; it can only await "
+        "deengi.scheduler.sleep() and next_frame() (or yield seconds). "
+        "Await asyncio objects in callbacks run under Engine.run_async"
+    )
+
+
+class Scheduler:
+    """Timers and coroutines driven by the game clock.
+
+    Timers wait in a heap ordered by due time, so tick() only looks at the
+    ones that are due: thousands of waiting timers or coroutines cost
+    nothing per frame until they fire. Timers scheduled while tick() runs
+    fire on a later tick at the earliest, so zero waits can't spin forever.
+    """
+
+    def __init__(self):
+        self.time = 0.0
+        self.frame = 0
+        self._timers = []  # heap of (due, sequence, Timer)
+        self._sequence = itertools.count()
+        self._next_frame = []  # tasks resumed on the next tick
+
+    def __len__(self):
+        return len(self._timers) + len(self._next_frame)
+
+    def _push(self, timer):
+        heapq.heappush(self._timers, (timer.due, next(self._sequence), timer))
+        return timer
+
+    def after(self, delay, callback):
+        """Call callback once, delay seconds from now"""
+        return self._push(Timer(self.time + delay, callback))
+
+    def every(self, interval, callback):
+        """Call callback every interval seconds, until the Timer is cancelled"""
+        if interval <= 0:
+            raise ValueError(f"interval must be positive, not {interval}")
+        return self._push(Timer(self.time + interval, callback, interval))
+
+    def start(self, coroutine):
+        """Run a generator or async coroutine, it starts on the next tick.
+
+        It may only wait through this module, awaiting anything else (e.g.
+        asyncio.sleep) cancels it with a TypeError.
+        """
+        task = Task(coroutine)
+        self._next_frame.append(task)
+        return task
+
+    def _step(self, task):
+        if task.cancelled:
+            return
+        task.running = True
+        try:
+            request = task.coroutine.send(None)
+        except StopIteration as stop:
+            task.done = True
+            task.result = stop.value
+            return
+        except RuntimeError as error:
+            if "event loop" not in str(error):  # e.g. asyncio.sleep without a loop
+                raise
+            task.cancelled = True
+            raise _foreign_await("an asyncio object") from error
+        finally:
+            task.running = False
+        if task.cancelled:  # by itself
+            task.coroutine.close()
+            return
+        if request is not None and not isinstance(request, (Wait, int, float)):
+            task.cancelled = True
+            task.coroutine.close()
+            raise _foreign_await(request)
+        seconds = request.seconds if isinstance(request, Wait) else request
+        if request is None or seconds <= 0:
+            self._next_frame.append(task)
+        else:
+            self.after(seconds, partial(self._step, task))
+
+    def tick(self, dt):
+        """Advance the clock by dt seconds and run everything that is due"""
+        self.time += dt
+        self.frame += 1
+        first_new = next(self._sequence)  # timers pushed from here on wait a tick
+
+        if self._next_frame:
+            waiting, self._next_frame = self._next_frame, []
+            for task in waiting:
+                self._step(task)
+
+        timers = self._timers
+        later = []
+        while timers and timers[0][0] <= self.time:
+            entry = heapq.heappop(timers)
+            timer = entry[2]
+            if entry[1] > first_new:
+                later.append(entry)
+                continue
+            if timer.cancelled:
+                continue
+            timer.callback()
+            if timer.interval is not None and not timer.cancelled:
+                timer.due += timer.interval
+                if timer.due <= self.time:  # fell behind, skip the missed calls
+                    timer.due = self.time + timer.interval
+                self._push(timer)
+        for entry in later:
+            heapq.heappush(timers, entry)
@@ -0,0 +1,241 @@
+import multiprocessing
+import threading
+import time
+from abc import ABC, abstractmethod
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+
+class Snapshot:
+    """Immutable game state published after a simulation step"""
+
+    __slots__ = ("fields", "time", "step")
+
+    def __init__(self, fields, time, step):
+        self.fields = fields  # name -> read-only array
+        self.time = time  # time.perf_counter() when published
+        self.step = step
+
+    def __getitem__(self, name):
+        return self.fields[name]
+
+
+def _readonly_copy(state):
+    fields = {}
+    for name, array in state.items():
+        fields[name] = np.array(array)
+        fields[name].flags.writeable = False
+    return fields
+
+
+class Simulation(ABC):
+    """Fixed rate game state updates off the render thread.
+
+    step(state, dt) advances state, a dict of NumPy arrays, in place. After
+    every step the state is published as an immutable Snapshot; the render
+    loop draws the latest one, or interpolates between the last two with
+    interpolated(), which renders one step behind the simulation.
+    latest and previous are read separately, snapshots() returns a
+    consistent pair.
+    """
+
+    def __init__(self, step, state, rate=30):
+        self.step_function = step
+        self.rate = rate
+        self.dt = 1 / rate
+        self.state = {name: np.array(value) for name, value in state.items()}
+        initial = Snapshot(_readonly_copy(self.state), time.perf_counter(), 0)
+        self._previous = self._latest = initial
+        self._lock = threading.Lock()
+        self.running = False
+
+    @property
+    def latest(self):
+        return self.snapshots()[1]
+
+    @property
+    def previous(self):
+        return self.snapshots()[0]
+
+    def publish(self, fields, step):
+        snapshot = Snapshot(fields, time.perf_counter(), step)
+        with self._lock:
+            self._previous, self._latest = self._latest, snapshot
+
+    def snapshots(self):
+        """(previous, latest) Snapshot"""
+        with self._lock:
+            return self._previous, self._latest
+
+    def interpolated(self, name, now=None):
+        previous, latest = self.snapshots()
+        now = time.perf_counter() if now is None else now
+        alpha = min(max((now - latest.time) * self.rate, 0.0), 1.0)
+        return previous[name] + (latest[name] - previous[name]) * alpha
+
+    @abstractmethod
+    def start(self):
+        """Start stepping, see ThreadedSimulation and ProcessSimulation"""
+
+    def stop(self):
+        self.running = False
+
+
+def _paced_steps(dt, should_stop):
+    """Yields step numbers at a fixed rate, skipping ahead when behind"""
+    step = 0
+    next_time = time.perf_counter()
+    while not should_stop():
+        step += 1
+        yield step
+        next_time += dt
+        delay = next_time - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            next_time = time.perf_counter()
+
+
+class ThreadedSimulation(Simulation):
+    """Runs the simulation on a thread, NumPy releases the GIL in array math"""
+
+    def start(self):
+        self.running = True
+        self._thread = threading.Thread(
+            target=self._run, name="deengi-simulation", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self):
+        for step in _paced_steps(self.dt, lambda: not self.running):
+            self.step_function(self.state, self.dt)
+            self.publish(_readonly_copy(self.state), step)
+
+    def stop(self):
+        self.running = False
+        self._thread.join()
+
+
+class _SharedBuffers:
+    """Three copies of the state fields in one shared memory block.
+
+    meta holds the latest and previous buffer index, then time and step per
+    buffer. The writer fills the buffer that is neither latest nor previous
+    and publishes it under meta's lock, readers copy under the same lock.
+    """
+
+    count = 3
+
+    def __init__(self, layout, memory):
+        self.layout = layout  # name -> (shape, dtype, offset)
+        self.memory = memory
+        self.size = max(
+            (
+                offset + np.prod(shape, dtype=int) * np.dtype(dtype).itemsize
+                for shape, dtype, offset in layout.values()
+            ),
+            default=0,
+        )
+        self.views = [
+            {
+                name: np.ndarray(shape, dtype, memory.buf, buffer * self.size + offset)
+                for name, (shape, dtype, offset) in layout.items()
+            }
+            for buffer in range(self.count)
+        ]
+
+    @staticmethod
+    def make_layout(state):
+        layout, offset = {}, 0
+        for name, array in state.items():
+            layout[name] = (array.shape, array.dtype.str, offset)
+            offset += -(-array.nbytes // 8) * 8  # keep fields 8 byte aligned
+        return layout, max(offset, 8)
+
+    def write(self, buffer, state):
+        for name, view in self.views[buffer].items():
+            view[...] = state[name]
+
+    def close(self):
+        self.views = []
+        self.memory.close()
+
+
+def _process_main(step_function, layout, memory_name, meta, stop, dt):
+    buffers = _SharedBuffers(layout, SharedMemory(name=memory_name))
+    latest = int(meta[0])
+    state = {name: view.copy() for name, view in buffers.views[latest].items()}
+    for step in _paced_steps(dt, stop.is_set):
+        step_function(state, dt)
+        with meta.get_lock():
+            latest, previous = int(meta[0]), int(meta[1])
+        target = next(b for b in range(buffers.count) if b not in (latest, previous))
+        buffers.write(target, state)
+        with meta.get_lock():
+            meta[1], meta[0] = latest, target
+            meta[2 + 2 * target] = time.perf_counter()
+            meta[3 + 2 * target] = step
+    buffers.close()
+
+
+class ProcessSimulation(Simulation):
+    """Runs the simulation in a separate process, using another core.
+
+    State is handed over through shared memory. step must be picklable, a
+    module level function, and sees the state only in the worker process.
+    """
+
+    def start(self):
+        layout, size = _SharedBuffers.make_layout(self.state)
+        memory = SharedMemory(create=True, size=size * _SharedBuffers.count)
+        self._buffers = _SharedBuffers(layout, memory)
+        self._buffers.write(0, self.state)
+        self._meta = multiprocessing.Array("d", 2 + 2 * _SharedBuffers.count)
+        self._meta[2] = time.perf_counter()
+        self._stop = multiprocessing.Event()
+        self._read_step = None
+        self._process = multiprocessing.Process(
+            target=_process_main,
+            args=(
+                self.step_function,
+                layout,
+                memory.name,
+                self._meta,
+                self._stop,
+                self.dt,
+            ),
+            name="deengi-simulation",
+            daemon=True,
+        )
+        self._process.start()
+        self.running = True
+
+    def _read(self, buffer):
+        meta = self._meta
+        fields = _readonly_copy(self._buffers.views[buffer])
+        return Snapshot(fields, meta[2 + 2 * buffer], int(meta[3 + 2 * buffer]))
+
+    def _refresh(self):
+        """Copy the last two published buffers if the worker published since"""
+        with self._meta.get_lock():
+            latest, previous = int(self._meta[0]), int(self._meta[1])
+            step = self._meta[3 + 2 * latest]
+            if step != self._read_step:
+                snapshots = self._read(previous), self._read(latest)
+                with self._lock:
+                    self._previous, self._latest = snapshots
+                self._read_step = step
+
+    def snapshots(self):
+        if self.running:
+            self._refresh()
+        return super().snapshots()
+
+    def stop(self):
+        self._stop.set()
+        self._process.join()
+        self._refresh()  # keep the final state readable
+        self.running = False
+        self._buffers.close()
+        self._buffers.memory.unlink()
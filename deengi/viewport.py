@@ -0,0 +1,53 @@
+import pygame as pg
+
+from .camera import Camera2D
+from .renderables.renderable import Renderable
+
+
+class Viewport(Renderable):
+    """Another camera onto the same layers, drawn into a rectangle of the screen.
+
+    Used for split screen views or picture in picture. Renderables are
+    culled per viewport through the viewport's camera. Rendering is done
+    through a non-interactive view of the main renderer, so the screen
+    space state used for mouse hit tests stays that of the main view.
+    """
+
+    def __init__(self, rect, layers, display, camera=None, background=(0, 0, 0)):
+        """rect: (x, y, w, h) in pixels of display
+        layers: the Layer objects to draw, in order
+        camera: defaults to a new Camera2D on the viewport's area"""
+        self.rect = pg.Rect(rect)
+        self.layers = list(layers)
+        self.background = background
+        self.target = display.subsurface(self.rect)
+        self.camera = camera or Camera2D(self.target)
+        self._renderer = None
+        self._display = display
+
+    def _view(self, renderer):
+        display = renderer.display
+        if display is not self._display:  # e.g. a new render scale
+            old_width, old_height = self._display.get_size()
+            width, height = display.get_size()
+            sx, sy = width / old_width, height / old_height
+            x, y, w, h = self.rect
+            self.rect = pg.Rect(
+                round(x * sx), round(y * sy), round(w * sx), round(h * sy)
+            )
+            self.rect = self.rect.clip(display.get_rect())
+            self.target = display.subsurface(self.rect)
+            self.camera.set_surface(self.target)
+            self._display = display
+            self._renderer = None
+        if self._renderer is None:
+            self._renderer = renderer.view(self.target, self.camera)
+        return self._renderer
+
+    def render(self, renderer):
+        view = self._view(renderer)
+        if self.background is not None:
+            self.target.fill(self.background)
+        for layer in self.layers:
+            if layer.visible:
+                layer.render(view)
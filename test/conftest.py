@@ -0,0 +1,17 @@
+import os
+import tempfile
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("DEENGI_CACHE_DIR", tempfile.mkdtemp(prefix="deengi-test-"))
+
+import pygame
+import pytest
+
+
+@pytest.fixture
+def display():
+    pygame.display.init()
+    screen = pygame.display.set_mode((200, 150))
+    yield screen
+    pygame.display.quit()
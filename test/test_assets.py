@@ -0,0 +1,31 @@
+import time
+
+import pygame
+
+from deengi.assets import AssetLoader, is_loaded, load_image
+
+
+def test_preloaded_images_land_in_the_shared_cache(tmp_path, display):
+    paths = []
+    for i in range(5):
+        img = pygame.Surface((4, 4))
+        img.fill((i, 0, 0))
+        paths.append(str(tmp_path / f"img{i}.png"))
+        pygame.image.save(img, paths[-1])
+
+    loader = AssetLoader(workers=2)
+    finished = []
+    loader.preload(*paths, str(tmp_path / "missing.png"))
+    loader.on_finished(lambda: finished.append(True))
+    assert loader.progress == 0
+    for _ in range(200):
+        loader.update()
+        if finished:
+            break
+        time.sleep(0.005)
+
+    assert finished and loader.progress == 1.0
+    assert all(is_loaded(path) for path in paths)
+    assert load_image(paths[3]).get_at((0, 0)) == (3, 0, 0)
+    assert [path for path, _ in loader.failed] == [str(tmp_path / "missing.png")]
+    loader.close()
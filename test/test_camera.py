@@ -0,0 +1,58 @@
+import pygame
+import pytest
+
+from deengi.camera import Camera2D, CameraMotion
+
+
+class Target:
+    def __init__(self, position):
+        self.position = position
+
+
+@pytest.fixture
+def camera():
+    return Camera2D(pygame.Surface((400, 300)), zoom=(20, 20), rotation=30)
+
+
+def test_follow_settles_and_leaves_the_view_version_alone(camera):
+    motion = CameraMotion(camera, smooth_time=0.1)
+    motion.follow(Target((10.0, -4.0)))
+    versions = set()
+    for _ in range(120):
+        motion.update(1 / 60)
+        versions.add(camera.view_version)
+    assert tuple(camera.position) == (10.0, -4.0)
+    settled = camera.view_version
+    for _ in range(10):
+        motion.update(1 / 60)
+    assert camera.view_version == settled
+    assert len(versions) > 10
+
+
+def test_drag_pans_with_inertia_after_release(camera):
+    motion = CameraMotion(camera, friction=5)
+    grabbed = camera.game_point(200, 150)
+    motion.drag_start((200, 150))
+    for step in range(1, 6):
+        motion.drag((200 + 10 * step, 150))
+        motion.update(1 / 60)
+    assert camera.game_point(250, 150) == pytest.approx(grabbed)
+
+    motion.drag_end()
+    released = tuple(camera.position)
+    for _ in range(300):
+        motion.update(1 / 60)
+    assert tuple(camera.position) != released
+    assert not motion.moving
+    version = camera.view_version
+    motion.update(1 / 60)
+    assert camera.view_version == version
+
+
+def test_zoom_keeps_the_point_under_the_cursor(camera):
+    motion = CameraMotion(camera)
+    point = camera.game_point(320, 40)
+    motion.zoom_at(1.5, (320, 40))
+    assert camera.zoom_level == pytest.approx((30, 30))
+    assert camera.game_point(320, 40) == pytest.approx(point)
+    assert tuple(camera.game_coords((320, 40))) == pytest.approx(point)
@@ -0,0 +1,36 @@
+import json
+
+import numpy as np
+import pygame
+
+from deengi.capture import FrameCapture
+
+
+def test_ring_keeps_the_last_frames_and_dumps_them(display, tmp_path):
+    capture = FrameCapture.for_surface(display, seconds=0.1, fps=30)  # 3 slots
+    for shade in range(5):
+        display.fill((shade * 40, 10, 200))
+        assert capture.capture(display, 1 / 30)
+    assert len(capture) == 3 and capture.count == 5
+
+    path = capture.dump(tmp_path / "clip", seconds=0.07).result()  # last 2 frames
+    frames = sorted(path.iterdir())
+    assert len(frames) == 2
+    assert pygame.image.load(str(frames[-1])).get_at((5, 5))[:3] == (160, 10, 200)
+
+    raw = capture.dump(tmp_path / "clip.rgb", format="raw").result()
+    header = json.loads((tmp_path / "clip.rgb.json").read_text())
+    video = np.fromfile(raw, np.uint8).reshape(-1, header["height"], header["width"], 3)
+    assert video[:, 0, 0, 0].tolist() == [80, 120, 160]
+    capture.close()
+
+
+def test_streams_every_frame_and_skips_frames_between_captures(display, tmp_path):
+    capture = FrameCapture.for_surface(display, seconds=1, fps=30)
+    capture.start_stream(tmp_path / "stream.rgb")
+    captured = [capture.capture(display, 1 / 60) for _ in range(6)]
+    assert captured == [True, False, True, False, True, False]
+    path = capture.stop_stream().result()
+    assert path.stat().st_size == 3 * 200 * 150 * 3
+    assert capture.capture_time < 0.01
+    capture.close()
@@ -0,0 +1,57 @@
+import numpy as np
+
+from deengi.collision import CollisionWorld, polygons_overlap
+from deengi.renderables import Tilemap
+
+
+def brute_force_pairs(world):
+    ids = world.ids()
+    pos, size = world.pos[ids], world.size[ids]
+    touching = np.all(
+        (pos[:, None] < pos[None] + size[None])
+        & (pos[None] < pos[:, None] + size[:, None]),
+        axis=2,
+    )
+    a, b = np.nonzero(np.triu(touching, k=1))
+    return {(int(x), int(y)) for x, y in zip(ids[a], ids[b])}
+
+
+def test_pairs_match_brute_force_while_bodies_move():
+    rng = np.random.default_rng(1)
+    world = CollisionWorld(cell_size=2, margin=0.3)
+    ids = world.add_many(rng.uniform(0, 30, (400, 2)), rng.uniform(0.2, 1.5, (400, 2)))
+    velocity = rng.uniform(-2, 2, (400, 2))
+    world.remove(int(ids[7]))
+    for _ in range(30):
+        world.pos[ids] += velocity * 0.05
+        assert {tuple(pair) for pair in world.pairs().tolist()} == brute_force_pairs(
+            world
+        )
+    assert world.rebuilds < 30  # small moves reuse the candidate pairs
+
+
+def test_polygons_and_filters():
+    world = CollisionWorld()
+    triangle = [(0, 0), (1, 0), (0, 1)]
+    a = world.add((0, 0), polygon=triangle)
+    b = world.add((0.8, 0.8), (1, 1))  # boxes overlap, the triangle doesn't reach
+    assert not len(world.pairs())
+    world.move(b, (0.3, 0.3))
+    assert world.pairs().tolist() == [[a, b]]
+    world.set_filter(b, category=2, mask=2)
+    assert not len(world.pairs())
+
+    assert world.query_point((0.9, 0.9)).tolist() == [b]
+    assert sorted(world.query_rect((0, 0, 0.4, 0.4)).tolist()) == [a, b]
+    assert polygons_overlap(triangle, [(0.2, 0.2), (0.4, 0.2), (0.3, 0.4)])
+
+
+def test_tile_pairs_with_object_and_array_tilemaps():
+    tiles = [((x, 0), (1, 1)) for x in range(5)]
+    world = CollisionWorld()
+    body = world.add((1.5, 0.5), (1, 1))
+    world.add((10, 10), (1, 1))
+    for tilemap in (Tilemap(tiles), Tilemap(tiles, storage="arrays")):
+        pairs = world.tile_pairs(tilemap)
+        assert pairs.tolist() == [[body, 1], [body, 2]]
+        assert tuple(tilemap[int(pairs[0, 1])].pos) == (1, 0)
@@ -0,0 +1,178 @@
+import asyncio
+import time
+
+import pygame
+import pytest
+
+from deengi.engine import Engine
+from deengi.entities import EntityWorld, move
+from deengi.input_handler import Button
+from deengi.renderables import Label, Tilemap
+from deengi.renderables.renderable import Renderable
+from deengi.scheduler import sleep
+
+
+@pytest.fixture
+def engine():
+    engine = Engine(debug=False, screen_size=(400, 300))
+    yield engine
+    engine.assets.close()
+    pygame.display.quit()
+
+
+def test_internal_render_scale_keeps_view_and_input_consistent(engine):
+    camera = engine.camera
+    point = pygame.Vector2(0.3, -0.2)
+    window_pos = camera.screen_coords(point)
+
+    engine.set_render_scale(0.5)
+    assert engine.renderer.display.get_size() == (200, 150)
+    assert tuple(camera.screen_coords(point)) == pytest.approx(tuple(window_pos * 0.5))
+    mouse = engine.input_handler.to_display(window_pos)
+    assert tuple(camera.game_coords(mouse)) == pytest.approx(tuple(point))
+
+    engine.frame(1 / 60)  # renders at 200x150 and upscales into the window
+    engine.set_render_scale(1.0)
+    assert engine.renderer.display is engine.screen
+    assert tuple(camera.screen_coords(point)) == pytest.approx(tuple(window_pos))
+
+
+def test_ui_layers_draw_on_the_window_at_any_render_scale(engine):
+    class Box(Renderable):
+        def render(self, renderer):
+            pygame.draw.rect(renderer.display, (0, 255, 0), (350, 250, 20, 20))
+
+    clicks = []
+    button = Button((350, 250), lambda: clicks.append(1), size=(20, 20))
+    engine.input_handler.register_button(button)
+    engine.add_to_layer("ui", Box())
+    label = Label((0, 0), "+")
+    engine.add_to_layer("ui", label)
+    engine.start_capture(seconds=0.1, fps=30)
+    engine.set_render_scale(0.5)
+    engine.frame(1 / 30)
+
+    assert engine.screen.get_at((360, 260))[:3] == (0, 255, 0)  # past the 200x150 surface
+    assert engine.ui_renderer.screen_coords((0, 0)) == engine.camera.screen_coords((0, 0)) * 2
+    assert engine.capture.size == engine.screen.get_size()  # window frames, UI included
+    assert engine.capture.count == 1 and engine.capture.dropped == 0
+    engine.stop_capture()
+
+    for kind in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+        pygame.event.post(pygame.event.Event(kind, button=1, pos=(360, 260)))
+    engine.frame(1 / 30)
+    assert clicks == [1]  # buttons hit test in window pixels
+
+
+def test_viewport_draws_world_without_touching_hit_tests(engine):
+    tilemap = Tilemap([((0, 0), (1, 1), None, (255, 0, 0))])
+    engine.add_to_layer("main", tilemap)
+    engine.frame(1 / 60)
+    tile = tilemap[0]
+    main_rect = pygame.Rect(tile.rect)
+
+    viewport = engine.add_viewport((300, 200, 100, 100))
+    viewport.camera.zoom_level = (10, 10)
+    viewport.camera.set_game_position((0.5, 0.5))
+    engine.main_view = False
+    engine.screen.fill((0, 0, 0))
+    engine.frame(1 / 60)
+
+    assert tile.rect == main_rect
+    assert engine.screen.get_at((350, 200 + 50)) == (255, 0, 0)
+    assert engine.screen.get_at(main_rect.center) != (255, 0, 0)
+    engine.remove_viewport(viewport)
+
+
+def test_viewport_renderer_shares_settings_with_main_renderer(engine):
+    viewport = engine.add_viewport((300, 200, 100, 100))
+    engine.frame(1 / 60)
+    view = viewport._view(engine.renderer)
+    assert view.display is viewport.target and not view.interactive
+
+    engine.toggle_debug()
+    engine.renderer.grid_labels = False
+    assert view.debug == engine.renderer.debug and view.grid_labels is False
+    view.draw_text("hi")  # parses the font once, for both
+    assert engine.renderer._font is view.font
+    engine.frame(1 / 60)  # the background callback draws into the viewport too
+    engine.remove_viewport(viewport)
+
+
+def test_minimap_colors_tiles_from_arrays(engine):
+    tilemap = Tilemap(
+        [((0, 0), (1, 1), None, (255, 0, 0)), ((1, 0), (1, 1), None, (0, 0, 255))],
+        storage="arrays",
+    )
+    minimap = engine.add_minimap(tilemap, (0, 0, 40, 20))
+    engine.frame(1 / 60)
+    assert engine.screen.get_at((10, 10))[:3] == (255, 0, 0)
+    assert engine.screen.get_at((30, 10))[:3] == (0, 0, 255)
+
+    tilemap.store.recolor([1], (0, 255, 0))
+    engine.frame(1 / 60)
+    assert engine.screen.get_at((30, 10))[:3] == (0, 255, 0)
+    assert minimap.bounds == (0, 0, 2, 1)
+
+
+def test_entities_are_removed_with_their_update_callback(engine):
+    world = EntityWorld()
+    world.create(position=(0, 0), velocity=(1, 0), color=(255, 0, 0))
+    world.add_system(move, "position", "velocity")
+    renderer = engine.add_entities(world)
+    engine.frame(0.5)
+    assert renderer in engine.layers["main"]
+
+    engine.remove_entities(world)
+    position = tuple(world.query("velocity")[0].position[0])
+    engine.frame(0.5)
+    assert renderer not in engine.layers["main"]
+    assert tuple(world.query("velocity")[0].position[0]) == position
+
+
+def test_layer_visibility_is_writable(engine):
+    engine.layer_visibility["ui"] = False
+    assert not engine.layers["ui"].visible
+    engine.layer_visibility = {"ui": True, "debug": True}
+    assert engine.layers["ui"].visible and engine.layer_visibility["debug"]
+    assert set(engine.layer_visibility) == set(engine.layers)
+
+
+def test_run_async_paces_frames_and_runs_callbacks_off_the_frame(engine):
+    frames, started = [], []
+
+    async def slow():
+        started.append(engine.scheduler.frame)
+        await asyncio.sleep(10)
+
+    engine.add_callback(lambda: frames.append(time.perf_counter()))
+    engine.add_callback(slow)
+
+    async def main():
+        task = asyncio.create_task(engine.run_async(fps=50))
+        await asyncio.sleep(0.3)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert 10 <= len(frames) <= 17  # ~15 frames at 50 fps, not stalled by slow()
+    assert len(started) == 1
+    assert not engine._callback_tasks
+
+
+def test_async_callbacks_under_run_start_one_task_at_a_time(engine):
+    async def wait():
+        await sleep(1.0)
+
+    engine.add_callback(wait)
+    for _ in range(30):
+        engine.frame(0.1)
+    assert len(engine.scheduler) <= 1
+
+
+def test_engine_initializes_remaining_pygame_modules_before_first_frame(engine):
+    assert pygame.font.get_init()
+    engine.run(max_frames=1)
+    assert engine._subsystems_ready
+    assert engine.quality.knobs  # created on first use, with the engine's knobs
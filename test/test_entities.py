@@ -0,0 +1,60 @@
+import numpy as np
+import pygame
+
+from deengi.camera import Camera2D
+from deengi.entities import EntityRenderer, EntityWorld, move
+from deengi.renderer import Renderer
+
+
+def test_systems_update_whole_archetypes():
+    world = EntityWorld()
+    units = world.create_many(
+        1000, position=np.zeros((1000, 2)), velocity=(1.0, 2.0), color=(255, 0, 0)
+    )
+    still = world.create(position=(5, 5), color=(0, 255, 0))
+    world.add_system(move, "position", "velocity")
+    world.update(0.5)
+
+    assert np.allclose(world.query("velocity")[0].position, (0.5, 1.0))
+    assert tuple(world.get(still, "position")) == (5, 5)
+    assert len(world.query("position", "color")) == 2
+
+    world.remove(int(units[0]))  # the last row fills the gap
+    assert tuple(world.get(int(units[-1]), "position")) == (0.5, 1.0)
+    world.add_components(int(units[1]), radius=2.0)
+    assert world.get(int(units[1]), "radius") == 2.0
+    assert len(world) == 1000
+    world.remove_components(int(units[1]), "velocity")
+    world.update(0.5)
+    assert tuple(world.get(int(units[1]), "position")) == (0.5, 1.0)
+
+
+def test_renderer_draws_from_columns(display):
+    camera = Camera2D(display, zoom=(10, 10))
+    renderer = Renderer(display, camera=camera, debug=False)
+    world = EntityWorld()
+    sprite = pygame.Surface((10, 10))
+    sprite.fill((0, 0, 255))
+    world.create(position=(3, 0), color=(255, 0, 0), radius=0.5)
+    world.create(position=(-3, 0), sprite=world.add_sprite(sprite))
+    world.create(position=(100, 100), color=(0, 255, 0))  # out of view
+
+    display.fill((0, 0, 0))
+    EntityRenderer(world).render(renderer)
+    x, y = camera.screen_coords((3, 0))
+    assert display.get_at((round(x), round(y)))[:3] == (255, 0, 0)
+    x, y = camera.screen_coords((-3, 0))
+    assert display.get_at((round(x), round(y)))[:3] == (0, 0, 255)
+
+
+def test_renderer_culls_with_the_largest_radius(display):
+    camera = Camera2D(display, zoom=(10, 10))
+    renderer = Renderer(display, camera=camera, debug=False)
+    x, y, w, h = camera.view_rect(display.get_size())
+    world = EntityWorld()
+    world.create(position=(x + w + 2, y + h / 2), color=(255, 0, 0), radius=3.0)
+
+    display.fill((0, 0, 0))
+    EntityRenderer(world).render(renderer)
+    edge = display.get_width() - 1, display.get_height() // 2
+    assert display.get_at(edge)[:3] == (255, 0, 0)  # centered off screen, reaching in
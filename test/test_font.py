@@ -0,0 +1,19 @@
+import hashlib
+import json
+
+from deengi.font import Font, cache_dir, glyph_spans, scan_glyph_spans
+from deengi.renderer import FONT_PATH
+
+
+def test_glyphs_share_the_sheet_and_metrics_are_cached(display):
+    path = FONT_PATH / "small_font.png"
+    font = Font(path)
+    sheet = font.characters["A"].get_parent()
+    assert all(glyph.get_parent() is sheet for glyph in font.characters.values())
+
+    spans = scan_glyph_spans(sheet)
+    assert len(spans) == len(font.characters)
+    digest = hashlib.sha1(path.read_bytes()).hexdigest()
+    cache_file = cache_dir() / "fonts" / f"{digest}.json"
+    assert [tuple(span) for span in json.loads(cache_file.read_text())] == spans
+    assert glyph_spans(path, sheet) == spans
@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def run_python(code):
+    path = os.pathsep.join([str(ROOT), os.environ.get("PYTHONPATH", "")])
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=ROOT,
+        env=dict(os.environ, PYTHONPATH=path),
+    )
+    return result.stdout.splitlines()  # pygame may print its banner in between
+
+
+def test_import_deengi_is_lazy():
+    code = (
+        "import sys, deengi; "
+        "print('pygame' in sys.modules, 'numpy' in sys.modules); "
+        "deengi.Camera2D; print('deengi.camera' in sys.modules, 'deengi.engine' in sys.modules)"
+    )
+    lines = run_python(code)
+    assert lines[0] == "False False"
+    assert lines[-1] == "True False"
+
+
+def test_engine_imports_optional_parts_on_use():
+    optional = ["capture", "entities", "quality", "viewport", "renderables.minimap"]
+    optional.append("renderables.tilestore")
+    code = "import sys, deengi.engine; "
+    code += f"print([m for m in {optional!r} if 'deengi.' + m in sys.modules])"
+    assert run_python(code)[-1] == "[]"
+
+
+def test_renderer_fonts_are_parsed_on_first_use(display):
+    from deengi.camera import Camera2D
+    from deengi.renderer import Renderer
+
+    renderer = Renderer(display, Camera2D(display))
+    assert renderer._font is None
+    renderer.draw_text("hi")
+    assert renderer._font is not None and renderer._titlefont is None
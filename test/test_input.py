@@ -0,0 +1,112 @@
+import pygame
+
+from deengi.camera import Camera2D
+from deengi.input_handler import Button, InputHandler
+from deengi.renderer import Renderer
+
+
+class Hoverable:
+    def __init__(self, rect):
+        self.rect = pygame.Rect(rect)
+        self.calls = []
+
+    def collidepoint(self, point):
+        return self.rect.collidepoint(point)
+
+
+def test_mouse_motion_is_coalesced_and_idle_frames_do_nothing(display):
+    handler = InputHandler(debug=False)
+    box = Hoverable((10, 10, 20, 20))
+    handler.register_hover(box, box.calls.append)
+    pygame.event.clear()
+
+    handler.update()  # initial hover state for the new hoverable
+    for pos in [(0, 0), (5, 5), (15, 15)]:
+        pygame.event.post(pygame.event.Event(pygame.MOUSEMOTION, pos=pos, rel=(0, 0), buttons=(0, 0, 0)))
+    handler.update()
+    assert box.calls == [False, True]
+    assert handler.mouse_pos == (15, 15)
+
+    for _ in range(10):
+        handler.update()
+    assert len(box.calls) == 2
+
+
+def test_camera_changes_recheck_hover_under_a_still_mouse(display):
+    camera = Camera2D(pygame.Surface((200, 150)), zoom=(20, 20))
+
+    class GameBox:
+        calls = []
+
+        def collidepoint(self, point):
+            x, y = camera.game_coords(point)
+            return 0 <= x < 1 and 0 <= y < 1
+
+    handler = InputHandler(debug=False, camera=camera)
+    handler.mouse_pos = tuple(camera.screen_coords((0.5, 0.5)))
+    handler.register_hover(GameBox(), GameBox.calls.append)
+    pygame.event.clear()
+    handler.update()
+    camera.move((5, 0))  # pans away under the mouse
+    handler.update()
+    handler.update()
+    assert GameBox.calls == [True, False]
+
+
+def test_dispatch_table_routes_events(display):
+    handler = InputHandler(debug=False)
+    log = []
+    handler.bind_keypress(pygame.K_x, lambda: log.append("down"))
+    handler.bind_keyrelease(pygame.K_x, lambda: log.append("up"))
+    handler.bind_mousebutton_down(1, lambda: log.append("click"))
+    handler.on_event(pygame.USEREVENT, lambda event: log.append(event.value))
+    pygame.event.clear()
+
+    pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_x))
+    pygame.event.post(pygame.event.Event(pygame.KEYUP, key=pygame.K_x))
+    pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1, pos=(3, 4)))
+    pygame.event.post(pygame.event.Event(pygame.USEREVENT, value="custom"))
+    handler.update()
+    assert log == ["down", "up", "click", "custom"]
+    assert handler.mouse_pos == (3, 4)
+
+
+def motion(pos):
+    return pygame.event.Event(pygame.MOUSEMOTION, pos=pos, rel=(0, 0), buttons=(0, 0, 0))
+
+
+def test_buttons_hit_tested_through_grid(display):
+    handler = InputHandler(debug=False)
+    clicked = []
+    buttons = [
+        Button((x * 40, y * 30), lambda x=x, y=y: clicked.append((x, y)), size=(30, 20))
+        for x in range(5)
+        for y in range(5)
+    ]
+    for button in buttons:
+        handler.register_button(button)
+    pygame.event.clear()
+
+    pygame.event.post(motion((45, 35)))
+    handler.update()
+    assert [b for b in buttons if b.hovered] == [buttons[6]]
+    assert len(handler.button_grid.at((45, 35))) == 1
+
+    pygame.event.post(motion((35, 35)))  # in the gap between buttons
+    pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1, pos=(85, 65)))
+    pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONUP, button=1, pos=(85, 65)))
+    handler.update()
+    assert clicked == [(2, 2)]
+    assert not any(b.hovered for b in buttons if b is not buttons[12])
+
+
+def test_button_surface_is_retained(display):
+    renderer = Renderer(display, Camera2D(display), debug=False)
+    button = Button((10, 10), lambda: None, "Ok", size=(60, 30))
+    button.render(renderer)
+    surface = button._surface
+    button.render(renderer)
+    assert button._surface is surface
+    button.set_hovered(True)
+    button.render(renderer)
+    assert button._surface is not surface
@@ -0,0 +1,74 @@
+import pytest
+
+from deengi.renderables.renderable import Renderable
+from deengi.renderer import Layer
+
+
+class Recorder(Renderable):
+    def __init__(self, name, drawn):
+        self.name = name
+        self.drawn = drawn
+
+    def render(self, renderer):
+        self.drawn.append(self.name)
+
+
+def test_add_remove_by_handle_or_item():
+    drawn = []
+    layer = Layer("main")
+    a, b, c = (Recorder(name, drawn) for name in "abc")
+    handle = layer.add(a)
+    layer.add(b)
+    layer.append(c)
+    layer.remove(handle)
+    layer.remove(c)
+    assert list(layer) == [b] and a not in layer
+    layer.render(None)
+    assert drawn == ["b"]
+
+
+def test_z_order_and_visibility():
+    drawn = []
+    layer = Layer()
+    top, bottom, hidden = (
+        Recorder(name, drawn) for name in ("top", "bottom", "hidden")
+    )
+    layer.add(top, z=2)
+    layer.add(bottom)
+    layer.add(hidden, z=1)
+    layer.add((lambda text: drawn.append(text), {"text": "callback"}), z=-1)
+    hidden.toggle_visibility()
+    layer.render(None)
+    assert drawn == ["callback", "bottom", "top"]
+
+
+def test_changes_during_render_apply_next_render():
+    drawn = []
+    layer = Layer()
+    late = Recorder("late", drawn)
+
+    class Spawner(Renderable):
+        def render(self, renderer):
+            drawn.append("spawner")
+            if late not in layer:
+                layer.add(late, z=5)
+                layer.remove(self)
+
+    spawner = Spawner()
+    layer.add(spawner)
+    layer.add(Recorder("b", drawn), z=1)
+    layer.render(None)
+    layer.render(None)
+    assert drawn == ["spawner", "b", "b", "late"]
+
+
+def test_z_changes_and_duplicates():
+    drawn = []
+    layer = Layer()
+    a, b = Recorder("a", drawn), Recorder("b", drawn)
+    layer.add(a)
+    layer.add(b)
+    layer.set_z(a, 3)
+    assert list(layer) == [b, a]
+    with pytest.raises(ValueError):
+        layer.add(b)
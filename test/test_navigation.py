@@ -0,0 +1,105 @@
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from deengi.navigation import BLOCKED, NavGrid, astar, descend, flow_field
+from deengi.renderables import Tilemap
+
+WALL = (200, 0, 0)
+
+
+def wall_cost(pos, size, colors):
+    return np.where(colors[:, 0] == WALL[0], BLOCKED, 1.0)
+
+
+def room(storage="arrays"):
+    """5x5 floor with a wall at x=2 open only at the top"""
+    tiles = [
+        ((x, y), (1, 1), None, WALL if x == 2 and y < 4 else (0, 90, 0))
+        for x in range(5)
+        for y in range(5)
+    ]
+    return Tilemap(tiles, storage=storage)
+
+
+def path_cost(costs, path):
+    return sum(
+        costs[b] * np.hypot(b[0] - a[0], b[1] - a[1]) for a, b in zip(path, path[1:])
+    )
+
+
+def test_astar_and_flow_field_find_equally_cheap_paths():
+    rng = np.random.default_rng(0)  # a grid with a path from corner to corner
+    costs = rng.uniform(1, 4, (20, 20))
+    costs[rng.random((20, 20)) < 0.2] = BLOCKED
+    costs[0, 0] = costs[19, 19] = 1
+    field = flow_field(costs, (19, 19))
+    path = astar(costs, (0, 0), (19, 19))
+    assert path is not None and path[0] == (0, 0) and path[-1] == (19, 19)
+    assert np.isclose(path_cost(costs, path), field[0, 0])
+    assert np.isclose(path_cost(costs, descend(field, costs, (0, 0))), field[0, 0])
+
+    costs[17:, 17:] = BLOCKED  # walls the goal in
+    costs[19, 19] = 1
+    assert astar(costs, (0, 0), (19, 19)) is None
+    assert flow_field(costs, (19, 19))[0, 0] == np.inf
+
+
+def test_navgrid_follows_tilemap_changes():
+    for storage in ("objects", "arrays"):
+        tilemap = room(storage)
+        nav = NavGrid.from_tilemap(tilemap, cost=wall_cost)
+        path = nav.find_path((0.5, 0.5), (4.5, 0.5))
+        assert (2.5, 4.5) in path  # around the wall
+        assert nav.find_cells((0, 0), (4, 0)) is nav.find_cells(
+            (0, 0), (4, 0)
+        )  # cached
+
+    store = tilemap.store
+    store.recolor([2 * 5 + 1], (0, 90, 0))  # a door at (2, 1)
+    path = nav.find_path((0.5, 0.5), (4.5, 0.5))
+    assert (2.5, 1.5) in path and len(path) == 5
+
+    store.pos[2 * 5 + 1] = (9, 9)  # moved off the grid, the door is a hole now
+    store.moved()
+    assert nav.sync()
+    assert nav.costs[2, 1] == BLOCKED
+
+
+def test_batch_requests_share_flow_fields_and_workers():
+    nav = NavGrid.from_tilemap(room(), cost=wall_cost)
+    starts = [(0.5, y + 0.5) for y in range(5)] * 4 + [(4.5, 4.5)]
+    requests = [(start, (4.5, 0.5)) for start in starts]
+    with ThreadPoolExecutor(2) as executor:
+        paths = nav.find_paths(requests, executor=executor, flow_threshold=3)
+    assert all(path[-1] == (4.5, 0.5) for path in paths)
+    for (start, goal), path in zip(requests, paths):
+        assert np.isclose(
+            path_cost(nav.costs, [nav.cell(p) for p in path]),
+            path_cost(nav.costs, [nav.cell(p) for p in nav.find_path(start, goal)]),
+        )
+
+
+def test_tiles_left_of_the_grid_do_not_wrap_around():
+    floor = [((x, y), (1, 1), None, (0, 90, 0)) for x in range(6) for y in range(6)]
+    tilemap = Tilemap(floor + [((-6, 0), (2, 6), None, WALL)], storage="arrays")
+    nav = NavGrid.from_tilemap(tilemap, cost=wall_cost, bounds=(0, 0, 6, 6))
+    assert not np.any(nav.costs == BLOCKED)
+
+    tilemap.store.pos[-1] = (-8, 0)
+    tilemap.store.moved()
+    nav.sync()
+    assert not np.any(nav.costs == BLOCKED)
+
+
+def test_queries_share_cost_rows_until_costs_change():
+    nav = NavGrid.from_tilemap(room(), cost=wall_cost)
+    rows = nav.cost_rows()
+    nav.find_path((0.5, 0.5), (4.5, 0.5))
+    assert nav.cost_rows() is rows and rows.cheapest == 1.0
+    assert pickle.loads(pickle.dumps(rows)).rows == rows.rows  # for process workers
+
+    nav.set_cost((2, 1), 1.0)
+    assert nav.cost_rows() is not rows
+    assert len(nav.find_path((0.5, 0.5), (4.5, 0.5))) == 5
@@ -0,0 +1,46 @@
+from deengi.quality import QualityController
+
+
+def test_degrades_in_priority_order_and_restores_with_hysteresis():
+    settings = {}
+    quality = QualityController(target_fps=100, degrade_after=0.1, restore_after=0.5)
+    quality.register("glow", [True, False], lambda v: settings.update(glow=v), priority=2)
+    quality.register("labels", [True, False], lambda v: settings.update(labels=v))
+    quality.register("cap", [None, 100, 10], lambda v: settings.update(cap=v), priority=1)
+
+    for _ in range(40):  # 20 ms frames, budget is 10 ms
+        quality.update(0.02)
+    assert settings == {"labels": False, "cap": 10, "glow": False}
+    assert len(quality.lowered) == 4
+
+    for _ in range(200):  # 9 ms: under budget, but without headroom nothing changes
+        quality.update(0.009, dt=0.01)
+    assert quality["glow"].value is False
+
+    for _ in range(300):  # 5 ms for 3 s restores one level per 0.5 s, latest first
+        quality.update(0.005, dt=0.01)
+    assert settings == {"labels": True, "cap": None, "glow": True}
+    assert not quality.lowered
+
+
+def test_disabled_controller_does_nothing():
+    quality = QualityController(enabled=False)
+    knob = quality.register("glow", [True, False], lambda v: None)
+    for _ in range(100):
+        quality.update(1.0)
+    assert knob.level == 0 and quality.average is None
+
+
+def test_failed_restores_back_off():
+    quality = QualityController(target_fps=60)
+    knob = quality.register("scale", [1.0, 0.5], lambda v: None)
+    changes = []
+    quality.on_change(lambda knob: changes.append(quality.time))
+    for _ in range(5 * 60 * 60):  # 20 ms at full quality, 11 ms degraded, for 5 minutes
+        quality.update(0.02 if knob.level == 0 else 0.011, dt=1 / 60)
+
+    assert len([time for time in changes if time > 180]) <= 4  # about one retry a minute
+    assert knob.failed_restores > 0 and quality.restore_delay() == quality.max_restore_after
+
+    quality.reset()
+    assert knob.failed_restores == 0
@@ -0,0 +1,96 @@
+import gzip
+import json
+import pickle
+
+import pygame
+import pytest
+
+from deengi.input_handler import InputHandler
+from deengi.replay import InputRecording, RecordingInput
+
+
+def post_frame(handler, *events):
+    for event in events:
+        pygame.event.post(event)
+    handler.begin_frame(1 / 60)
+    handler.update()
+
+
+def test_recorded_session_replays_identically(tmp_path, display):
+    live_log, replay_log = [], []
+    recorder = InputHandler(debug=False)
+    recorder.bind_keypress(pygame.K_x, lambda: live_log.append("x"))
+    recorder.bind_mousebutton_down(1, lambda: live_log.append(recorder.mouse_pos))
+    pygame.event.clear()
+
+    recording = recorder.record()
+    post_frame(recorder, pygame.event.Event(pygame.KEYDOWN, key=pygame.K_x, mod=0))
+    post_frame(recorder)
+    post_frame(recorder, pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1, pos=(7, 9)))
+    assert recorder.stop_recording() is recording
+    recording.save(tmp_path / "session.gz")
+
+    player = InputHandler(debug=False)
+    player.bind_keypress(pygame.K_x, lambda: replay_log.append("x"))
+    player.bind_mousebutton_down(1, lambda: replay_log.append(player.mouse_pos))
+    player.replay(InputRecording.load(tmp_path / "session.gz"))
+    pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_x, mod=0))  # ignored
+    frames = 0
+    while not player.replay_finished:
+        assert player.begin_frame(0.5) == 1 / 60
+        player.update()
+        frames += 1
+    assert frames == 3
+    assert replay_log == live_log == ["x", (7, 9)]
+
+
+def test_replay_feeds_continuous_key_state(display):
+    held = []
+    scancode = pygame.KSCAN_W
+    key_count = len(pygame.key.get_pressed())
+    recording = InputRecording(
+        [(0.1, [], (scancode,), None), (0.1, [], None, None), (0.1, [], (), None)], key_count
+    )
+    handler = InputHandler(debug=False)
+    handler.bind_continuous_keypress(pygame.K_w, lambda: held.append(handler.input.frame))
+    handler.replay(recording)
+    while not handler.replay_finished:
+        handler.begin_frame(0)
+        handler.update()
+    assert held == [0, 1]
+
+
+def test_recording_stores_the_state_live_play_acted_on(monkeypatch, display):
+    mouse = {"pos": (0, 0)}
+
+    def pump():  # the mouse moves while the queue is pumped
+        mouse["pos"] = (mouse["pos"][0] + 10, 0)
+        return []
+
+    monkeypatch.setattr(pygame.event, "get", pump)
+    monkeypatch.setattr(pygame.mouse, "get_pos", lambda: mouse["pos"])
+    source = RecordingInput()
+    seen = []
+    for _ in range(3):
+        source.begin_frame(0.1)
+        source.events()
+        seen.append(source.mouse_pos())
+    recorded = [frame[3][0] for frame in source.recording.frames]
+    assert recorded == seen == [(10, 0), (20, 0), (30, 0)]
+
+
+def test_recordings_are_data_only(tmp_path):
+    class Payload:
+        def __reduce__(self):
+            return (print, ("pickles run code on load",))
+
+    with gzip.open(tmp_path / "old.gz", "wb") as f:
+        pickle.dump({"format": 1, "key_count": 0, "frames": Payload()}, f)
+    with pytest.raises(ValueError):
+        InputRecording.load(tmp_path / "old.gz")
+
+    frame = (0.1, ((1, {"pos": (1, 2)}),), (4,), ((1, 2), (True, False, False)))
+    InputRecording([frame], 8).save(tmp_path / "new.gz")
+    with gzip.open(tmp_path / "new.gz", "rt") as f:
+        assert json.loads(f.readline()) == {"format": 2, "key_count": 8}
+    assert InputRecording.load(tmp_path / "new.gz").frames == [frame]
@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+from deengi.scheduler import Scheduler, next_frame, sleep
+
+
+def test_timers_fire_in_order_and_repeat():
+    scheduler = Scheduler()
+    calls = []
+    scheduler.after(0.5, lambda: calls.append("once"))
+    tick = scheduler.every(0.25, lambda: calls.append("tick"))
+    for _ in range(8):
+        scheduler.tick(0.125)
+    assert calls == ["tick", "once", "tick", "tick", "tick"]
+    tick.cancel()
+    scheduler.tick(1.0)
+    assert calls.count("tick") == 4
+
+
+def test_generator_and_async_coroutines():
+    scheduler = Scheduler()
+    log = []
+
+    def walker():
+        log.append(("walk", scheduler.frame))
+        yield  # next frame
+        log.append(("walk", scheduler.frame))
+        yield 1.0
+        log.append(("walk", scheduler.frame))
+
+    async def talker():
+        await next_frame()
+        await sleep(0.3)
+        log.append(("talk", scheduler.frame))
+        return "done"
+
+    scheduler.start(walker())
+    task = scheduler.start(talker())
+    for _ in range(20):
+        scheduler.tick(0.125)
+    assert log == [("walk", 1), ("walk", 2), ("talk", 5), ("walk", 10)]
+    assert task.done and task.result == "done"
+    assert len(scheduler) == 0
+
+
+def test_waiting_coroutines_are_not_polled():
+    scheduler = Scheduler()
+    resumed = []
+
+    def sleeper(i):
+        yield 10
+        resumed.append(i)
+
+    for i in range(1000):
+        scheduler.start(sleeper(i))
+    scheduler.tick(0.1)
+    assert len(scheduler._next_frame) == 0 and len(scheduler) == 1000
+    scheduler.tick(10)
+    assert len(resumed) == 1000
+
+
+def test_zero_waits_resume_next_tick():
+    scheduler = Scheduler()
+    counts = {"spin": 0, "timer": 0}
+
+    def spinner():
+        while True:
+            counts["spin"] += 1
+            yield 0
+
+    def again():
+        counts["timer"] += 1
+        scheduler.after(0, again)
+
+    scheduler.start(spinner())
+    scheduler.after(0, again)
+    for _ in range(3):
+        scheduler.tick(0.1)
+    assert counts == {"spin": 3, "timer": 3}
+    with pytest.raises(ValueError):
+        scheduler.every(0, again)
+
+
+def test_task_can_cancel_itself():
+    scheduler = Scheduler()
+    steps = []
+
+    def worker():
+        steps.append(1)
+        task.cancel()
+        yield
+        steps.append(2)
+
+    task = scheduler.start(worker())
+    scheduler.tick(0.1)
+    scheduler.tick(0.1)
+    assert steps == [1] and task.cancelled and len(scheduler) == 0
+
+
+def test_awaiting_asyncio_objects_is_rejected():
+    async def uses_asyncio():
+        await asyncio.sleep(1)
+
+    scheduler = Scheduler()
+    task = scheduler.start(uses_asyncio())
+    with pytest.raises(TypeError, match="run_async"):
+        scheduler.tick(0.1)
+    assert task.cancelled
+    scheduler.tick(0.1)  # not resumed again
+
+    loop = asyncio.new_event_loop()
+
+    async def awaits_a_future():
+        await loop.create_future()
+
+    task = scheduler.start(awaits_a_future())
+    with pytest.raises(TypeError, match="run_async"):
+        scheduler.tick(0.1)
+    assert task.cancelled
+    loop.close()
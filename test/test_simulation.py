@@ -0,0 +1,54 @@
+import time
+
+import numpy as np
+import pytest
+
+from deengi.simulation import ProcessSimulation, ThreadedSimulation
+
+
+def advance(state, dt):
+    state["position"] += state["velocity"] * dt
+
+
+def wait_for_step(simulation, step, timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while simulation.latest.step < step:
+        assert time.perf_counter() < deadline, "simulation did not advance"
+        time.sleep(0.005)
+
+
+@pytest.mark.parametrize("kind", [ThreadedSimulation, ProcessSimulation])
+def test_snapshots_are_published_and_immutable(kind):
+    state = {"position": np.zeros((3, 2)), "velocity": np.ones((3, 2))}
+    simulation = kind(advance, state, rate=100)
+    simulation.start()
+    try:
+        wait_for_step(simulation, 3)
+        # a pair from snapshots() is consistent even while steps go on
+        previous, latest = simulation.snapshots()
+        assert latest.step > previous.step
+        np.testing.assert_allclose(latest["position"], latest.step * 0.01)
+        np.testing.assert_allclose(previous["position"], previous.step * 0.01)
+        wait_for_step(simulation, latest.step + 1)
+        assert simulation.latest.step > latest.step  # latest follows the worker
+    finally:
+        simulation.stop()
+
+    previous, latest = simulation.snapshots()
+    assert latest.step >= 3 and latest.step > previous.step
+    np.testing.assert_allclose(latest["position"], latest.step * 0.01)
+    with pytest.raises(ValueError):
+        latest["position"][0, 0] = 5
+
+    position = simulation.interpolated("position")
+    assert np.all(previous["position"] <= position)
+    assert np.all(position <= latest["position"])
+
+
+def test_interpolation_between_last_two_snapshots():
+    simulation = ThreadedSimulation(advance, {"position": [0.0], "velocity": [10.0]}, rate=10)
+    simulation.publish({"position": np.array([1.0])}, 1)
+    published = simulation.latest.time
+    assert simulation.interpolated("position", now=published) == 0.0
+    assert simulation.interpolated("position", now=published + 0.05) == pytest.approx(0.5)
+    assert simulation.interpolated("position", now=published + 1.0) == 1.0
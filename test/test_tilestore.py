@@ -0,0 +1,339 @@
+from concurrent.futures import wait
+
+import numpy as np
+import pygame
+import pytest
+
+from deengi.camera import Camera2D
+from deengi.input_handler import InputHandler
+from deengi.renderables import Tile, Tilemap, TileStore, TileView
+from deengi.renderables.tilestore import VISIBLE
+
+
+class FakeRenderer:
+    interactive = True
+
+    def __init__(self, display, camera, debug=False):
+        self.display = display
+        self.camera = camera
+        self.debug = debug
+
+    def screen_coords(self, coords):
+        return self.camera.screen_coords(coords)
+
+    def get_color(self, color):
+        return (40, 64, 123)
+
+
+def test_views_expose_tile_api():
+    store = TileStore()
+    index = store.add((2, 3), (1, 1), color=(10, 20, 30), name="home")
+    view = store[index]
+    assert isinstance(view, TileView)
+    assert view.pos == (2.0, 3.0)
+    assert view.color == (10, 20, 30)
+    assert view.name == "home"
+    assert view.highlighted and view.visible
+    view.highlighted = False
+    assert not store[index].highlighted
+    assert store[index] == view and len({view, store[index]}) == 1
+
+
+def test_bulk_operations_are_array_ops():
+    tilemap = Tilemap(storage="arrays")
+    xs, ys = np.meshgrid(np.arange(100), np.arange(100))
+    tilemap.store.add_many(np.stack([xs.ravel(), ys.ravel()], axis=1))
+    assert len(tilemap) == 10_000
+
+    selection = tilemap.select((10, 10, 5, 5))
+    assert len(selection) == 25
+    tilemap.dim(selection)
+    tilemap.recolor(selection, (255, 0, 0))
+    assert sum(not t.highlighted for t in tilemap) == 25
+    assert tilemap[int(selection[0])].color == (255, 0, 0)
+
+
+def test_memory_per_tile_is_small():
+    store = TileStore()
+    store.add_many(np.zeros((1000, 2)))
+    assert store.nbytes / store.capacity < 32
+
+
+def test_object_and_array_storage_match(display):
+    tuples = [((x, y), (1, 1), None, (0, 200, 0)) for x in range(3) for y in range(3)]
+    objects = Tilemap(tuples)
+    arrays = Tilemap(tuples, storage="arrays")
+    assert [t.pos for t in objects] == [t.pos for t in arrays]
+
+    surface = pygame.Surface((200, 150))
+    camera = Camera2D(surface, zoom=(20, 20))
+    renderer = FakeRenderer(surface, camera)
+    arrays.render(renderer)
+    x, y = camera.screen_coords((1.5, 1.5))
+    assert surface.get_at((int(x), int(y))) == (0, 200, 0)
+
+    objects.render(renderer)
+    assert arrays[4].rect == objects[4].rect
+
+
+def test_tile_callbacks_are_registered_with_the_input_handler(display):
+    clicked = []
+    hovered = []
+    tuples = [
+        ((0, 0), (1, 1), None, None, lambda: clicked.append("a"), hovered.append),
+        ((2, 0), (1, 1), None, None, lambda: clicked.append("b")),
+    ]
+    handler = InputHandler(debug=False)
+    surface = pygame.Surface((200, 150))
+    renderer = FakeRenderer(surface, Camera2D(surface, zoom=(20, 20)))
+    for storage in ("objects", "arrays"):
+        tilemap = Tilemap(tuples, storage=storage)
+        tilemap.render(renderer)
+        handler.clickable_rects.clear()
+        tilemap.register_callbacks(handler)
+        assert len(handler.clickable_rects) == 2
+
+        pos = renderer.camera.screen_coords((2.5, 0.5))
+        handler.handle_mouse_down(
+            pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(int(pos[0]), int(pos[1])), button=1)
+        )
+    assert clicked == ["b", "b"]
+    assert len(handler.hoverable_rects) == 2
+
+
+def test_save_and_memory_mapped_load(tmp_path, display):
+    img = pygame.Surface((8, 8))
+    img.fill((0, 0, 200))
+    pygame.image.save(img, str(tmp_path / "water.png"))
+
+    tilemap = Tilemap(storage="arrays")
+    xs, ys = np.meshgrid(np.arange(64), np.arange(64))
+    tilemap.store.add_many(np.stack([xs.ravel(), ys.ravel()], axis=1)[::-1])
+    water = tilemap.store.add((100, 100), (1, 1), str(tmp_path / "water.png"))
+    tilemap[water].name = "lake"
+    tilemap.save(tmp_path / "world", chunk_size=8)
+
+    loaded = Tilemap.load(tmp_path / "world")
+    assert isinstance(loaded.store.pos, np.memmap)
+    assert len(loaded) == len(tilemap)
+    assert sorted(t.pos for t in loaded) == sorted(t.pos for t in tilemap)
+    lake = next(t for t in loaded if t.name == "lake")
+    assert lake.pos == (100, 100) and lake.img.get_at((0, 0)) == (0, 0, 200)
+
+    in_chunk = loaded.store.chunk_indices((1, 1, 2, 2))
+    assert len(in_chunk) == 8 * 8
+    loaded.highlight(in_chunk, False)  # copy-on-write, file stays untouched
+    assert all(t.highlighted for t in Tilemap.load(tmp_path / "world"))
+
+
+def test_moved_tiles_update_the_chunk_index_in_place():
+    store = TileStore(chunk_size=4)
+    xs, ys = np.meshgrid(np.arange(32), np.arange(32))
+    store.add_many(np.stack([xs.ravel(), ys.ravel()], axis=1))
+    store.build_chunk_index()
+    epoch = store.chunk_epoch
+
+    rng = np.random.default_rng(0)
+    for index in rng.choice(store.count, 40, replace=False).tolist():
+        store[index].pos = tuple(rng.uniform(-8, 40, 2))
+    store.add((50, 50), (1, 1))
+    rect = (-4, 2, 20, 13)
+    incremental = store.chunk_indices(rect)
+    assert store.chunk_epoch == epoch  # no full rebuild
+    assert list(store.chunk_members(store.chunk_of(store.count - 1))) == [store.count - 1]
+
+    store.build_chunk_index()
+    assert np.array_equal(incremental, store.chunk_indices(rect))
+
+
+def test_saving_callbacks_warns(tmp_path, caplog):
+    store = TileStore()
+    store.add((0, 0), (1, 1), click_callback=print)
+    store.save(tmp_path / "world")
+    assert "callbacks are not saved" in caplog.text
+
+
+def settle(tilemap, renderer):
+    """Render until the streamer has no chunk generation pending"""
+    for _ in range(100):
+        tilemap.render(renderer)
+        if not tilemap.streamer.pending:
+            return
+        wait(list(tilemap.streamer.pending.values()))
+
+
+def test_streaming_loads_chunks_around_the_view(display):
+    def provider(chunk_x, chunk_y, chunk_size):
+        for x in range(chunk_size):
+            for y in range(chunk_size):
+                yield (chunk_x * chunk_size + x, chunk_y * chunk_size + y), (1, 1)
+
+    surface = pygame.Surface((200, 150))
+    renderer = FakeRenderer(surface, Camera2D(surface, zoom=(20, 20)))
+    tilemap = Tilemap()
+    streamer = tilemap.stream(provider, chunk_size=4, prefetch=0, memory_budget=0)
+    try:
+        settle(tilemap, renderer)
+        in_view = streamer.chunk_range(renderer.camera.view_rect())
+        assert sorted(streamer.chunks) == sorted(in_view)
+        assert len(tilemap) == 16 * len(in_view)
+
+        renderer.camera.move((100, 0))
+        settle(tilemap, renderer)
+        assert not set(streamer.chunks) & set(in_view)  # evicted, over budget
+    finally:
+        tilemap.close()
+
+
+def test_failing_chunks_are_logged_not_raised(display, caplog):
+    def provider(chunk_x, chunk_y, chunk_size):
+        if (chunk_x, chunk_y) == (0, 0):
+            raise OSError("corrupt chunk")
+        return [((chunk_x * chunk_size, chunk_y * chunk_size), (1, 1))]
+
+    surface = pygame.Surface((200, 150))
+    renderer = FakeRenderer(surface, Camera2D(surface, zoom=(20, 20)))
+    tilemap = Tilemap()
+    streamer = tilemap.stream(provider, chunk_size=4, prefetch=0)
+    try:
+        settle(tilemap, renderer)
+        assert isinstance(streamer.failed[0, 0], OSError)
+        assert "corrupt chunk" in caplog.text
+        assert (0, 0) not in streamer.chunks and streamer.chunks
+        assert streamer.nbytes == sum(store.nbytes for store in streamer.chunks.values())
+        with pytest.raises(RuntimeError):
+            tilemap.select((0, 0, 1, 1))
+    finally:
+        tilemap.close()
+
+
+def test_depth_order_follows_camera_rotation(display):
+    surface = pygame.Surface((200, 150))
+    camera = Camera2D(surface, zoom=(20, 20))
+    tuples = [((x, y), (1, 1)) for x in range(5) for y in range(5)]
+    arrays = Tilemap(tuples, storage="arrays", depth_sort=True)
+    objects = Tilemap(tuples, depth_sort=True)
+
+    for rotation in (0, 30, 135, 250):
+        camera.set_rotation(rotation)
+        rank = arrays.store.depth_rank(camera)
+        screen_y = camera.screen_coords_array(arrays.store.pos[:25] + 0.5)[:, 1]
+        assert np.all(np.diff(screen_y[np.argsort(rank)]) >= -1e-4)
+        drawn = [
+            camera.screen_coords(t.depth_anchor()).y for t in objects.draw_order(camera)
+        ]
+        assert drawn == sorted(drawn)
+
+
+def test_visible_indices_survive_highlights(display):
+    surface = pygame.Surface((200, 150))
+    camera = Camera2D(surface, zoom=(20, 20))
+    store = TileStore(chunk_size=4)
+    store.add_many(np.random.default_rng(0).uniform(-5, 5, (100, 2)))
+    renderer = FakeRenderer(surface, camera)
+    visible = store.visible_indices(renderer)
+
+    store.highlight([int(visible[0])])  # e.g. a hover
+    assert store.visible_indices(renderer) is visible
+    store.set_flag(VISIBLE, False, [int(visible[0])])
+    assert int(visible[0]) not in store.visible_indices(renderer)
+
+
+def test_culling_and_depth_order_are_cached_per_camera(display):
+    surface = pygame.Surface((200, 150))
+    store = TileStore(chunk_size=4, depth_sort=True)
+    store.add_many(np.random.default_rng(0).uniform(-5, 5, (100, 2)))
+    main = FakeRenderer(surface, Camera2D(surface, zoom=(20, 20)))
+    viewport = FakeRenderer(surface, Camera2D(surface, zoom=(10, 10), rotation=45))
+
+    def state(renderer):
+        camera = renderer.camera
+        visible = store.visible_indices(renderer)
+        rank = store.depth_rank(camera)
+        return visible, rank, store.depth_sorted(visible, rank, camera)
+
+    first = [state(main), state(viewport)]
+    for _ in range(2):  # main view and viewport alternate every frame
+        for renderer, cached in zip((main, viewport), first):
+            assert all(a is b for a, b in zip(state(renderer), cached))
+    assert len(first[0][0]) != len(first[1][0])
+
+
+def test_depth_order_is_merged_incrementally(display):
+    surface = pygame.Surface((200, 150))
+    camera = Camera2D(surface, zoom=(20, 20))
+    camera.set_rotation(30)
+    store = TileStore(chunk_size=4, depth_sort=True)
+    rng = np.random.default_rng(2)
+    store.add_many(rng.uniform(-10, 10, (500, 2)))
+    renderer = FakeRenderer(surface, camera)
+
+    def full_sort():
+        n = store.count
+        centers = store.pos[:n] + store.size[:n] / 2
+        depth = centers @ np.array(camera.depth_axis)
+        visible = store.visible_indices(renderer)
+        return visible[np.argsort(depth[visible], kind="stable")]
+
+    for step in range(5):
+        store.render(renderer)
+        drawn = store.depth_sorted(
+            store.visible_indices(renderer), store.depth_rank(camera)
+        )
+        assert np.array_equal(drawn, full_sort())
+        camera.move((1, 0.5))
+        store.add_many(rng.uniform(-10, 10, (20, 2)))
+
+
+def test_prerendered_chunks_match_direct_rendering(display):
+    tuples = [
+        ((x, y), (1, 1), None, (10 * x, 10 * y, 100)) for x in range(20) for y in range(20)
+    ]
+    direct = Tilemap(tuples, storage="arrays", chunk_size=4)
+    prerendered = Tilemap(tuples, storage="arrays", chunk_size=4, prerender=True)
+    surface = pygame.Surface((200, 150))
+    camera = Camera2D(surface, (5, 5), zoom=(20, 20))
+    renderer = FakeRenderer(surface, camera)
+
+    def frame(tilemap):
+        surface.fill((0, 0, 0))
+        tilemap.render(renderer)
+        return pygame.surfarray.array3d(surface)
+
+    try:
+        assert np.array_equal(frame(direct), frame(prerendered))
+        rasters = dict(prerendered.rasterizer.rasters)
+        assert rasters and all(raster[2] is not None for raster in rasters.values())
+
+        camera.move((3, 2))  # panning reuses the chunk surfaces
+        assert np.array_equal(frame(direct), frame(prerendered))
+        assert all(
+            prerendered.rasterizer.rasters[chunk][2] is raster[2]
+            for chunk, raster in rasters.items()
+            if chunk in prerendered.rasterizer.rasters
+        )
+
+        camera.zoom(0.5)
+        prerendered.recolor([0], (255, 255, 255))
+        direct.recolor([0], (255, 255, 255))
+        assert np.array_equal(frame(direct), frame(prerendered))
+    finally:
+        prerendered.close()
+
+
+def test_tile_changes_rerasterize_only_their_chunk(display):
+    tuples = [((x, y), (1, 1), None, (10 * x, 10 * y, 100)) for x in range(12) for y in range(12)]
+    tilemap = Tilemap(tuples, storage="arrays", chunk_size=4, prerender=True)
+    surface = pygame.Surface((200, 150))
+    renderer = FakeRenderer(surface, Camera2D(surface, (6, 6), zoom=(12, 12)))
+    try:
+        tilemap.render(renderer)
+        before = {chunk: raster[2] for chunk, raster in tilemap.rasterizer.rasters.items()}
+        changed = int(tilemap.store.chunk_of(0))
+        tilemap.recolor([0], (255, 255, 255))
+        tilemap.render(renderer)
+        after = tilemap.rasterizer.rasters
+        assert after[changed][2] is not before[changed]
+        assert all(after[chunk][2] is before[chunk] for chunk in before if chunk != changed)
+    finally:
+        tilemap.close()
@@ -0,0 +1,42 @@
+import numpy as np
+import pygame
+
+from deengi.camera import Camera2D
+from deengi.renderables import Dialog
+from deengi.renderables.ui import Tooltip
+from deengi.renderer import Renderer
+
+
+def test_retained_dialog_matches_direct_drawing(display):
+    renderer = Renderer(display, Camera2D(display), debug=False)
+    dialog = Dialog("Title", "Some text\nover two lines")
+    dialog.add_option("Continue", lambda: None)
+
+    display.fill((0, 0, 0))
+    renderer.draw_text(dialog.title, pos=(50, 50), size=30)
+    renderer.draw_text(dialog.text, pos=(50, 100), size=20)
+    renderer.draw_text(dialog.get_options_text(), pos=(50, 400), size=20)
+    direct = pygame.surfarray.array3d(display)
+
+    display.fill((0, 0, 0))
+    dialog.render(renderer)
+    assert np.array_equal(pygame.surfarray.array3d(display), direct)
+
+    surface = dialog._surface
+    dialog.render(renderer)
+    assert dialog._surface is surface
+    dialog.options[0].text = "Quit"
+    dialog.render(renderer)
+    assert dialog._surface is not surface
+
+
+def test_tooltip_surface_built_once(display):
+    renderer = Renderer(display, Camera2D(display), debug=False)
+    tooltip = Tooltip("hello")
+    tooltip.render(renderer)
+    assert tooltip._surface is None
+    tooltip.set_hover(True)
+    tooltip.render(renderer)
+    surface = tooltip._surface
+    tooltip.render(renderer)
+    assert tooltip._surface is surface
@@ -0,0 +1,56 @@
+import pygame
+
+from deengi.renderables.variants import VariantCache
+
+
+def make_image(color=(200, 100, 50)):
+    img = pygame.Surface((4, 4), pygame.SRCALPHA)
+    img.fill(color + (128,))
+    return img
+
+
+def test_variants_are_computed_once_per_source():
+    cache = VariantCache()
+    img = make_image()
+    gray = cache.get(img, "gray")
+    assert cache.get(img, "gray") is gray
+    r, g, b, a = gray.get_at((0, 0))
+    assert r == g == b and a == 128
+    assert cache.get(img, "tint", (0, 0, 255), 1.0).get_at((0, 0))[:3] == (0, 0, 255)
+    assert cache.get(img) is img
+
+
+def test_colorkey_pixels_survive():
+    img = pygame.Surface((2, 1))
+    img.fill((255, 0, 0))
+    img.set_at((1, 0), (10, 200, 10))
+    img.set_colorkey((255, 0, 0))
+    bright = VariantCache().get(img, "brightness", 0.5)
+    assert bright.get_at((0, 0))[:3] == (255, 0, 0)
+    assert bright.get_at((1, 0))[:3] == (5, 100, 5)
+
+
+def test_sources_are_evicted_with_all_their_variants():
+    cache = VariantCache(max_sources=2)
+    first, second, third = make_image(), make_image(), make_image()
+    gray = cache.get(first, "gray")
+    cache.get(first, "highlight")
+    cache.get(second, "gray")
+    cache.get(third, "gray")
+    assert len(cache) == 2
+    assert cache.get(first, "gray") is not gray
+
+
+def test_scaled_images_are_kept_per_size_within_a_byte_budget(display):
+    cache = VariantCache()
+    img = make_image()
+    small, large = cache.scaled(img, (8, 8)), cache.scaled(img, (16, 16))
+    assert cache.scaled(img, (8, 8)) is small  # two zoom levels don't evict each other
+    assert cache.scaled(img, (16, 16)) is large
+
+    cache = VariantCache(max_bytes=3 * 16 * 16 * 4)
+    images = [make_image() for _ in range(10)]
+    for image in images:
+        cache.scaled(image, (16, 16))
+    assert cache.nbytes <= cache.max_bytes and len(cache) == 3
+    assert cache.scaled(images[-1], (16, 16)) is cache.scaled(images[-1], (16, 16))